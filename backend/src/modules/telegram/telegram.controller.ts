@@ -1,4 +1,14 @@
-import { Body, Controller, HttpCode, HttpStatus, Logger, Post } from '@nestjs/common';
+import {
+  Body,
+  Controller,
+  Headers,
+  HttpCode,
+  HttpException,
+  HttpStatus,
+  InternalServerErrorException,
+  Logger,
+  Post,
+} from '@nestjs/common';
 import { ApiOperation, ApiResponse, ApiTags } from '@nestjs/swagger';
 import { TelegramWebhookDto } from './dto/telegram-webhook.dto';
 import { TelegramService } from './telegram.service';
@@ -30,6 +40,7 @@ export class TelegramController {
   @HttpCode(HttpStatus.OK)
   @ApiOperation({ summary: 'Receive questionnaire data from bot' })
   @ApiResponse({ status: 200, description: 'Questionnaire data received' })
+  @ApiResponse({ status: 500, description: 'Questionnaire data not saved' })
   async receiveQuestionnaire(@Body() questionnaireData: any) {
     this.logger.log(`Received questionnaire data: ${JSON.stringify(questionnaireData)}`);
     
@@ -38,7 +49,11 @@ export class TelegramController {
       return { status: 'ok' };
     } catch (error) {
       this.logger.error(`Error saving questionnaire data: ${error.message}`, error.stack);
-      return { status: 'error', message: error.message };
+      if (error instanceof HttpException) {
+        throw error;
+      }
+      // Ошибка сохранения - 5xx: бот повторит доставку
+      throw new InternalServerErrorException('Не удалось сохранить анкету');
     }
   }
 
@@ -46,6 +61,7 @@ export class TelegramController {
   @HttpCode(HttpStatus.OK)
   @ApiOperation({ summary: 'Receive questionnaire result from bot' })
   @ApiResponse({ status: 200, description: 'Questionnaire result received' })
+  @ApiResponse({ status: 500, description: 'Questionnaire result not saved' })
   async receiveQuestionnaireResult(@Body() resultData: any) {
     this.logger.log(`Received questionnaire result: ${JSON.stringify(resultData)}`);
     
@@ -54,7 +70,37 @@ export class TelegramController {
       return { status: 'ok' };
     } catch (error) {
       this.logger.error(`Error saving questionnaire result: ${error.message}`, error.stack);
-      return { status: 'error', message: error.message };
+      if (error instanceof HttpException) {
+        throw error;
+      }
+      // Ошибка сохранения - 5xx: бот повторит доставку
+      throw new InternalServerErrorException('Не удалось сохранить результат анкеты');
+    }
+  }
+
+  @Post('questionnaire/complete')
+  @HttpCode(HttpStatus.OK)
+  @ApiOperation({ summary: 'Receive questionnaire data and result from bot in one request' })
+  @ApiResponse({ status: 200, description: 'Questionnaire data and result received' })
+  @ApiResponse({ status: 400, description: 'Questionnaire id, answers or result missing' })
+  @ApiResponse({ status: 500, description: 'Questionnaire not saved, delivery should be retried' })
+  async receiveCompletedQuestionnaire(
+    @Body() completionData: any,
+    @Headers('idempotency-key') idempotencyKey?: string,
+  ) {
+    this.logger.log(`Received completed questionnaire for user ${completionData?.questionnaire?.telegram_id}`);
+    
+    try {
+      // Повторная доставка той же анкеты возвращает ok без новой записи
+      await this.telegramService.saveCompletedQuestionnaire(completionData, idempotencyKey);
+      return { status: 'ok' };
+    } catch (error) {
+      this.logger.error(`Error saving completed questionnaire: ${error.message}`, error.stack);
+      if (error instanceof HttpException) {
+        throw error;
+      }
+      // Ошибка сохранения - 5xx: бот повторит доставку
+      throw new InternalServerErrorException('Не удалось сохранить анкету');
     }
   }
 }
@@ -1,4 +1,5 @@
-import { Injectable, Logger } from '@nestjs/common';
+import { BadRequestException, Injectable, Logger } from '@nestjs/common';
+import { Prisma } from '@prisma/client';
 import { PrismaService } from '../../prisma/prisma.service';
 import { QuestionnairesService } from '../questionnaires/questionnaires.service';
 import { TelegramWebhookDto } from './dto/telegram-webhook.dto';
@@ -101,4 +102,81 @@ export class TelegramService {
       throw error;
     }
   }
+
+  async saveCompletedQuestionnaire(completionData: any, idempotencyKey?: string) {
+    const questionnaireData = completionData?.questionnaire;
+    const resultData = completionData?.result;
+    // Анкета сохраняется под идентификатором, выданным ботом (для сообщений без
+    // него - под ключом Idempotency-Key), поэтому повторная доставка той же анкеты
+    // находит уже сохраненную запись и не создает дубликат
+    const questionnaireId = questionnaireData?.id || idempotencyKey;
+    if (!questionnaireId || !questionnaireData?.telegram_id || !questionnaireData?.answers || !resultData) {
+      throw new BadRequestException('Нужны идентификатор анкеты, telegram_id, ответы и результат');
+    }
+    this.logger.log(`Saving completed questionnaire ${questionnaireId} for user ${questionnaireData.telegram_id}`);
+
+    try {
+      // Пользователь, анкета и результат записываются вместе или не записываются вовсе
+      return await this.prisma.$transaction(async (tx) => {
+        const user = await tx.user.upsert({
+          where: { telegramId: questionnaireData.telegram_id.toString() },
+          update: {
+            firstName: questionnaireData.first_name,
+            lastName: questionnaireData.last_name,
+          },
+          create: {
+            telegramId: questionnaireData.telegram_id.toString(),
+            username: questionnaireData.username || null,
+            firstName: questionnaireData.first_name,
+            lastName: questionnaireData.last_name || null,
+          },
+        });
+
+        const completedAt = new Date();
+        const questionnaire = await tx.questionnaire.upsert({
+          where: { id: questionnaireId },
+          update: {},
+          create: {
+            id: questionnaireId,
+            userId: user.id,
+            telegramId: questionnaireData.telegram_id,
+            answers: questionnaireData.answers,
+            status: 'COMPLETED',
+            completedAt,
+          },
+        });
+
+        const result = await tx.questionnaireResult.upsert({
+          where: { questionnaireId: questionnaire.id },
+          update: {},
+          create: {
+            userId: user.id,
+            telegramId: resultData.telegram_id ?? questionnaireData.telegram_id,
+            questionnaireId: questionnaire.id,
+            riskLevel: resultData.risk_level,
+            score: resultData.score,
+            recommendations: resultData.recommendations,
+            completedAt,
+          },
+        });
+
+        this.logger.log(`Completed questionnaire saved with ID: ${questionnaire.id}`);
+        return { questionnaire, result };
+      });
+    } catch (error) {
+      // Параллельная доставка той же анкеты записала ее первой: запись уже есть
+      if (error instanceof Prisma.PrismaClientKnownRequestError && error.code === 'P2002') {
+        this.logger.warn(`Questionnaire ${questionnaireId} was saved by a concurrent delivery`);
+        const questionnaire = await this.prisma.questionnaire.findUnique({
+          where: { id: questionnaireId },
+          include: { result: true },
+        });
+        if (questionnaire) {
+          const { result, ...stored } = questionnaire;
+          return { questionnaire: stored, result };
+        }
+      }
+      throw error;
+    }
+  }
 }
@@ -0,0 +1,17 @@
+"""
+Common API dependencies
+"""
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import settings
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Проверка токена администратора для служебных эндпоинтов"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
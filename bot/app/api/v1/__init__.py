@@ -3,8 +3,32 @@ API v1 Router
 """
 from fastapi import APIRouter
 from .health import router as health_router
+from .telegram import router as telegram_router
+from .outbox import router as outbox_router
+from .scoring import router as scoring_router
+from .rescoring import router as rescoring_router
+from .profiler import router as profiler_router
 
-router = APIRouter()
+# Роутеры по ролям процесса (APP_ROLE): пробы и профилировщик есть в каждой роли
+ROLE_ROUTERS = {
+    "common": [(health_router, "/health", "health"), (profiler_router, "/profiler", "profiler")],
+    "bot": [(telegram_router, "", "telegram")],
+    "api": [
+        (outbox_router, "/outbox", "outbox"),
+        (scoring_router, "/score", "scoring"),
+        (rescoring_router, "/rescoring", "rescoring")
+    ]
+}
 
-# Подключаем только health endpoints
-router.include_router(health_router, prefix="/health", tags=["health"]) 
\ No newline at end of file
+
+def create_router(role: str = "all") -> APIRouter:
+    """Роутер API v1 для роли all, api или bot"""
+    router = APIRouter()
+    roles = ["common", "bot", "api"] if role == "all" else ["common", role]
+    for group in roles:
+        for child, prefix, tag in ROLE_ROUTERS[group]:
+            router.include_router(child, prefix=prefix, tags=[tag])
+    return router
+
+
+router = create_router()
@@ -1,8 +1,13 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from typing import Dict, Any
 
 from app.config import settings
 from app.logger import get_logger
+from app.metrics import latency
+from app.services.health import health_monitor
+from app.services.nestjs_service import get_nestjs_service
+from app.services.questionnaire_writer import questionnaire_writer
 
 logger = get_logger("api.health")
 router = APIRouter()
@@ -26,38 +31,57 @@ async def detailed_health_check() -> Dict[str, Any]:
     
     # Общий статус
     overall_status = "healthy"
-    logger.info(f"Overall health status: {overall_status}")
+    logger.info("Overall health status: %s", overall_status)
+    
+    # Компоненты бота есть только в ролях, обрабатывающих обновления
+    leader_election = throttling = send_scheduler = update_scheduler = None
+    if settings.handles_updates:
+        from app.bot import bot as bot_runtime
+        leader_election = bot_runtime.leader_election
+        throttling = bot_runtime.throttling
+        send_scheduler = bot_runtime.send_scheduler
+        update_scheduler = bot_runtime.update_scheduler
     
     return {
         "status": overall_status,
         "service": settings.PROJECT_NAME,
         "version": settings.VERSION,
+        "role": settings.APP_ROLE,
         "telegram_bot": {
-            "status": "configured" if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_BOT_TOKEN != "your_telegram_bot_token_here" else "not_configured"
-        }
+            "status": "configured" if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_BOT_TOKEN != "your_telegram_bot_token_here" else "not_configured",
+            "mode": settings.BOT_MODE,
+            "polling_leader": leader_election.stats() if leader_election else None
+        },
+        "nestjs_backend": get_nestjs_service().stats(),
+        "questionnaire_writer": questionnaire_writer.stats(),
+        "throttling": throttling.stats() if throttling else None,
+        "telegram_sender": send_scheduler.stats() if send_scheduler else None,
+        "update_scheduler": update_scheduler.stats() if update_scheduler else None,
+        "dependencies": health_monitor.readiness(),
+        "latency": latency.snapshot()
     }
 
 
 @router.get("/ready")
-async def readiness_check() -> Dict[str, Any]:
-    """Проверка готовности системы к работе"""
-    logger.info("Readiness check requested")
-    
-    # Проверка конфигурации бота
-    bot_configured = bool(settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_BOT_TOKEN != "your_telegram_bot_token_here")
-    
-    logger.debug(f"Bot configured: {bot_configured}")
-    
-    if not bot_configured:
-        logger.warning("Bot not configured")
-        return {
-            "status": "not_ready",
-            "message": "Bot token not configured",
-            "bot_configured": bot_configured
-        }
+async def readiness_check():
+    """
+    Проверка готовности системы к работе
     
-    logger.info("System is ready")
-    return {
-        "status": "ready",
-        "message": "All systems operational"
-    } 
\ No newline at end of file
+    Результат фоновых проверок из кэша: проба не обращается к зависимостям.
+    503 - обязательная зависимость недоступна, результат устарел или
+    event loop перегружен.
+    """
+    readiness = health_monitor.readiness()
+    if readiness["status"] == "not_ready":
+        logger.debug("Not ready: %s", readiness["reasons"])
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+
+@router.get("/live")
+async def liveness_check():
+    """Проверка живости процесса: event loop обрабатывает задачи вовремя"""
+    liveness = health_monitor.liveness()
+    if liveness["status"] != "alive":
+        return JSONResponse(status_code=503, content=liveness)
+    return liveness
@@ -0,0 +1,34 @@
+from typing import Dict, Any, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import require_admin
+from app.logger import get_logger
+from app.services.outbox import get_outbox_dispatcher
+
+logger = get_logger("api.outbox")
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/stats")
+async def outbox_stats() -> Dict[str, Any]:
+    """Метрики доставки в NestJS бэкенд"""
+    return await get_outbox_dispatcher().stats()
+
+
+@router.get("/messages")
+async def outbox_messages(
+    status: Optional[str] = Query(None, pattern="^(pending|delivered|failed)$"),
+    limit: int = Query(50, ge=1, le=500)
+) -> List[Dict[str, Any]]:
+    """Просмотр сообщений outbox"""
+    return await get_outbox_dispatcher().list_messages(status=status, limit=limit)
+
+
+@router.post("/messages/{message_id}/retry")
+async def retry_outbox_message(message_id: int) -> Dict[str, Any]:
+    """Повторная доставка сообщения с ошибкой"""
+    if not await get_outbox_dispatcher().retry_message(message_id):
+        raise HTTPException(status_code=404, detail="Failed message not found")
+    logger.info("Outbox message %s requeued", message_id)
+    return {"status": "requeued", "id": message_id}
@@ -0,0 +1,67 @@
+from typing import Dict, Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import require_admin
+from app.metrics import latency
+from app.services.profiler import profiler
+from app.logger import get_logger
+
+logger = get_logger("api.profiler")
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/start")
+async def start_profiler(
+    duration: float = Query(30.0, gt=0),
+    interval: Optional[float] = Query(None, gt=0)
+) -> Dict[str, Any]:
+    """Запуск профилирования потока event loop на duration секунд"""
+    # Вызов из обработчика запроса - профилируется поток event loop
+    if not profiler.start(duration, interval):
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    logger.info("Profiler started via API for %.1fs", duration)
+    return profiler.status()
+
+
+@router.post("/stop")
+async def stop_profiler() -> Dict[str, Any]:
+    """Досрочная остановка; собранные выборки остаются доступны"""
+    if not profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler is not running")
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/status")
+async def profiler_status() -> Dict[str, Any]:
+    """Состояние профилировщика и число выборок"""
+    return profiler.status()
+
+
+@router.get("/profile")
+async def get_profile(format: str = Query("collapsed", pattern="^(collapsed|speedscope)$")):
+    """
+    Результат последнего профилирования
+
+    collapsed - свернутые стеки для flamegraph.pl, speedscope - JSON для speedscope.app
+    """
+    if format == "speedscope":
+        return profiler.speedscope()
+    return PlainTextResponse(profiler.collapsed())
+
+
+@router.get("/handlers")
+async def handler_timings() -> Dict[str, Any]:
+    """Реальное и процессорное время обработчиков бота"""
+    timings = {}
+    for name, snapshot in latency.snapshot().items():
+        if not name.startswith("handler."):
+            continue
+        handler = name[len("handler."):]
+        if handler.endswith(".cpu"):
+            timings.setdefault(handler[:-len(".cpu")], {})["cpu"] = snapshot
+        else:
+            timings.setdefault(handler, {})["wall"] = snapshot
+    return timings
@@ -0,0 +1,34 @@
+from typing import Dict, Any
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import require_admin
+from app.services.rescoring import rescoring_job
+from app.logger import get_logger
+
+logger = get_logger("api.rescoring")
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/start")
+async def start_rescoring(restart: bool = False) -> Dict[str, Any]:
+    """Запуск пересчета риска сохраненных анкет (продолжает с контрольной точки)"""
+    if not rescoring_job.start(restart=restart):
+        raise HTTPException(status_code=409, detail="Rescoring is already running")
+    logger.info("Rescoring started via API (restart=%s)", restart)
+    return {"status": "started", "restart": restart}
+
+
+@router.get("/status")
+async def rescoring_status() -> Dict[str, Any]:
+    """Прогресс и пропускная способность пересчета"""
+    return rescoring_job.progress()
+
+
+@router.post("/stop")
+async def stop_rescoring() -> Dict[str, Any]:
+    """Прерывание пересчета; следующий запуск продолжит с контрольной точки"""
+    if not rescoring_job.running:
+        raise HTTPException(status_code=409, detail="Rescoring is not running")
+    await rescoring_job.stop()
+    return rescoring_job.progress()
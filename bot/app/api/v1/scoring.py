@@ -0,0 +1,26 @@
+from typing import Dict, Any, List
+
+from pydantic import BaseModel, Field
+from fastapi import APIRouter
+
+from app.config import settings
+from app.services.scoring import scoring_engine
+
+router = APIRouter()
+
+
+class ScoreItem(BaseModel):
+    responses: Dict[str, Any]
+    language: str = "ru"
+
+
+class ScoreBatchRequest(BaseModel):
+    items: List[ScoreItem] = Field(..., max_length=settings.SCORE_BATCH_MAX_ITEMS)
+
+
+@router.post("/batch")
+def score_batch(request: ScoreBatchRequest) -> Dict[str, Any]:
+    """Пакетная оценка риска: результаты в порядке анкет запроса"""
+    # Синхронный обработчик выполняется в пуле потоков и не блокирует event loop
+    results = scoring_engine.score_batch((item.responses, item.language) for item in request.items)
+    return {"count": len(results), "results": results}
@@ -0,0 +1,31 @@
+import hmac
+from typing import Dict, Any, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger("api.telegram")
+router = APIRouter()
+
+
+@router.post(settings.WEBHOOK_PATH)
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+) -> Dict[str, Any]:
+    """Прием обновлений Telegram в режиме webhook"""
+    # Модуль бота импортирует aiogram, роль api этот роутер не подключает
+    from app.bot import bot as bot_runtime
+
+    if settings.BOT_MODE != "webhook" or bot_runtime.dp is None or not settings.WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Webhook is disabled")
+
+    if not hmac.compare_digest(x_telegram_bot_api_secret_token or "", settings.WEBHOOK_SECRET):
+        logger.warning("Webhook request with invalid secret token")
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    # Обработка выполняется в фоне, Telegram получает ответ после приема в очередь
+    await bot_runtime.feed_webhook_update(await request.json())
+    return {"ok": True}
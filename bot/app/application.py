@@ -0,0 +1,235 @@
+"""
+AsyaBot application factory (FastAPI + aiogram)
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.config import settings
+from app.database import init_db, close_db
+from app.api.v1 import create_router
+from app.logger import get_logger, setup_logger, SAMPLED
+from app.metrics import metrics
+from app.services.health import health_monitor, check_database
+from app.services.nestjs_service import get_nestjs_service
+from app.services.outbox import get_outbox_dispatcher
+from app.services.questionnaire_writer import questionnaire_writer
+from app.services.rescoring import rescoring_job
+
+# Инициализация логгера
+logger = get_logger("main")
+
+http_duration = metrics.histogram("http_request_duration_seconds", "HTTP request time by route", ["method", "route"])
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+
+# Роли процесса (APP_ROLE); all и bot обрабатывают обновления Telegram
+APP_ROLES = ("all", "api", "bot")
+
+# Глобальные переменные для управления жизненным циклом
+bot_task = None
+shutdown_event = asyncio.Event()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Управление жизненным циклом приложения"""
+    global bot_task
+
+    # Startup
+    started = time.perf_counter()
+    logger.info("Starting AsyaBot application (role: %s)...", settings.APP_ROLE)
+
+    # Роль bot (и all) обрабатывает обновления Telegram, роль api - только HTTP API
+    handles_updates = settings.handles_updates
+
+    if handles_updates:
+        # Бот, диспетчер и клиенты хранилищ создаются только в ролях с обработкой
+        # обновлений; роль api не импортирует aiogram
+        from app.bot import bot as bot_runtime
+        from app.bot.storage import check_storage
+
+        dp = bot_runtime.setup_bot()
+        nestjs_service = get_nestjs_service()
+        outbox_dispatcher = get_outbox_dispatcher()
+
+        # Фоновая пакетная запись анкет и доставка outbox (ошибки БД обрабатываются внутри)
+        questionnaire_writer.start()
+        outbox_dispatcher.start()
+
+    # Проверки зависимостей в фоне: пробы readiness/liveness читают кэш
+    health_monitor.add_check("database", check_database)
+    if handles_updates:
+        health_monitor.add_check("telegram_bot", bot_runtime.check_bot)
+        health_monitor.add_check("nestjs", nestjs_service.check_health, required=False)
+        if dp is not None:
+            health_monitor.add_check("fsm_storage", partial(check_storage, dp.storage))
+    health_monitor.start()
+
+    # Прогрев пула NestJS и создание таблиц идут параллельно: ни то ни другое
+    # не нужно для получения первого обновления, но оба ждут сеть
+    startup_jobs = [init_db(), nestjs_service.start()] if handles_updates else [init_db()]
+    db_result, *other_results = await asyncio.gather(*startup_jobs, return_exceptions=True)
+    for result in other_results:
+        if isinstance(result, Exception):
+            logger.error("NestJS client start failed: %s", result)
+    if isinstance(db_result, Exception):
+        logger.error("Startup failed: %s", db_result)
+        logger.info("Starting without database...")
+    else:
+        logger.info("Database initialized successfully")
+
+    if handles_updates:
+        # Регистрируем обработчики бота (если бот включен)
+        try:
+            bot_runtime.register_handlers()
+        except Exception:
+            logger.debug("Bot handlers not registered (bot disabled)")
+
+        # Запуск бота как отдельной задачи (если есть токен)
+        try:
+            bot_task = asyncio.create_task(bot_runtime.start_bot())
+            logger.info("Bot started successfully")
+        except Exception as bot_error:
+            logger.error("Bot failed to start: %s", bot_error)
+
+    logger.info("Application startup completed in %.3fs", time.perf_counter() - started)
+
+    yield
+
+    # Shutdown
+    logger.info("Shutting down AsyaBot application...")
+
+    # Устанавливаем флаг завершения
+    shutdown_event.set()
+    await health_monitor.stop()
+
+    if handles_updates:
+        # Останавливаем бота
+        if bot_task and not bot_task.done():
+            logger.info("Cancelling bot task...")
+            bot_task.cancel()
+            try:
+                await asyncio.wait_for(bot_task, timeout=5.0)
+            except asyncio.TimeoutError:
+                logger.warning("Bot task did not complete within timeout")
+            except asyncio.CancelledError:
+                logger.info("Bot task cancelled successfully")
+            except Exception as e:
+                logger.error("Error cancelling bot task: %s", e)
+
+        # Останавливаем доставку outbox до закрытия HTTP клиента
+        await outbox_dispatcher.stop()
+
+        # Завершаем бота
+        await bot_runtime.shutdown_bot()
+
+        # Записываем накопленные анкеты
+        await questionnaire_writer.stop()
+
+        # Закрываем пул соединений с NestJS
+        await nestjs_service.close()
+
+    # Прерываем пересчет риска (продолжится с контрольной точки)
+    await rescoring_job.stop()
+
+    # Закрываем пул соединений с БД
+    await close_db()
+
+    # Live-датчики процесса больше не учитываются в сумме воркеров
+    metrics.close()
+
+    logger.info("Application shutdown completed")
+
+async def log_requests(request: Request, call_next):
+    """Логирование HTTP запросов"""
+    start_time = time.time()
+
+    logger.info("Request: %s %s", request.method, request.url, extra=SAMPLED)
+
+    response = await call_next(request)
+
+    process_time = time.time() - start_time
+    logger.info("Response: %s - %.3fs", response.status_code, process_time, extra=SAMPLED)
+
+    # Шаблон пути вместо фактического URL, чтобы не плодить серии
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    http_duration.observe(process_time, method=request.method, route=route_path)
+    http_requests.inc(method=request.method, route=route_path, status=response.status_code)
+
+    return response
+
+async def global_exception_handler(request: Request, exc: Exception):
+    """Глобальный обработчик исключений"""
+    logger.error("Global exception handler: %s", exc)
+    return JSONResponse(
+        status_code=500,
+        content={"detail": "Internal server error"}
+    )
+
+async def root():
+    """Корневой эндпоинт"""
+    logger.info("Root endpoint accessed")
+    return {
+        "message": "AsyaBot API",
+        "version": settings.VERSION,
+        "status": "running"
+    }
+
+async def status():
+    """Эндпоинт статуса"""
+    logger.info("Status endpoint accessed")
+    return {
+        "status": "ok",
+        "timestamp": time.time(),
+        "version": settings.VERSION
+    }
+
+async def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(await metrics.collect(), media_type="text/plain; version=0.0.4")
+
+def create_app() -> FastAPI:
+    """
+    Сборка FastAPI приложения
+
+    Вызывается uvicorn в каждом воркере (--factory): логирование настраивается
+    здесь, а не при импорте, движок БД и HTTP клиенты создаются при первом
+    использовании.
+    """
+    setup_logger("asyabot")
+    if settings.APP_ROLE not in APP_ROLES:
+        raise ValueError(f"Unknown APP_ROLE: {settings.APP_ROLE}")
+
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        description="AsyaBot - Telegram bot for dementia risk assessment",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan
+    )
+
+    # Настройка CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Подключение роутеров API (набор зависит от роли)
+    app.include_router(create_router(settings.APP_ROLE), prefix=settings.API_V1_STR)
+
+    app.middleware("http")(log_requests)
+    app.add_exception_handler(Exception, global_exception_handler)
+
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_api_route("/status", status, methods=["GET"])
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+
+    return app
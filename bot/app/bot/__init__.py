@@ -1,6 +1,6 @@
 """
 AsyaBot Telegram Bot Module
-"""
-from .bot import bot, dp, start_bot
 
-__all__ = ["bot", "dp", "start_bot"] 
\ No newline at end of file
+Бот и диспетчер создаются app.bot.bot.setup_bot() в процессах, обрабатывающих
+обновления; импорт пакета их не создает.
+"""
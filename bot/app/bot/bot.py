@@ -3,19 +3,36 @@ AsyaBot Telegram Bot Implementation
 """
 import asyncio
 import signal
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any
+from functools import partial
+from typing import Dict, Any, Optional
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 
 from app.config import settings
-from app.logger import get_logger
+from app.logger import get_logger, SAMPLED
+from app.metrics import latency, metrics
 from app.database import get_db, init_db
 from app.models.questionnaire import Questionnaire, QuestionnaireResponse
-from app.services.nestjs_service import NestJSService
+from app.services.delivery import get_completion_delivery
+from app.services.questionnaire_writer import questionnaire_writer, build_questionnaire_record
+from app.services.scoring import scoring_engine
+from app.bot.storage import create_storage
+from app.bot.throttling import create_throttling_middleware
+from app.bot.send_scheduler import SendScheduler, InteractivePriorityMiddleware
+from app.bot.leader import create_leader_election
+from app.bot.update_scheduler import UpdateScheduler, UpdateSchedulerMiddleware
+from app.bot.fsm_context import BufferedFSMContextMiddleware
+from app.bot.instrumentation import setup_instrumentation, questionnaires_started, questionnaires_completed
+from app.bot.keyboards import AnswerCallback, QUESTION_KEYBOARDS, QUESTION_TEXTS, RESULT_KEYBOARDS
+from app.data.answer_vector import AnswerVector, ANSWER_CODES
 from app.data.questionnaire_data import (
     get_questions, get_answers, get_total_questions, 
     get_risk_interpretation, is_reverse_question, get_answer_weight
@@ -30,15 +47,68 @@ class QuestionnaireStates(StatesGroup):
     filling_questionnaire = State()
     completed = State()
 
-# Инициализация бота и диспетчера
-if not settings.TELEGRAM_BOT_TOKEN or settings.TELEGRAM_BOT_TOKEN == "your_telegram_bot_token_here":
-    logger.warning("TELEGRAM_BOT_TOKEN is not configured. Bot functionality will be disabled; API will run.")
-    bot = None
-    dp = None
-else:
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+# Ответ пользователю, если обработка обновления завершилась ошибкой
+ERROR_TEXT = "⚠️ Не удалось обработать действие, попробуйте еще раз.\nSomething went wrong, please try again."
+
+# Бот, диспетчер и middleware создаются setup_bot() в процессах, обрабатывающих
+# обновления (роли all и bot); импорт модуля ничего не создает
+bot = None
+dp = None
+throttling = None
+send_scheduler = None
+update_scheduler = None
+leader_election = None
+
+def setup_bot() -> Optional[Dispatcher]:
+    """Создание бота, диспетчера и middleware (один раз); None - бот отключен"""
+    global bot, dp, throttling, send_scheduler, update_scheduler, leader_election
+    if dp is not None:
+        return dp
+    
+    if not settings.TELEGRAM_BOT_TOKEN or settings.TELEGRAM_BOT_TOKEN == "your_telegram_bot_token_here":
+        logger.warning("TELEGRAM_BOT_TOKEN is not configured. Bot functionality will be disabled; API will run.")
+        return None
+    
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL)) if settings.TELEGRAM_API_URL else None
+    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, session=session)
+    
+    # Все исходящие запросы проходят через планировщик лимитов Telegram
+    send_scheduler = SendScheduler(
+        global_rate=settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate=settings.TELEGRAM_CHAT_RATE,
+        chat_burst=settings.TELEGRAM_CHAT_BURST,
+        max_retries=settings.TELEGRAM_SEND_MAX_RETRIES
+    )
+    bot.session.middleware(send_scheduler)
+    
+    storage = create_storage()
+    # Стандартный FSM middleware заменен буферизованным (регистрируется ниже)
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    
+    # Ограничение частоты - первым из своих middleware: отклоненное обновление
+    # не занимает место в очереди и не читает состояние FSM
+    throttling = create_throttling_middleware()
+    if throttling:
+        dp.update.outer_middleware(throttling)
+    
+    # Обновления разных чатов обрабатываются параллельно (не больше UPDATE_CONCURRENCY),
+    # одного чата - по порядку. Middleware регистрируется сразу после ограничения
+    # частоты, поэтому метрики и остальные middleware выполняются уже в очереди
+    if settings.UPDATE_CONCURRENCY > 0:
+        update_scheduler = UpdateScheduler(settings.UPDATE_CONCURRENCY, settings.UPDATE_QUEUE_SIZE)
+        dp.update.outer_middleware(UpdateSchedulerMiddleware(update_scheduler, dp))
+        metrics.add_collector(update_scheduler.collect_metrics)
+    
+    # Состояние FSM читается один раз за обновление и записывается один раз в конце
+    dp.update.outer_middleware(BufferedFSMContextMiddleware(
+        storage=storage, events_isolation=dp.fsm.events_isolation, strategy=dp.fsm.strategy
+    ))
+    setup_instrumentation(dp)
+    dp.update.outer_middleware(InteractivePriorityMiddleware())
+    
+    # Несколько реплик в режиме polling: опрашивает только держатель блокировки
+    leader_election = create_leader_election() if settings.BOT_MODE == "polling" else None
+    return dp
 
 # Флаг для корректного завершения
 shutdown_event = asyncio.Event()
@@ -54,11 +124,14 @@ def register_handlers():
     @dp.message(F.text == "/start")
     async def cmd_start(message: types.Message, state: FSMContext):
         """Обработчик команды /start"""
-        logger.info(f"User {message.from_user.id} started bot")
+        logger.info("User %s started bot", message.from_user.id)
         
         # Сбрасываем состояние
         await state.clear()
-        
+        await send_welcome(message, state)
+
+    async def send_welcome(message: types.Message, state: FSMContext):
+        """Приветствие с выбором языка (message - сообщение, в чат которого отвечаем)"""
         # Приветственное сообщение
         welcome_text = (
             "👋 Добро пожаловать в AsyaBot!\n\n"
@@ -80,7 +153,7 @@ def register_handlers():
     async def language_selected(callback: types.CallbackQuery, state: FSMContext):
         """Обработчик выбора языка"""
         language = callback.data.split('_')[1]
-        logger.info(f"User {callback.from_user.id} selected language: {language}")
+        logger.info("User %s selected language: %s", callback.from_user.id, language)
         
         await callback.answer()
         await state.update_data(language=language)
@@ -93,9 +166,13 @@ def register_handlers():
         data = await state.get_data()
         language = data.get("language", "ru")
         
-        # Инициализируем ответы
-        await state.update_data(responses={}, current_question=1)
+        # Инициализируем ответы (упакованный AnswerVector); идентификатор анкеты
+        # выдается при начале, чтобы повтор завершения не создал вторую анкету
+        await state.update_data(
+            answers=0, current_question=1, result=None, result_text=None, questionnaire_id=str(uuid.uuid4())
+        )
         await state.set_state(QuestionnaireStates.filling_questionnaire)
+        questionnaires_started.inc(language=language)
         
         # Показываем первый вопрос
         await show_question(callback, state)
@@ -106,152 +183,143 @@ def register_handlers():
         language = data.get("language", "ru")
         current_question = data.get("current_question", 1)
         
-        questions = get_questions(language)
-        answers = get_answers(language)
-        
-        if current_question > len(questions):
+        if current_question > get_total_questions():
             # Анкета завершена
             await complete_questionnaire(callback, state)
             return
         
-        question_text = questions[current_question]
-        # answers уже список вариантов для языка → не индексируем по номеру вопроса
-        answer_options = answers
-        
-        # Создаем клавиатуру с вариантами ответов
-        keyboard = []
-        for answer in answer_options:
-            keyboard.append([InlineKeyboardButton(
-                text=answer,
-                callback_data=f"answer_{current_question}_{answer}"
-            )])
-        
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        
+        # Текст и клавиатура вопроса собраны заранее при запуске
         await callback.message.edit_text(
-            f"Вопрос {current_question} из {len(questions)}:\n\n{question_text}",
-            reply_markup=reply_markup
+            QUESTION_TEXTS[(language, current_question)],
+            reply_markup=QUESTION_KEYBOARDS[(language, current_question)]
         )
 
-    @dp.callback_query(F.data.startswith('answer_'))
-    async def handle_answer(callback: types.CallbackQuery, state: FSMContext):
+    @dp.callback_query(AnswerCallback.filter())
+    async def handle_answer(callback: types.CallbackQuery, callback_data: AnswerCallback, state: FSMContext):
         """Обработчик ответа на вопрос"""
+        data = await state.get_data()
+        answers = get_answers(data.get("language", "ru"))
+        
+        if not 0 <= callback_data.a < len(answers) or not 1 <= callback_data.q <= get_total_questions():
+            logger.warning("User %s sent unknown answer %s to question %s", callback.from_user.id, callback_data.a, callback_data.q)
+            await callback.answer()
+            return
+        
+        await save_answer(callback, state, data, callback_data.q, callback_data.a)
+
+    @dp.callback_query(F.data.startswith('answer_'))
+    async def handle_legacy_answer(callback: types.CallbackQuery, state: FSMContext):
+        """Ответ из сообщений, отправленных до перехода на компактный формат"""
         parts = callback.data.split('_')
         question_num = int(parts[1])
         answer = '_'.join(parts[2:])  # Объединяем остальные части для ответов с пробелами
         
-        logger.info(f"User {callback.from_user.id} answered question {question_num}: {answer}")
+        code = ANSWER_CODES.get(answer)
+        if code is None or not 1 <= question_num <= get_total_questions():
+            logger.warning("User %s sent unknown answer %r to question %s", callback.from_user.id, answer, question_num)
+            await callback.answer()
+            return
+        
+        data = await state.get_data()
+        await save_answer(callback, state, data, question_num, code)
+
+    async def save_answer(callback: types.CallbackQuery, state: FSMContext, data: Dict[str, Any], question_num: int, code: int):
+        """Сохранение ответа (кода варианта) и переход к следующему вопросу"""
+        logger.info("User %s answered question %s: %s", callback.from_user.id, question_num, code, extra=SAMPLED)
         
         await callback.answer()
         
         # Сохраняем ответ
-        data = await state.get_data()
-        responses = data.get("responses", {})
-        responses[str(question_num)] = answer
-        await state.update_data(responses=responses, current_question=question_num + 1)
+        answers = get_answer_vector(data)
+        answers.set(question_num, code)
+        await state.update_data(answers=answers.pack(), current_question=question_num + 1)
         
         # Показываем следующий вопрос
         await show_question(callback, state)
 
     async def complete_questionnaire(callback: types.CallbackQuery, state: FSMContext):
         """Завершение анкеты и показ результатов"""
+        started = time.perf_counter()
+        
+        # Анкета уже завершена (повторное нажатие) - показываем сохраненный результат
+        already_completed = await state.get_state() == QuestionnaireStates.completed.state
+        if already_completed and await show_cached_results(callback, state):
+            return
+        
         data = await state.get_data()
         language = data.get("language", "ru")
-        responses = data.get("responses", {})
+        answers = get_answer_vector(data)
+        
+        # Данные сессии истекли или ответы неполны: результат не считаем и не
+        # сохраняем, предлагаем пройти анкету заново
+        if not answers.is_complete():
+            logger.warning(
+                "User %s reached results with %s of %s answers, questionnaire restarted",
+                callback.from_user.id, len(answers), get_total_questions()
+            )
+            # Нажатие должно получить ответ и на этом пути, даже если вызывающий
+            # обработчик еще не ответил; повторный ответ Telegram отклоняет
+            try:
+                await callback.answer()
+            except TelegramBadRequest:
+                pass
+            await state.clear()
+            await send_welcome(callback.message, state)
+            return
         
-        logger.info(f"User {callback.from_user.id} completed questionnaire with {len(responses)} responses")
+        logger.info("User %s completed questionnaire with %s responses", callback.from_user.id, len(answers))
         
         # Рассчитываем риск
-        risk_result = calculate_risk_locally(responses, language)
-        
-        try:
-            # Отправляем данные в NestJS бэкенд
-            questionnaire_data = {
-                "telegram_id": callback.from_user.id,
-                "first_name": callback.from_user.first_name,
-                "last_name": callback.from_user.last_name,
-                "answers": responses
-            }
+        risk_result = calculate_risk_locally(answers, language)
+        
+        if not already_completed:
+            # Анкета записывается в outbox до ответа пользователю: показанный
+            # результат не теряется при перезапуске. Запрос к бэкенду выполняется
+            # в фоне, ответы хранятся упакованными и разворачиваются при отправке.
+            # Бэкенд сохраняет анкету под идентификатором из FSM, и повторная
+            # доставка или повтор нажатия после ошибки не создает дубликат
+            await get_completion_delivery().enqueue(callback.from_user.id, {
+                "questionnaire": {
+                    "id": data.get("questionnaire_id") or str(uuid.uuid4()),
+                    "telegram_id": callback.from_user.id,
+                    "first_name": callback.from_user.first_name,
+                    "last_name": callback.from_user.last_name,
+                    "language": language,
+                    "answer_vector": answers.pack()
+                },
+                "result": {
+                    "telegram_id": callback.from_user.id,
+                    "risk_level": risk_result['risk_level'],
+                    "score": risk_result['score'],
+                    "recommendations": risk_result['recommendations']
+                }
+            })
             
-            # Отправляем данные анкеты
-            success = await nestjs_service.send_questionnaire_data(questionnaire_data)
-            if success:
-                logger.info(f"Questionnaire data sent to NestJS backend for user {callback.from_user.id}")
-            else:
-                logger.warning(f"Failed to send questionnaire data to NestJS backend for user {callback.from_user.id}")
-            
-            # Отправляем результаты
-            result_data = {
-                "telegram_id": callback.from_user.id,
-                "risk_level": risk_result['risk_level'],
-                "score": risk_result['score'],
-                "recommendations": risk_result['recommendations']
-            }
-            
-            success = await nestjs_service.send_questionnaire_result(result_data)
-            if success:
-                logger.info(f"Questionnaire result sent to NestJS backend for user {callback.from_user.id}")
-            else:
-                logger.warning(f"Failed to send questionnaire result to NestJS backend for user {callback.from_user.id}")
-            
-        except Exception as e:
-            logger.error(f"Error sending data to NestJS backend: {e}")
-            # Продолжаем показывать результаты даже при ошибке отправки
+            # Сохраняем анкету в фоне; повторный показ результатов не сохраняется
+            questionnaire_writer.submit(
+                build_questionnaire_record(callback.from_user, language, answers, risk_result)
+            )
         
-        # Формируем результат
-        risk_level_text = {
-            "low": "Низкий" if language == "ru" else "Low",
-            "medium": "Средний" if language == "ru" else "Medium", 
-            "high": "Высокий" if language == "ru" else "High"
-        }.get(risk_result['risk_level'], "Неизвестно")
+        # Результат и готовый текст кэшируются в FSM для навигации "Назад к результатам"
+        result_text = render_result_text(risk_result, language)
+        await state.update_data(result=risk_result, result_text=result_text)
         
-        if language == "ru":
-            result_text = f"📊 Результаты анкеты\n\n"
-            result_text += f"Уровень риска: {risk_level_text}\n"
-            result_text += f"Балл: {risk_result['score']}/100\n\n"
-            result_text += "Рекомендации:\n"
-            for rec in risk_result['recommendations']:
-                result_text += f"• {rec}\n"
-        else:
-            result_text = f"📊 Questionnaire Results\n\n"
-            result_text += f"Risk Level: {risk_level_text}\n"
-            result_text += f"Score: {risk_result['score']}/100\n\n"
-            result_text += "Recommendations:\n"
-            for rec in risk_result['recommendations']:
-                result_text += f"• {rec}\n"
-        
-        # Кнопки действий
-        keyboard = [
-            [InlineKeyboardButton(
-                text="📊 Подробный отчет" if language == "ru" else "📊 Detailed Report",
-                callback_data="detailed_report"
-            )],
-            [InlineKeyboardButton(
-                text="📚 Полезные материалы" if language == "ru" else "📚 Useful Materials",
-                callback_data="useful_materials"
-            )],
-            [InlineKeyboardButton(
-                text="👨‍⚕️ Консультация" if language == "ru" else "👨‍⚕️ Consultation",
-                callback_data="consultation"
-            )]
-        ]
-        
-        # Добавляем кнопку для перехода в приложение (если URL настроен)
-        if settings.MAIN_PAGE_URL:
-            keyboard.append([InlineKeyboardButton(
-                text="📱 Открыть приложение" if language == "ru" else "📱 Open App",
-                url=settings.MAIN_PAGE_URL
-            )])
+        await callback.message.edit_text(result_text, reply_markup=RESULT_KEYBOARDS[language])
+        await state.set_state(QuestionnaireStates.completed)
+        latency.observe("complete_questionnaire.user_facing", time.perf_counter() - started)
         
-        # Кнопка перезапуска
-        keyboard.append([InlineKeyboardButton(
-            text="🔄 Пройти заново" if language == "ru" else "🔄 Restart",
-            callback_data="restart"
-        )])
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
+        if not already_completed:
+            questionnaires_completed.inc(language=language, risk_level=risk_result['risk_level'])
+
+    async def show_cached_results(callback: types.CallbackQuery, state: FSMContext) -> bool:
+        """Показ результатов из FSM без пересчета и обращений к бэкенду"""
+        data = await state.get_data()
+        result_text = data.get("result_text")
+        if result_text is None:
+            return False
         
-        await callback.message.edit_text(result_text, reply_markup=reply_markup)
-        await state.set_state(QuestionnaireStates.completed)
+        await callback.message.edit_text(result_text, reply_markup=RESULT_KEYBOARDS[data.get("language", "ru")])
+        return True
 
     @dp.callback_query(F.data == "consultation")
     async def handle_consultation(callback: types.CallbackQuery, state: FSMContext):
@@ -298,7 +366,7 @@ def register_handlers():
         """Перезапуск анкеты"""
         await callback.answer()
         await state.clear()
-        await cmd_start(callback.message, state)
+        await send_welcome(callback.message, state)
 
     @dp.message(F.text == "/cancel")
     async def cancel_questionnaire(message: types.Message, state: FSMContext):
@@ -307,30 +375,34 @@ def register_handlers():
         await message.answer("Анкета отменена. Используйте /start для начала.")
 
     @dp.errors()
-    async def error_handler(update: types.Update, exception: Exception):
-        """Обработчик ошибок бота"""
-        logger.error(f"Bot error: {exception}")
-        logger.error(f"Update: {update}")
+    async def error_handler(event: types.ErrorEvent):
+        """Обработчик ошибок бота: запись в лог и ответ пользователю"""
+        logger.error("Bot error: %s", event.exception, exc_info=event.exception)
+        logger.error("Update: %s", event.update)
+        try:
+            if event.update.callback_query:
+                await event.update.callback_query.answer(ERROR_TEXT, show_alert=True)
+            elif event.update.message:
+                await event.update.message.answer(ERROR_TEXT)
+        except Exception as e:
+            logger.warning("Failed to send error reply: %s", e)
 
     @dp.callback_query(F.data == "detailed_report")
     async def handle_detailed_report(callback: types.CallbackQuery, state: FSMContext):
         """Обработчик подробного отчета"""
-        logger.info(f"User {callback.from_user.id} requested detailed report")
+        logger.info("User %s requested detailed report", callback.from_user.id)
         await callback.answer()
         
         data = await state.get_data()
         language = data.get("language", "ru")
-        responses = data.get("responses", {})
+        answers = get_answer_vector(data)
         
         # Формируем подробный отчет
         report = "📊 Подробный отчет по анкете\n\n" if language == "ru" else "📊 Detailed questionnaire report\n\n"
         
-        # Статистика ответов
-        total_questions = len(responses)
-        yes_count = sum(1 for answer in responses.values() if answer in ["Да", "Yes"])
-        no_count = sum(1 for answer in responses.values() if answer in ["Нет", "No"])
-        sometimes_count = sum(1 for answer in responses.values() if answer in ["Иногда", "Sometimes"])
-        difficult_count = sum(1 for answer in responses.values() if answer in ["Затрудняюсь ответить", "Difficult to answer"])
+        # Статистика ответов (коды в порядке вариантов: да, нет, иногда, затрудняюсь)
+        total_questions = len(answers)
+        yes_count, no_count, sometimes_count, difficult_count = answers.counts()
         
         report += f"Всего вопросов: {total_questions}\n" if language == "ru" else f"Total questions: {total_questions}\n"
         report += f"Ответов 'Да': {yes_count}\n" if language == "ru" else f"'Yes' answers: {yes_count}\n"
@@ -361,7 +433,7 @@ def register_handlers():
     @dp.callback_query(F.data == "useful_materials")
     async def handle_useful_materials(callback: types.CallbackQuery, state: FSMContext):
         """Обработчик полезных материалов"""
-        logger.info(f"User {callback.from_user.id} requested useful materials")
+        logger.info("User %s requested useful materials", callback.from_user.id)
         await callback.answer()
         
         data = await state.get_data()
@@ -407,24 +479,25 @@ def register_handlers():
     @dp.callback_query(F.data == "back_to_results")
     async def back_to_results(callback: types.CallbackQuery, state: FSMContext):
         """Возврат к результатам"""
-        logger.info(f"User {callback.from_user.id} returned to results")
+        logger.info("User %s returned to results", callback.from_user.id)
         await callback.answer()
         
-        # Повторно показываем результаты
-        await complete_questionnaire(callback, state)
+        # Результаты берутся из кэша FSM; без кэша (сессии старого формата) считаются заново
+        if not await show_cached_results(callback, state):
+            await complete_questionnaire(callback, state)
 
     @dp.callback_query(F.data == "main_menu")
     async def main_menu(callback: types.CallbackQuery, state: FSMContext):
         """Главное меню"""
-        logger.info(f"User {callback.from_user.id} accessed main menu")
+        logger.info("User %s accessed main menu", callback.from_user.id)
         await callback.answer()
         await state.clear()
-        await cmd_start(callback.message, state)
+        await send_welcome(callback.message, state)
 
     @dp.callback_query(F.data == "previous_results")
     async def previous_results(callback: types.CallbackQuery, state: FSMContext):
         """Показ предыдущих результатов"""
-        logger.info(f"User {callback.from_user.id} requested previous results")
+        logger.info("User %s requested previous results", callback.from_user.id)
         await callback.answer()
         
         data = await state.get_data()
@@ -450,7 +523,7 @@ def register_handlers():
     @dp.callback_query(F.data == "contact_us")
     async def contact_us(callback: types.CallbackQuery, state: FSMContext):
         """Обработчик контактов"""
-        logger.info(f"User {callback.from_user.id} requested contact information")
+        logger.info("User %s requested contact information", callback.from_user.id)
         await callback.answer()
         
         data = await state.get_data()
@@ -478,130 +551,123 @@ def register_handlers():
         
         await callback.message.edit_text(contact_text, reply_markup=reply_markup)
 
-# Инициализация NestJS сервиса
-nestjs_service = NestJSService()
+def render_result_text(risk_result: dict, language: str) -> str:
+    """Текст сообщения с результатами анкеты"""
+    risk_level_text = {
+        "low": "Низкий" if language == "ru" else "Low",
+        "medium": "Средний" if language == "ru" else "Medium", 
+        "high": "Высокий" if language == "ru" else "High"
+    }.get(risk_result['risk_level'], "Неизвестно")
+    
+    if language == "ru":
+        result_text = f"📊 Результаты анкеты\n\n"
+        result_text += f"Уровень риска: {risk_level_text}\n"
+        result_text += f"Балл: {risk_result['score']}/100\n\n"
+        result_text += "Рекомендации:\n"
+        for rec in risk_result['recommendations']:
+            result_text += f"• {rec}\n"
+    else:
+        result_text = f"📊 Questionnaire Results\n\n"
+        result_text += f"Risk Level: {risk_level_text}\n"
+        result_text += f"Score: {risk_result['score']}/100\n\n"
+        result_text += "Recommendations:\n"
+        for rec in risk_result['recommendations']:
+            result_text += f"• {rec}\n"
+    return result_text
 
-def calculate_risk_locally(responses: dict, language: str) -> dict:
+def get_answer_vector(data: Dict[str, Any]) -> AnswerVector:
+    """Ответы из данных FSM; сессии, начатые до упаковки ответов, хранят словарь responses"""
+    if "answers" in data:
+        return AnswerVector.unpack(data["answers"])
+    return AnswerVector.from_dict(data.get("responses") or {}, strict=False)
+
+def calculate_risk_locally(answers: AnswerVector, language: str) -> dict:
     """Локальный расчет риска на основе ответов"""
-    logger.info("Calculating risk locally from responses")
-    logger.debug(f"Responses: {responses}")
+    result = scoring_engine.score(answers, language)
+    if "score" in result:
+        logger.info("Calculated risk score: %s, level: %s", result['score'], result['risk_level'])
+    else:
+        logger.error("Error calculating risk locally: invalid responses %s", answers)
+    return result
+
+async def check_bot():
+    """Проверка для монитора зависимостей: бот настроен"""
+    if bot is None:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN is not configured")
+
+# Задачи обработки обновлений, полученных через webhook
+webhook_tasks = set()
+
+def get_webhook_url() -> str:
+    """Полный публичный адрес webhook"""
+    return f"{settings.WEBHOOK_BASE_URL.rstrip('/')}{settings.API_V1_STR}{settings.WEBHOOK_PATH}"
+
+async def feed_webhook_update(payload: Dict[str, Any]):
+    """Передача обновления из webhook в диспетчер без ожидания обработки"""
+    update = types.Update.model_validate(payload, context={"bot": bot})
+    if update_scheduler:
+        # Ждем только приема в очередь: при ее заполнении ответ Telegram
+        # задерживается, и он сам сокращает поток доставки
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error("Failed to accept webhook update %s: %s", update.update_id, e)
+        return
     
-    try:
-        score = 0
-        total_questions = len(responses)
-        
-        for question_num, answer in responses.items():
-            if isinstance(answer, str):
-                # Проверяем, является ли вопрос обратным
-                if is_reverse_question(int(question_num)):
-                    # Для обратных вопросов инвертируем логику
-                    if answer in ["Да", "Yes"]:
-                        score += 0  # Положительный ответ снижает риск
-                    elif answer in ["Нет", "No"]:
-                        score += 3  # Отрицательный ответ увеличивает риск
-                    elif answer in ["Иногда", "Sometimes"]:
-                        score += 2
-                    elif answer in ["Затрудняюсь ответить", "Difficult to answer"]:
-                        score += 1
-                else:
-                    # Обычная логика
-                    score += get_answer_weight(answer)
-                
-                # Для обратных вопросов показываем правильный вес
-                if is_reverse_question(int(question_num)):
-                    if answer in ["Да", "Yes"]:
-                        actual_weight = 0
-                    elif answer in ["Нет", "No"]:
-                        actual_weight = 3
-                    elif answer in ["Иногда", "Sometimes"]:
-                        actual_weight = 2
-                    elif answer in ["Затрудняюсь ответить", "Difficult to answer"]:
-                        actual_weight = 1
-                    else:
-                        actual_weight = get_answer_weight(answer)
-                    logger.debug(f"Question {question_num} (reverse): {answer} = {actual_weight} points")
-                else:
-                    logger.debug(f"Question {question_num}: {answer} = {get_answer_weight(answer)} points")
-        
-        # Нормализация к 100-балльной шкале
-        max_possible_score = total_questions * 3
-        normalized_score = min(100, int((score / max_possible_score) * 100))
-        
-        logger.info(f"Raw score: {score}, max possible: {max_possible_score}, normalized: {normalized_score}")
-        
-        # Определение уровня риска
-        if normalized_score <= 30:
-            risk_level = "low"
-            recommendations = [
-                "Продолжайте вести здоровый образ жизни",
-                "Регулярно проходите профилактические осмотры",
-                "Поддерживайте социальную активность"
-            ] if language == "ru" else [
-                "Continue to lead a healthy lifestyle",
-                "Regular preventive examinations",
-                "Maintain social activity"
-            ]
-            should_consult = False
-            logger.info(f"Risk level: LOW (score: {normalized_score})")
-        elif normalized_score <= 60:
-            risk_level = "medium"
-            recommendations = [
-                "Рекомендуется консультация специалиста",
-                "Увеличьте физическую активность",
-                "Тренируйте память и внимание"
-            ] if language == "ru" else [
-                "Specialist consultation is recommended",
-                "Increase physical activity",
-                "Train memory and attention"
-            ]
-            should_consult = True
-            logger.info(f"Risk level: MEDIUM (score: {normalized_score})")
-        else:
-            risk_level = "high"
-            recommendations = [
-                "Обязательная консультация невролога",
-                "Прохождение когнитивных тестов",
-                "Медицинское обследование"
-            ] if language == "ru" else [
-                "Mandatory consultation with a neurologist",
-                "Cognitive testing",
-                "Medical examination"
-            ]
-            should_consult = True
-            logger.info(f"Risk level: HIGH (score: {normalized_score})")
-        
-        logger.info(f"Calculated risk score: {normalized_score}, level: {risk_level}")
-        
-        return {
-            "score": normalized_score,
-            "risk_level": risk_level,
-            "recommendations": recommendations,
-            "should_consult": should_consult
-        }
-        
-    except Exception as e:
-        logger.error(f"Error calculating risk locally: {e}")
-        # Возвращаем безопасный результат по умолчанию
-        return {
-            "risk_score": 50,
-            "risk_level": "medium",
-            "recommendations": ["Рекомендуется консультация специалиста"] if language == "ru" else ["Specialist consultation is recommended"],
-            "should_consult": True
-        }
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    webhook_tasks.add(task)
+    task.add_done_callback(webhook_tasks.discard)
+
+async def setup_webhook():
+    """Регистрация webhook в Telegram"""
+    if not settings.WEBHOOK_BASE_URL or not settings.WEBHOOK_SECRET:
+        logger.error("Webhook mode requires WEBHOOK_BASE_URL and WEBHOOK_SECRET, webhook is not registered")
+        return
+    
+    # Регистрация повторяется при каждом запуске: getWebhookInfo не возвращает
+    # секрет, и сравнение по адресу не заметило бы смену WEBHOOK_SECRET
+    url = get_webhook_url()
+    await bot.set_webhook(
+        url,
+        secret_token=settings.WEBHOOK_SECRET,
+        max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info("Webhook registered: %s", url)
 
 async def shutdown_bot():
     """Корректное завершение бота"""
     logger.info("Shutting down bot...")
     try:
+        if bot and settings.BOT_MODE == "webhook":
+            # Дожидаемся обработки уже принятых обновлений
+            if webhook_tasks:
+                await asyncio.wait(webhook_tasks, timeout=5.0)
+            if settings.WEBHOOK_DELETE_ON_SHUTDOWN and settings.WORKERS > 1:
+                # Остальные воркеры продолжают принимать обновления по тому же webhook
+                logger.warning("WEBHOOK_DELETE_ON_SHUTDOWN is ignored with WORKERS=%s", settings.WORKERS)
+            elif settings.WEBHOOK_DELETE_ON_SHUTDOWN:
+                await bot.delete_webhook()
+                logger.info("Webhook deleted")
+        
+        # Дожидаемся обновлений, уже стоящих в очередях чатов
+        if update_scheduler:
+            await update_scheduler.drain(timeout=5.0)
+
         if bot:
             await bot.session.close()
         
-        # Закрываем NestJS сервис
-        await nestjs_service.close()
+        # Закрываем хранилище FSM
+        if dp:
+            await dp.storage.close()
+        if throttling:
+            await throttling.limiter.close()
+        if leader_election:
+            await leader_election.close()
         
         logger.info("Bot shutdown completed")
     except Exception as e:
-        logger.error(f"Error during bot shutdown: {e}")
+        logger.error("Error during bot shutdown: %s", e)
 
 async def start_bot():
     """Запуск бота"""
@@ -611,12 +677,36 @@ async def start_bot():
         logger.info("Bot start skipped: TELEGRAM_BOT_TOKEN is not configured")
         return
     
+    if settings.BOT_MODE == "webhook":
+        # Обновления приходят в API, завершение выполняется в lifespan
+        try:
+            await setup_webhook()
+        except Exception as e:
+            logger.error("Webhook registration failed: %s", e)
+        return
+    
+    # С очередью обновлений polling передает их по одному и останавливается,
+    # пока очередь заполнена; без нее aiogram создает задачу на каждое обновление
+    polling_options = {"handle_signals": False, "handle_as_tasks": update_scheduler is None}
+    
+    if settings.WORKERS > 1 and leader_election is None:
+        logger.warning("Polling with several workers starts duplicate pollers, use BOT_MODE=webhook or LEADER_LOCK")
+    
     try:
         # Запускаем бота с обработкой сигналов завершения
-        # В aiogram v3 рекомендуется вызывать start_polling на Dispatcher
-        await dp.start_polling(bot)
+        # В aiogram v3 рекомендуется вызывать start_polling на Dispatcher.
+        # Сигналы обрабатывает uvicorn: иначе aiogram перехватывает SIGTERM,
+        # останавливает только polling, и процесс не завершается
+        if leader_election:
+            # Сессия бота нужна и после потери лидерства (доставка, ответы), ее закрывает shutdown_bot
+            await leader_election.run(
+                partial(dp.start_polling, bot, **polling_options, close_bot_session=False),
+                stop=dp.stop_polling
+            )
+        else:
+            await dp.start_polling(bot, **polling_options)
     except Exception as e:
-        logger.error(f"Bot failed to start: {e}")
+        logger.error("Bot failed to start: %s", e)
     finally:
         await shutdown_bot()
 
@@ -0,0 +1,164 @@
+"""
+FSM context with a single load and a single write per update
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, cast
+
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from app.bot.storage import state_name
+from app.logger import get_logger
+from app.metrics import latency, metrics
+
+logger = get_logger("bot.fsm")
+
+fsm_writes = metrics.counter(
+    "fsm_writes_total", "FSM write-backs at the end of an update", ["result"]
+)
+
+
+class FSMConflictError(Exception):
+    """Запись FSM не удалась: другой процесс изменил запись после чтения"""
+
+    def __init__(self, key: StorageKey):
+        super().__init__(f"FSM record for chat {key.chat_id} changed concurrently, update changes discarded")
+        self.key = key
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext, читающий состояние и данные из хранилища один раз.
+
+    Изменения копятся в памяти и записываются flush() одним запросом, если
+    что-то менялось. Запись проходит, только если версия записи в хранилище
+    не изменилась с чтения; иначе ее уже изменил другой процесс, и изменения,
+    посчитанные по устаревшему чтению, не записываются.
+    """
+
+    def __init__(self, storage, key: StorageKey):
+        super().__init__(storage, key)
+        self.loaded = False
+        self.dirty = False
+        self.version = 0
+        self._state: Optional[str] = None
+        self._data: Dict[str, Any] = {}
+
+    async def load(self):
+        if self.loaded:
+            return
+        started = time.perf_counter()
+        self._state, self._data, self.version = await self.storage.load(self.key)
+        latency.observe("fsm.load", time.perf_counter() - started)
+        self.loaded = True
+
+    async def get_state(self) -> Optional[str]:
+        await self.load()
+        return self._state
+
+    async def set_state(self, state: StateType = None) -> None:
+        await self.load()
+        self._state = state_name(state)
+        self.dirty = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        await self.load()
+        return self._data.copy()
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        await self.load()
+        self._data = data.copy()
+        self.dirty = True
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        await self.load()
+        self._data.update(kwargs)
+        self.dirty = True
+        return self._data.copy()
+
+    async def flush(self) -> bool:
+        """Запись изменений; False - запись изменена другим процессом после чтения"""
+        if not self.dirty:
+            return True
+        started = time.perf_counter()
+        written = await self.storage.save(self.key, self._state, self._data, self.version)
+        latency.observe("fsm.save", time.perf_counter() - started)
+        if written:
+            self.version += 1
+            self.dirty = False
+        return written
+
+    def discard(self):
+        """Отказ от несохраненных изменений (следующее чтение - из хранилища)"""
+        self.loaded = False
+        self.dirty = False
+
+
+class BufferedFSMContextMiddleware(FSMContextMiddleware):
+    """
+    Замена FSMContextMiddleware aiogram: в data["state"] передается
+    BufferedFSMContext, изменения записываются после обработки обновления.
+
+    Хранилище должно поддерживать load() и save() (см. app.bot.storage).
+    Изменения записываются, только если обработчик завершился без исключения.
+    При конфликте версий они отбрасываются, и обновление завершается
+    FSMConflictError: повтор значений, посчитанных по устаревшему чтению,
+    затер бы изменения другого процесса.
+    Регистрируется после UpdateSchedulerMiddleware, чтобы состояние читалось
+    уже в очереди чата, после записи предыдущего обновления.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        bot: Bot = cast(Bot, data["bot"])
+        context = self.resolve_event_context(bot, data)
+        data["fsm_storage"] = self.storage
+        if context is None:
+            return await handler(event, data)
+
+        async with self.events_isolation.lock(key=context.key):
+            data.update({"state": context, "raw_state": await context.get_state()})
+            try:
+                result = await handler(event, data)
+            except BaseException:
+                # Изменения оборванного обработчика не записываются
+                if context.dirty:
+                    fsm_writes.inc(result="discarded")
+                context.discard()
+                raise
+            await self.flush(context)
+            return result
+
+    async def flush(self, context: BufferedFSMContext):
+        if not context.dirty:
+            fsm_writes.inc(result="clean")
+            return
+        if await context.flush():
+            fsm_writes.inc(result="written")
+            return
+        logger.warning("FSM record for chat %s changed concurrently, update changes discarded", context.key.chat_id)
+        fsm_writes.inc(result="conflict")
+        context.discard()
+        raise FSMConflictError(context.key)
+
+    def get_context(
+        self,
+        bot: Bot,
+        chat_id: int,
+        user_id: int,
+        thread_id: Optional[int] = None,
+        destiny: str = DEFAULT_DESTINY
+    ) -> BufferedFSMContext:
+        return BufferedFSMContext(
+            self.storage,
+            StorageKey(user_id=user_id, chat_id=chat_id, bot_id=bot.id, thread_id=thread_id, destiny=destiny)
+        )
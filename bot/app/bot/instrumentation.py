@@ -0,0 +1,114 @@
+"""
+Prometheus metrics for bot updates and handlers
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+
+from app.config import settings
+from app.bot.storage import count_states
+from app.metrics import latency, metrics
+
+updates_total = metrics.counter(
+    "updates_total", "Telegram updates processed by the dispatcher", ["type", "result"]
+)
+handler_duration = metrics.histogram(
+    "handler_duration_seconds", "aiogram handler execution time", ["handler"]
+)
+handler_cpu = metrics.histogram(
+    "handler_cpu_seconds", "CPU time of the event loop thread while the handler was running", ["handler"]
+)
+questionnaires_started = metrics.counter(
+    "questionnaires_started_total", "Questionnaires started", ["language"]
+)
+questionnaires_completed = metrics.counter(
+    "questionnaires_completed_total", "Questionnaires completed, by computed risk level", ["language", "risk_level"]
+)
+# Все воркеры считают одно общее хранилище - берется максимум, а не сумма
+fsm_states = metrics.gauge(
+    "fsm_states", "Users in each FSM state", ["state"], multiprocess_mode="livemax"
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: счетчик по типу и результату обработки"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        try:
+            result = await handler(event, data)
+        except Exception:
+            updates_total.inc(type=update_type, result="error")
+            raise
+        updates_total.inc(type=update_type, result="unhandled" if result is UNHANDLED else "handled")
+        return result
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: реальное и процессорное время выбранного обработчика.
+
+    Процессорное время - thread_time потока event loop за время обработчика;
+    при ожидании ввода-вывода в него попадают и другие задачи, поэтому под
+    нагрузкой это верхняя оценка.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            return await handler(event, data)
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+            handler_duration.observe(wall, handler=name)
+            handler_cpu.observe(cpu, handler=name)
+            latency.observe(f"handler.{name}", wall)
+            latency.observe(f"handler.{name}.cpu", cpu)
+
+
+class FSMStateCollector:
+    """Сборщик числа пользователей по состояниям; результат кэшируется на интервал"""
+
+    def __init__(self, storage, interval: float):
+        self.storage = storage
+        self.interval = interval
+        self.collected_at = 0.0
+        self.reported = set()
+
+    async def __call__(self):
+        now = time.monotonic()
+        if self.collected_at and now - self.collected_at < self.interval:
+            return
+        self.collected_at = now
+        states = await count_states(self.storage)
+        # Исчезнувшие состояния обнуляются: в режиме нескольких воркеров
+        # удаленные ряды остались бы в файлах метрик с прежним значением
+        for state in self.reported - states.keys():
+            fsm_states.set(0, state=state)
+        for state, count in states.items():
+            fsm_states.set(count, state=state)
+        self.reported = set(states)
+
+
+def setup_instrumentation(dp):
+    """Подключение метрик к диспетчеру"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    metrics.add_collector(FSMStateCollector(dp.storage, settings.METRICS_FSM_REFRESH_INTERVAL))
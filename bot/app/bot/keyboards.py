@@ -0,0 +1,80 @@
+"""
+Precompiled questionnaire keyboards and callback data
+"""
+from typing import Dict, Tuple
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from app.config import settings
+from app.data.questionnaire_data import ANSWERS, get_answers, get_questions
+
+
+class AnswerCallback(CallbackData, prefix="a"):
+    """Ответ на вопрос: номер вопроса и индекс варианта ответа ("a:12:3")"""
+    q: int
+    a: int
+
+
+def build_question_keyboards() -> Dict[Tuple[str, int], InlineKeyboardMarkup]:
+    """Клавиатуры с вариантами ответов для каждой пары (язык, вопрос)"""
+    keyboards = {}
+    for language in ANSWERS:
+        answers = get_answers(language)
+        for question_number in get_questions(language):
+            keyboards[(language, question_number)] = InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(
+                    text=answer,
+                    callback_data=AnswerCallback(q=question_number, a=index).pack()
+                )]
+                for index, answer in enumerate(answers)
+            ])
+    return keyboards
+
+
+def build_question_texts() -> Dict[Tuple[str, int], str]:
+    """Готовые тексты вопросов с нумерацией"""
+    texts = {}
+    for language in ANSWERS:
+        questions = get_questions(language)
+        for question_number, question_text in questions.items():
+            texts[(language, question_number)] = f"Вопрос {question_number} из {len(questions)}:\n\n{question_text}"
+    return texts
+
+
+def build_result_keyboard(language: str) -> InlineKeyboardMarkup:
+    """Кнопки действий под результатами анкеты"""
+    keyboard = [
+        [InlineKeyboardButton(
+            text="📊 Подробный отчет" if language == "ru" else "📊 Detailed Report",
+            callback_data="detailed_report"
+        )],
+        [InlineKeyboardButton(
+            text="📚 Полезные материалы" if language == "ru" else "📚 Useful Materials",
+            callback_data="useful_materials"
+        )],
+        [InlineKeyboardButton(
+            text="👨‍⚕️ Консультация" if language == "ru" else "👨‍⚕️ Consultation",
+            callback_data="consultation"
+        )]
+    ]
+
+    # Кнопка перехода в приложение (если URL настроен)
+    if settings.MAIN_PAGE_URL:
+        keyboard.append([InlineKeyboardButton(
+            text="📱 Открыть приложение" if language == "ru" else "📱 Open App",
+            url=settings.MAIN_PAGE_URL
+        )])
+
+    # Кнопка перезапуска
+    keyboard.append([InlineKeyboardButton(
+        text="🔄 Пройти заново" if language == "ru" else "🔄 Restart",
+        callback_data="restart"
+    )])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+# Собираются один раз при импорте модуля
+QUESTION_KEYBOARDS = build_question_keyboards()
+QUESTION_TEXTS = build_question_texts()
+RESULT_KEYBOARDS = {language: build_result_keyboard(language) for language in ANSWERS}
@@ -0,0 +1,261 @@
+"""
+Leader election for the single polling replica
+"""
+import asyncio
+import hashlib
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import get_engine
+from app.logger import get_logger
+from app.metrics import metrics
+
+logger = get_logger("leader")
+
+polling_leader = metrics.gauge("bot_polling_leader", "1 if this process holds the polling leader lock")
+
+# Продление блокировки и освобождение только своим токеном
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def advisory_lock_id(key: str) -> int:
+    """Ключ pg_advisory_lock (bigint) из строкового имени блокировки"""
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big", signed=True)
+
+
+class PostgresLeaderLock:
+    """
+    Сессионная advisory-блокировка Postgres.
+
+    Соединение с блокировкой держится открытым (в режиме autocommit, чтобы
+    не оставлять транзакцию idle in transaction); при обрыве соединения
+    сервер снимает блокировку сам.
+    """
+
+    backend = "postgres"
+
+    def __init__(self, key: str):
+        self.key = key
+        self.lock_id = advisory_lock_id(key)
+        self.connection = None
+
+    async def acquire(self) -> bool:
+        connection = await get_engine().connect()
+        try:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = await connection.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": self.lock_id})
+        except Exception:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    async def renew(self) -> bool:
+        """Блокировка удерживается, пока живо соединение"""
+        await self.connection.scalar(text("SELECT 1"))
+        return True
+
+    async def release(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            await connection.scalar(text("SELECT pg_advisory_unlock(:id)"), {"id": self.lock_id})
+        except Exception as e:
+            # Соединение оборвано - сервер уже снял блокировку вместе с сессией
+            logger.debug("Advisory unlock failed, discarding connection: %s", e)
+            await connection.invalidate()
+        finally:
+            await connection.close()
+
+    async def close(self):
+        await self.release()
+
+
+class RedisLeaderLock:
+    """Ключ Redis с токеном владельца и TTL, продлеваемый лидером"""
+
+    backend = "redis"
+
+    def __init__(self, redis, key: str, ttl: float):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f"{socket.gethostname()}:{uuid.uuid4().hex}"
+        self.renew_script = redis.register_script(RENEW_SCRIPT)
+        self.release_script = redis.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    async def renew(self) -> bool:
+        return bool(await self.renew_script(keys=[self.key], args=[self.token, self.ttl_ms]))
+
+    async def release(self):
+        await self.release_script(keys=[self.key], args=[self.token])
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+async def cancel_tasks(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class LeaderElection:
+    """
+    Запуск задачи только в процессе, удерживающем блокировку.
+
+    Остальные процессы пытаются захватить блокировку раз в check_interval.
+    Лидер с тем же периодом подтверждает владение; при потере блокировки
+    (обрыв соединения, истекший TTL) задача останавливается, и процесс снова
+    становится кандидатом.
+    """
+
+    def __init__(self, lock, check_interval: float, stop_timeout: float = 10.0):
+        self.lock = lock
+        self.check_interval = check_interval
+        self.stop_timeout = stop_timeout
+        self.is_leader = False
+        self.elections_won = 0
+        self.leadership_lost = 0
+        self.last_error: Optional[str] = None
+
+    async def run(self, job: Callable[[], Awaitable[Any]], stop: Optional[Callable[[], Awaitable[Any]]] = None):
+        """
+        Выполнение job() под блокировкой; возвращается, когда job завершилась сама
+
+        stop() просит job завершиться (для polling - dp.stop_polling): при отмене
+        задачи start_polling aiogram внутренний цикл getUpdates продолжает
+        работать. Задача отменяется, только если не завершилась за stop_timeout.
+        """
+        job_task = hold_task = None
+        try:
+            while True:
+                await self._wait_for_leadership()
+                job_task = asyncio.create_task(job())
+                hold_task = asyncio.create_task(self._hold())
+                await asyncio.wait([job_task, hold_task], return_when=asyncio.FIRST_COMPLETED)
+
+                if job_task.done():
+                    return job_task.result()
+
+                # Блокировка потеряна: другой процесс может уже быть лидером
+                self.leadership_lost += 1
+                logger.warning("Lost %s leader lock, stopping job", self.lock.backend)
+                await self._stop_job(job_task, stop)
+                await self._release()
+        finally:
+            if hold_task is not None:
+                await cancel_tasks([hold_task])
+            if job_task is not None:
+                await self._stop_job(job_task, stop)
+            await self._release()
+
+    async def _stop_job(self, job_task: asyncio.Task, stop: Optional[Callable[[], Awaitable[Any]]]):
+        """Штатная остановка задачи через stop(), отмена - если не помогло"""
+        if job_task.done():
+            await cancel_tasks([job_task])
+            return
+        if stop is not None:
+            try:
+                await asyncio.wait_for(stop(), self.stop_timeout)
+            except Exception as e:
+                logger.warning("Job did not stop gracefully, cancelling it: %s", e or type(e).__name__)
+            await asyncio.wait([job_task], timeout=self.stop_timeout)
+        await cancel_tasks([job_task])
+
+    async def _wait_for_leadership(self):
+        logged_waiting = False
+        while True:
+            try:
+                if await self.lock.acquire():
+                    break
+                self.last_error = None
+                if not logged_waiting:
+                    logger.info("Another process holds the %s leader lock, waiting", self.lock.backend)
+                    logged_waiting = True
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("Leader lock acquire failed: %s", self.last_error)
+            await asyncio.sleep(self.check_interval)
+
+        self.is_leader = True
+        self.elections_won += 1
+        polling_leader.set(1)
+        logger.info("Acquired %s leader lock", self.lock.backend)
+
+    async def _hold(self):
+        """Возвращается при потере блокировки"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                if not await self.lock.renew():
+                    return
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("Leader lock renewal failed: %s", self.last_error)
+                return
+
+    async def _release(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        polling_leader.set(0)
+        try:
+            await self.lock.release()
+        except Exception as e:
+            logger.warning("Leader lock release failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.lock.backend,
+            "is_leader": self.is_leader,
+            "elections_won": self.elections_won,
+            "leadership_lost": self.leadership_lost,
+            "last_error": self.last_error
+        }
+
+    async def close(self):
+        await self._release()
+        await self.lock.close()
+
+
+def create_leader_election() -> Optional[LeaderElection]:
+    """Выбор лидера для polling согласно настройкам (None - отключено)"""
+    backend = settings.LEADER_LOCK.lower()
+    if backend == "off":
+        return None
+
+    if backend == "postgres":
+        lock = PostgresLeaderLock(settings.LEADER_LOCK_KEY)
+    elif backend == "redis":
+        from app.bot.storage import create_redis_client
+        lock = RedisLeaderLock(create_redis_client(), settings.LEADER_LOCK_KEY, settings.LEADER_LOCK_TTL)
+        if settings.LEADER_LOCK_TTL <= settings.LEADER_CHECK_INTERVAL * 2:
+            logger.warning("LEADER_LOCK_TTL should exceed two LEADER_CHECK_INTERVAL periods, the lock may expire between renewals")
+    else:
+        raise ValueError(f"Unknown LEADER_LOCK backend: {settings.LEADER_LOCK}")
+
+    logger.info("Using leader lock: %s", backend)
+    return LeaderElection(lock, settings.LEADER_CHECK_INTERVAL)
@@ -0,0 +1,82 @@
+"""
+Redis FSM storage with record versions
+"""
+from typing import Any, Dict
+
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from app.bot.storage import FSMSnapshot, state_name
+
+# Запись состояния, данных и версии, только если версия не изменилась с чтения
+REDIS_SAVE_SCRIPT = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+local ttl = tonumber(ARGV[4])
+for i, value in ipairs({ARGV[2], ARGV[3]}) do
+    if value == '' then
+        redis.call('DEL', KEYS[i])
+    elseif ttl > 0 then
+        redis.call('SET', KEYS[i], value, 'PX', ttl)
+    else
+        redis.call('SET', KEYS[i], value)
+    end
+end
+local version = redis.call('INCR', KEYS[3])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[3], ttl)
+end
+return version
+"""
+
+
+class VersionedRedisStorage(RedisStorage):
+    """
+    RedisStorage с версиями записей: load() и save() для BufferedFSMContext
+    
+    Версия хранится отдельным ключом рядом с состоянием и данными. load()
+    читает все три ключа одним MGET, save() - один вызов Lua-скрипта,
+    который пишет только при совпадении версии.
+    """
+
+    def __init__(self, redis, **kwargs):
+        super().__init__(redis, **kwargs)
+        self.save_script = redis.register_script(REDIS_SAVE_SCRIPT)
+
+    def _keys(self, key: StorageKey):
+        return [self.key_builder.build(key, part) for part in ("state", "data", "version")]
+
+    def _ttl_ms(self) -> int:
+        return int(self.state_ttl * 1000) if self.state_ttl else 0
+
+    async def _bump_version(self, key: StorageKey):
+        """Увеличение версии с тем же TTL, что у состояния и данных (как в save())"""
+        version_key = self.key_builder.build(key, "version")
+        ttl_ms = self._ttl_ms()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(version_key)
+            if ttl_ms:
+                pipe.pexpire(version_key, ttl_ms)
+            await pipe.execute()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await super().set_state(key, state)
+        await self._bump_version(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await super().set_data(key, data)
+        await self._bump_version(key)
+
+    async def load(self, key: StorageKey) -> FSMSnapshot:
+        state, data, version = await self.redis.mget(self._keys(key))
+        if isinstance(state, bytes):
+            state = state.decode("utf-8")
+        return FSMSnapshot(state, self.json_loads(data) if data else {}, int(version or 0))
+
+    async def save(self, key: StorageKey, state: StateType, data: Dict[str, Any], version: int) -> bool:
+        written = await self.save_script(
+            keys=self._keys(key),
+            args=[version, state_name(state) or "", self.json_dumps(data) if data else "", self._ttl_ms()]
+        )
+        return bool(written)
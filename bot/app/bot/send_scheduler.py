@@ -0,0 +1,210 @@
+"""
+Outgoing Telegram API request scheduler
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType, Response
+from aiogram.types import TelegramObject
+
+from app.logger import get_logger
+from app.metrics import latency
+
+logger = get_logger("send_scheduler")
+
+# Полосы приоритета: меньшее значение обслуживается раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BROADCAST = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_DEFAULT: "default",
+    PRIORITY_BROADCAST: "broadcast"
+}
+
+# Приоритет, заданный вызывающим кодом (например, рассылкой)
+current_priority: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("send_priority", default=None)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+    """Все запросы к Telegram внутри блока идут в указанной полосе"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class InteractivePriorityMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: все ответы из обработчиков (и sendMessage
+    на /start, и правки) идут в интерактивной полосе. Иначе при насыщении
+    глобального лимита правки других пользователей бесконечно обгоняют
+    первое сообщение нового пользователя.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with send_priority(PRIORITY_INTERACTIVE):
+            return await handler(event, data)
+
+
+def get_method_priority(method: TelegramMethod) -> int:
+    """Полоса по умолчанию: правки сообщений - интерактивные, остальное - обычные"""
+    priority = current_priority.get()
+    if priority is not None:
+        return priority
+    if type(method).__name__.startswith("Edit"):
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_DEFAULT
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot, выдерживающий лимиты Telegram.
+
+    Запросы с chat_id проходят два этапа:
+    1. Лимит чата (GCRA): запрос резервирует ближайшее время отправки в своем
+       чате, порядок внутри чата сохраняется; состояние - одно число на чат.
+    2. Глобальный лимит: разрешения выдаются с частотой global_rate из кучи,
+       упорядоченной по (полоса, порядок поступления), поэтому правки
+       пользователю обгоняют рассылку.
+    Ответ 429 сдвигает расписание чата на retry_after, запрос повторяется.
+    Служебные методы без chat_id (getUpdates, answerCallbackQuery) не ограничиваются.
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int, max_retries: int):
+        self.global_interval = 1.0 / global_rate
+        self.chat_interval = 1.0 / chat_rate
+        self.chat_tolerance = max(0, chat_burst - 1) * self.chat_interval
+        self.max_retries = max_retries
+
+        self._global_tat = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        # chat_id -> теоретическое время следующей отправки, в порядке обращения
+        self._chats: "OrderedDict[Any, float]" = OrderedDict()
+
+        # Метрики
+        self.chat_waiting = 0
+        self.sent_total = Counter()
+        self.retry_after_total = 0
+        self.last_retry_after: Optional[float] = None
+        self.failed_total = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = get_method_priority(method)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+                self.sent_total[PRIORITY_NAMES.get(priority, str(priority))] += 1
+                return response
+            except TelegramRetryAfter as e:
+                self.retry_after_total += 1
+                self.last_retry_after = e.retry_after
+                self._postpone_chat(chat_id, e.retry_after)
+                if attempt >= self.max_retries:
+                    self.failed_total += 1
+                    raise
+                logger.warning("Telegram flood control for chat %s: retry in %ss", chat_id, e.retry_after)
+
+    async def _acquire(self, chat_id: Any, priority: int):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        delay = self._reserve_chat(chat_id, started)
+        if delay > 0:
+            self.chat_waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.chat_waiting -= 1
+
+        await self._acquire_global(priority)
+        latency.observe("telegram.send_wait", loop.time() - started)
+
+    def _reserve_chat(self, chat_id: Any, now: float) -> float:
+        """Резервирование слота в чате; возвращает задержку до отправки"""
+        tat = max(self._chats.pop(chat_id, now), now)
+        self._chats[chat_id] = tat + self.chat_interval
+
+        # Чаты, чье расписание уже в прошлом, эквивалентны новым
+        while self._chats:
+            oldest, oldest_tat = next(iter(self._chats.items()))
+            if oldest_tat > now:
+                break
+            del self._chats[oldest]
+
+        return max(0.0, tat - now - self.chat_tolerance)
+
+    def _postpone_chat(self, chat_id: Any, retry_after: float):
+        now = asyncio.get_running_loop().time()
+        self._chats.pop(chat_id, None)
+        self._chats[chat_id] = now + retry_after + self.chat_tolerance
+
+    async def _acquire_global(self, priority: int):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Быстрый путь: очереди нет и слот свободен
+        if not self._waiters and now >= self._global_tat:
+            self._global_tat = now + self.global_interval
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """Выдача глобальных разрешений в порядке приоритета"""
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            wait = self._global_tat - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидавший запрос был отменен
+                continue
+            self._global_tat = loop.time() + self.global_interval
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очередей по полосам и счетчики отправки"""
+        depth = Counter(PRIORITY_NAMES.get(priority, str(priority)) for priority, _, future in self._waiters if not future.done())
+        return {
+            "queue_depth": {name: depth.get(name, 0) for name in PRIORITY_NAMES.values()},
+            "chat_waiting": self.chat_waiting,
+            "tracked_chats": len(self._chats),
+            "sent_total": dict(self.sent_total),
+            "retry_after_total": self.retry_after_total,
+            "last_retry_after": self.last_retry_after,
+            "failed_total": self.failed_total
+        }
@@ -0,0 +1,262 @@
+"""
+FSM storage backends for AsyaBot
+"""
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, NamedTuple, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey, DEFAULT_DESTINY
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import case, delete, func, null, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.models.fsm import FSMRecord
+
+logger = get_logger("bot.storage")
+
+# Как часто удалять просроченные записи из таблицы (секунды)
+PURGE_INTERVAL = 600
+
+
+class FSMSnapshot(NamedTuple):
+    """Состояние и данные FSM с версией записи (0 - записи нет)"""
+    state: Optional[str]
+    data: Dict[str, Any]
+    version: int
+
+
+def state_name(state: StateType) -> Optional[str]:
+    """Имя состояния для записи в хранилище"""
+    return state.state if isinstance(state, State) else state
+
+
+class VersionedMemoryStorage(MemoryStorage):
+    """
+    MemoryStorage с версиями записей: load() и save() для BufferedFSMContext
+    
+    Версия увеличивается при каждой записи, в том числе через set_state/set_data.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.versions: Dict[StorageKey, int] = {}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await super().set_state(key, state)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await super().set_data(key, data)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    async def load(self, key: StorageKey) -> FSMSnapshot:
+        record = self.storage.get(key)
+        if record is None:
+            return FSMSnapshot(None, {}, 0)
+        return FSMSnapshot(record.state, record.data.copy(), self.versions.get(key, 0))
+
+    async def save(self, key: StorageKey, state: StateType, data: Dict[str, Any], version: int) -> bool:
+        if self.versions.get(key, 0) != version:
+            return False
+        record = self.storage[key]
+        record.state = state_name(state)
+        record.data = data.copy()
+        self.versions[key] = version + 1
+        return True
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище FSM в PostgreSQL через общий движок app.database"""
+
+    def __init__(self, prefix: str = "fsm", ttl: Optional[int] = None):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    def _build_key(self, key: StorageKey) -> str:
+        """Построение ключа записи с префиксом"""
+        parts = [self.prefix, str(key.bot_id), str(key.chat_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        parts.append(str(key.user_id))
+        if key.destiny != DEFAULT_DESTINY:
+            parts.append(key.destiny)
+        return ":".join(parts)
+
+    def _expires_at(self) -> Optional[datetime]:
+        if not self.ttl:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    async def _read(self, record_key: str) -> Optional[FSMRecord]:
+        async with SessionLocal() as db:
+            now = datetime.now(timezone.utc)
+            result = await db.execute(
+                select(FSMRecord).where(
+                    FSMRecord.key == record_key,
+                    or_(FSMRecord.expires_at.is_(None), FSMRecord.expires_at > now)
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def _write(self, record_key: str, values: Dict[str, Any]):
+        """Запись состояния или данных; у истекшей записи вторая колонка очищается"""
+        expired = FSMRecord.expires_at <= datetime.now(timezone.utc)
+        cleared = {
+            column: case((expired, null()), else_=getattr(FSMRecord, column))
+            for column in ("state", "data") if column not in values
+        }
+        values["expires_at"] = self._expires_at()
+        statement = insert(FSMRecord).values(key=record_key, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={**values, **cleared, "version": FSMRecord.version + 1}
+        )
+        async with SessionLocal() as db:
+            await db.execute(statement)
+            await self._purge_expired(db)
+            await db.commit()
+
+    async def _purge_expired(self, db):
+        """Периодическое удаление просроченных записей"""
+        if not self.ttl or time.monotonic() - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        result = await db.execute(
+            delete(FSMRecord).where(FSMRecord.expires_at <= datetime.now(timezone.utc))
+        )
+        logger.debug("Purged %s expired FSM records", result.rowcount)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(self._build_key(key), {"state": state_name(state)})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._read(self._build_key(key))
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._write(self._build_key(key), {"data": data.copy()})
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._read(self._build_key(key))
+        if record is None or not record.data:
+            return {}
+        return dict(record.data)
+
+    async def load(self, key: StorageKey) -> FSMSnapshot:
+        """Состояние, данные и версия одним запросом"""
+        record = await self._read(self._build_key(key))
+        if record is None:
+            return FSMSnapshot(None, {}, 0)
+        return FSMSnapshot(record.state, dict(record.data or {}), record.version)
+
+    async def save(self, key: StorageKey, state: StateType, data: Dict[str, Any], version: int) -> bool:
+        """Запись одним запросом, только если версия не изменилась с чтения (или запись истекла)"""
+        values = {"state": state_name(state), "data": data.copy(), "version": version + 1, "expires_at": self._expires_at()}
+        statement = insert(FSMRecord).values(key=self._build_key(key), **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_=values,
+            where=or_(FSMRecord.version == version, FSMRecord.expires_at <= datetime.now(timezone.utc))
+        ).returning(FSMRecord.version)
+        async with SessionLocal() as db:
+            written = (await db.execute(statement)).scalar_one_or_none() is not None
+            await self._purge_expired(db)
+            await db.commit()
+        return written
+
+    async def count_states(self) -> Dict[str, int]:
+        """Число активных записей по состояниям"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(FSMRecord.state, func.count()).where(
+                    FSMRecord.key.startswith(f"{self.prefix}:"),
+                    FSMRecord.state.is_not(None),
+                    or_(FSMRecord.expires_at.is_(None), FSMRecord.expires_at > datetime.now(timezone.utc))
+                ).group_by(FSMRecord.state)
+            )
+            return {state: count for state, count in result.all()}
+    
+    async def close(self) -> None:
+        pass
+
+
+async def count_states(storage: BaseStorage) -> Dict[str, int]:
+    """
+    Число пользователей в каждом состоянии FSM
+    
+    Для Redis ключи состояний перебираются через SCAN, поэтому вызывается
+    редко (см. METRICS_FSM_REFRESH_INTERVAL), а не на каждое обновление.
+    """
+    if isinstance(storage, MemoryStorage):
+        return dict(Counter(record.state for record in storage.storage.values() if record.state is not None))
+    if isinstance(storage, PostgresStorage):
+        return await storage.count_states()
+    
+    redis = getattr(storage, "redis", None)
+    if redis is None:
+        return {}
+    states = Counter()
+    batch = []
+    async for key in redis.scan_iter(match=f"{settings.FSM_KEY_PREFIX}:*:state", count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            states.update(value.decode() for value in await redis.mget(batch) if value is not None)
+            batch = []
+    if batch:
+        states.update(value.decode() for value in await redis.mget(batch) if value is not None)
+    return dict(states)
+
+
+async def check_storage(storage: BaseStorage):
+    """Проверка доступности хранилища FSM (исключение - недоступно)"""
+    if isinstance(storage, PostgresStorage):
+        async with SessionLocal() as db:
+            await db.execute(select(FSMRecord.key).limit(1))
+        return
+    redis = getattr(storage, "redis", None)
+    if redis is not None:
+        await redis.ping()
+
+
+def create_redis_client():
+    """Клиент Redis по REDIS_URL (fakeredis:// - для тестов)"""
+    if settings.REDIS_URL.startswith("fakeredis://"):
+        try:
+            from fakeredis.aioredis import FakeRedis
+        except ImportError as e:
+            raise RuntimeError("fakeredis is required for REDIS_URL=fakeredis://") from e
+        return FakeRedis()
+
+    from redis.asyncio import Redis
+    return Redis.from_url(settings.REDIS_URL)
+
+
+def create_redis_storage() -> BaseStorage:
+    """Хранилище FSM в Redis (или fakeredis для тестов)"""
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder
+    from app.bot.redis_storage import VersionedRedisStorage
+
+    key_builder = DefaultKeyBuilder(prefix=settings.FSM_KEY_PREFIX, with_bot_id=True, with_destiny=True)
+    ttl = settings.FSM_STATE_TTL or None
+    return VersionedRedisStorage(create_redis_client(), key_builder=key_builder, state_ttl=ttl, data_ttl=ttl)
+
+
+def create_storage() -> BaseStorage:
+    """Создание хранилища FSM согласно настройкам"""
+    backend = settings.FSM_STORAGE.lower()
+    logger.info("Using FSM storage backend: %s", backend)
+
+    if backend == "memory":
+        return VersionedMemoryStorage()
+    if backend == "redis":
+        return create_redis_storage()
+    if backend == "postgres":
+        return PostgresStorage(prefix=settings.FSM_KEY_PREFIX, ttl=settings.FSM_STATE_TTL or None)
+
+    raise ValueError(f"Unknown FSM_STORAGE backend: {settings.FSM_STORAGE}")
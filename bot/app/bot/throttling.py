@@ -0,0 +1,202 @@
+"""
+Per-user throttling of incoming updates
+"""
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger("throttling")
+
+# Группы обработчиков с отдельными лимитами
+GROUP_ANSWER = "answer"
+GROUP_CALLBACK = "callback"
+GROUP_MESSAGE = "message"
+
+THROTTLED_TEXT = {
+    "ru": "Слишком часто, подождите немного",
+    "en": "Too many requests, please wait a moment"
+}
+
+# Атомарный token bucket в Redis; время берется с сервера, чтобы воркеры
+# с расходящимися часами делили одно ведро
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return allowed
+"""
+
+
+def get_throttle_group(event: TelegramObject) -> Optional[str]:
+    """Группа лимитов по содержимому события (без обращения к хранилищу)"""
+    if isinstance(event, CallbackQuery):
+        data = event.data or ""
+        if data.startswith("a:") or data.startswith("answer_"):
+            return GROUP_ANSWER
+        return GROUP_CALLBACK
+    if isinstance(event, Message):
+        return GROUP_MESSAGE
+    return None
+
+
+class MemoryRateLimiter:
+    """
+    Token bucket в памяти процесса.
+
+    Ведра хранятся в OrderedDict в порядке последнего обращения: ведро,
+    простоявшее дольше времени полного восстановления, эквивалентно новому
+    и удаляется с начала словаря при следующих обращениях.
+    """
+
+    def __init__(self):
+        self.buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+
+    async def allow(self, key: str, rate: float, burst: int) -> bool:
+        now = time.monotonic()
+        bucket = self.buckets.pop(key, None)
+        if bucket is None:
+            tokens = float(burst)
+        else:
+            tokens, updated_at, _ = bucket
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._evict(now)
+        return allowed
+
+    def _evict(self, now: float):
+        """Удаление полностью восстановившихся ведер с начала словаря"""
+        while self.buckets:
+            key, (_, _, full_at) = next(iter(self.buckets.items()))
+            if full_at > now:
+                break
+            del self.buckets[key]
+
+    async def close(self):
+        self.buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+
+class RedisRateLimiter:
+    """Token bucket в Redis: лимиты общие для всех воркеров и реплик"""
+
+    def __init__(self, redis, prefix: str):
+        self.redis = redis
+        self.prefix = prefix
+        self.script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.errors_total = 0
+
+    async def allow(self, key: str, rate: float, burst: int) -> bool:
+        try:
+            return bool(await self.script(keys=[f"{self.prefix}:{key}"], args=[rate, burst]))
+        except Exception as e:
+            # Redis недоступен - не блокируем пользователей
+            self.errors_total += 1
+            logger.warning("Throttling store error, update allowed: %s", e)
+            return True
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: ограничивает частоту событий одного
+    пользователя до очереди обновлений, чтения FSM, фильтров и обработчиков.
+    Отклоненный callback получает только answerCallbackQuery (в обычной
+    полосе отправки), сообщения пропускаются молча.
+
+    Регистрируется на dp.update первым после встроенных middleware aiogram:
+    пользователя события к этому моменту уже определяет UserContextMiddleware.
+    """
+
+    def __init__(self, limiter, rates: Dict[str, Tuple[float, int]]):
+        self.limiter = limiter
+        self.rates = rates
+        self.throttled_total = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        # На уровне Update ограничение считается по вложенному событию
+        target = event.event if isinstance(event, Update) else event
+        group = get_throttle_group(target)
+        if user is None or group not in self.rates:
+            return await handler(event, data)
+
+        rate, burst = self.rates[group]
+        if await self.limiter.allow(f"{group}:{user.id}", rate, burst):
+            return await handler(event, data)
+
+        self.throttled_total[group] += 1
+        logger.debug("Throttled %s update from user %s", group, user.id)
+        if isinstance(target, CallbackQuery):
+            try:
+                await target.answer(THROTTLED_TEXT["ru" if user.language_code == "ru" else "en"])
+            except TelegramAPIError as e:
+                logger.debug("Failed to answer throttled callback: %s", e)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rates": {group: {"rate": rate, "burst": burst} for group, (rate, burst) in self.rates.items()},
+            "throttled_total": dict(self.throttled_total),
+            "tracked_buckets": len(self.limiter) if hasattr(self.limiter, "__len__") else None,
+            "store_errors": getattr(self.limiter, "errors_total", 0)
+        }
+
+
+def get_throttle_rates() -> Dict[str, Tuple[float, int]]:
+    """Лимиты групп из настроек; нулевая скорость отключает лимит группы"""
+    rates = {
+        GROUP_ANSWER: (settings.THROTTLE_ANSWER_RATE, settings.THROTTLE_ANSWER_BURST),
+        GROUP_CALLBACK: (settings.THROTTLE_CALLBACK_RATE, settings.THROTTLE_CALLBACK_BURST),
+        GROUP_MESSAGE: (settings.THROTTLE_MESSAGE_RATE, settings.THROTTLE_MESSAGE_BURST)
+    }
+    return {group: (rate, burst) for group, (rate, burst) in rates.items() if rate > 0 and burst > 0}
+
+
+def create_throttling_middleware() -> Optional[ThrottlingMiddleware]:
+    """Middleware ограничения частоты согласно настройкам (None - отключено)"""
+    backend = settings.THROTTLE_STORAGE.lower()
+    if backend == "off":
+        return None
+
+    if backend == "redis":
+        from app.bot.storage import create_redis_client
+        limiter = RedisRateLimiter(create_redis_client(), settings.THROTTLE_KEY_PREFIX)
+    elif backend == "memory":
+        limiter = MemoryRateLimiter()
+    else:
+        raise ValueError(f"Unknown THROTTLE_STORAGE backend: {settings.THROTTLE_STORAGE}")
+
+    logger.info("Using throttling store: %s", backend)
+    return ThrottlingMiddleware(limiter, get_throttle_rates())
@@ -0,0 +1,180 @@
+"""
+Incoming update scheduler: parallel across chats, ordered within a chat
+"""
+import asyncio
+import time
+from functools import partial
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.middlewares.error import ErrorsMiddleware
+from aiogram.types import TelegramObject
+
+from app.logger import get_logger
+from app.metrics import latency, metrics
+
+logger = get_logger("update_scheduler")
+
+update_queue_wait = metrics.histogram(
+    "update_queue_wait_seconds", "Time from accepting an update to the start of its processing"
+)
+update_admission_waits = metrics.counter(
+    "update_admission_waits_total", "Updates that waited for a free queue slot (backpressure)"
+)
+updates_queued = metrics.gauge("updates_queued", "Accepted updates not yet processed")
+updates_running = metrics.gauge("updates_running", "Updates being processed")
+update_chats_active = metrics.gauge("update_chats_active", "Chats with queued or running updates")
+
+# Задача обработки обновления
+Job = Callable[[], Awaitable[Any]]
+
+
+class UpdateScheduler:
+    """
+    Очередь обработки обновлений.
+
+    Обновления разных чатов выполняются параллельно, не больше max_concurrency
+    одновременно; обновления одного чата - строго по одному в порядке приема.
+    Принятых, но не обработанных обновлений не больше max_queued: при
+    заполнении submit() ждет, и polling перестает забирать обновления у
+    Telegram (webhook-запрос не получает ответ), пока очередь не освободится.
+    """
+
+    def __init__(self, max_concurrency: int, max_queued: int):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self._running = asyncio.Semaphore(max_concurrency)
+        self._slots = asyncio.Semaphore(max_queued)
+        # ключ чата -> ожидающие задачи; ключ есть, пока у чата работает обработчик
+        self._chats: Dict[Any, Deque[Tuple[Job, float, Optional[asyncio.Future]]]] = {}
+        self._workers = set()
+
+        # Метрики
+        self.queued = 0
+        self.running = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.admission_waits = 0
+
+    async def submit(self, key: Any, job: Job, wait: bool = False) -> Any:
+        """
+        Постановка задачи в очередь чата key (None - без упорядочивания)
+
+        Возвращается после приема; с wait=True - после выполнения, с ее результатом.
+        """
+        if self._slots.locked():
+            self.admission_waits += 1
+            update_admission_waits.inc()
+        await self._slots.acquire()
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        entry = (job, time.perf_counter(), future)
+        self.queued += 1
+
+        queue = self._chats.get(key) if key is not None else None
+        if queue is not None:
+            queue.append(entry)
+        else:
+            queue = deque([entry])
+            if key is not None:
+                self._chats[key] = queue
+            worker = asyncio.create_task(self._run_chat(key, queue))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+
+        if future is not None:
+            return await future
+        return None
+
+    async def _run_chat(self, key: Any, queue: Deque[Tuple[Job, float, Optional[asyncio.Future]]]):
+        """Последовательное выполнение задач одного чата"""
+        try:
+            while queue:
+                job, accepted, future = queue.popleft()
+                async with self._running:
+                    waited = time.perf_counter() - accepted
+                    update_queue_wait.observe(waited)
+                    latency.observe("updates.queue_wait", waited)
+                    self.queued -= 1
+                    self.running += 1
+                    try:
+                        result = await job()
+                        if future is not None and not future.done():
+                            future.set_result(result)
+                    except Exception as e:
+                        self.failed_total += 1
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                        else:
+                            logger.exception("Update processing failed for chat %s: %s", key, e)
+                    finally:
+                        if future is not None and not future.done():
+                            future.cancel()
+                        self.running -= 1
+                        self.processed_total += 1
+                        self._slots.release()
+        finally:
+            if key is not None:
+                self._chats.pop(key, None)
+
+    async def drain(self, timeout: float):
+        """Ожидание обработки принятых обновлений"""
+        if self._workers:
+            await asyncio.wait(self._workers, timeout=timeout)
+
+    def collect_metrics(self):
+        updates_queued.set(self.queued)
+        updates_running.set(self.running)
+        update_chats_active.set(len(self._chats))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queued": self.max_queued,
+            "queued": self.queued,
+            "running": self.running,
+            "active_chats": len(self._chats),
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+            "admission_waits": self.admission_waits
+        }
+
+
+def get_chat_key(data: Dict[str, Any]) -> Optional[int]:
+    """Чат события (или пользователь для событий без чата)"""
+    chat = data.get("event_chat")
+    if chat is not None:
+        return chat.id
+    user = data.get("event_from_user")
+    return user.id if user is not None else None
+
+
+class UpdateSchedulerMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: дальнейшая обработка (фильтры, обработчики,
+    метрики) выполняется в UpdateScheduler, вызывающий код ждет только приема.
+
+    Состояние FSM читает BufferedFSMContextMiddleware, зарегистрированный
+    после этого middleware, то есть уже в очереди чата, после записи
+    предыдущего обновления.
+    dp.feed_update(..., wait_processed=True) ждет завершения обработки.
+
+    ErrorsMiddleware диспетчера к этому моменту уже вернул управление, поэтому
+    задача оборачивается в свой ErrorsMiddleware того же router: исключения
+    обработчиков доходят до dp.errors(), как и без очереди.
+    """
+
+    def __init__(self, scheduler: UpdateScheduler, router: Router):
+        self.scheduler = scheduler
+        self.errors = ErrorsMiddleware(router)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        return await self.scheduler.submit(
+            get_chat_key(data), partial(self.errors, handler, event, data), wait=data.get("wait_processed", False)
+        )
@@ -0,0 +1,110 @@
+"""
+Compact questionnaire answers: 2 bits per question
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.data.questionnaire_data import ANSWERS, get_total_questions
+
+TOTAL_QUESTIONS = get_total_questions()
+
+# Код ответа - индекс варианта в ANSWERS, одинаковый для всех языков
+ANSWER_BITS = 2
+ANSWER_OPTIONS = len(ANSWERS["ru"])
+CODE_MASK = (1 << ANSWER_BITS) - 1
+FULL_MASK = (1 << TOTAL_QUESTIONS) - 1
+
+# Текст ответа на любом языке -> код
+ANSWER_CODES = {answer: code for answers in ANSWERS.values() for code, answer in enumerate(answers)}
+
+
+class AnswerVector:
+    """
+    Ответы анкеты в двух целых числах.
+
+    bits - коды ответов по 2 бита на вопрос (вопрос 1 - младшие биты),
+    mask - по биту на вопрос: 1, если на вопрос ответили. Текст ответа
+    восстанавливается по коду и языку анкеты, поэтому словарь
+    {"номер вопроса": "текст ответа"} переводится в вектор и обратно без потерь.
+    """
+
+    __slots__ = ("bits", "mask")
+
+    def __init__(self, bits: int = 0, mask: int = 0):
+        self.bits = bits
+        self.mask = mask
+
+    def set(self, question: int, code: int):
+        """Запись ответа (повторный ответ на вопрос заменяет прежний)"""
+        if not 1 <= question <= TOTAL_QUESTIONS:
+            raise ValueError(f"Question number out of range: {question}")
+        if not 0 <= code < ANSWER_OPTIONS:
+            raise ValueError(f"Answer code out of range: {code}")
+        shift = (question - 1) * ANSWER_BITS
+        self.bits = self.bits & ~(CODE_MASK << shift) | (code << shift)
+        self.mask |= 1 << (question - 1)
+
+    def get(self, question: int) -> Optional[int]:
+        """Код ответа на вопрос (None - ответа нет)"""
+        if not self.mask >> (question - 1) & 1:
+            return None
+        return self.bits >> ((question - 1) * ANSWER_BITS) & CODE_MASK
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Пары (номер вопроса, код ответа) по возрастанию номера"""
+        for question in range(1, TOTAL_QUESTIONS + 1):
+            code = self.get(question)
+            if code is not None:
+                yield question, code
+
+    def counts(self) -> List[int]:
+        """Число ответов с каждым кодом"""
+        counts = [0] * ANSWER_OPTIONS
+        for _, code in self.items():
+            counts[code] += 1
+        return counts
+
+    def is_complete(self) -> bool:
+        return self.mask == FULL_MASK
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, AnswerVector) and (self.bits, self.mask) == (other.bits, other.mask)
+
+    def __repr__(self) -> str:
+        return f"AnswerVector(bits={self.bits:#x}, mask={self.mask:#x})"
+
+    def pack(self) -> int:
+        """Одно число для FSM и JSON: маска в старших битах, коды в младших"""
+        return self.mask << (TOTAL_QUESTIONS * ANSWER_BITS) | self.bits
+
+    @classmethod
+    def unpack(cls, value: int) -> "AnswerVector":
+        shift = TOTAL_QUESTIONS * ANSWER_BITS
+        return cls(value & ((1 << shift) - 1), value >> shift)
+
+    @classmethod
+    def from_dict(cls, responses: Dict[Any, Any], strict: bool = True) -> "AnswerVector":
+        """
+        Вектор из словаря {номер вопроса: текст ответа}
+
+        strict=False пропускает ответы, которые нельзя закодировать (неизвестный
+        текст или номер вопроса), вместо ValueError.
+        """
+        vector = cls()
+        for question, answer in responses.items():
+            code = ANSWER_CODES.get(answer) if isinstance(answer, str) else None
+            try:
+                if code is None:
+                    raise ValueError(f"Unknown answer for question {question}: {answer!r}")
+                vector.set(int(question), code)
+            except (TypeError, ValueError):
+                if strict:
+                    raise
+        return vector
+
+    def to_dict(self, language: str = "ru") -> Dict[str, str]:
+        """Словарь {"номер вопроса": текст ответа} на языке анкеты"""
+        answers = ANSWERS.get(language, ANSWERS["en"])
+        return {str(question): answers[code] for question, code in self.items()}
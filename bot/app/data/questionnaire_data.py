@@ -91,6 +91,18 @@ ANSWER_WEIGHTS = {
 # Специальные вопросы с обратной логикой (положительный ответ снижает риск)
 REVERSE_QUESTIONS = {3, 22, 29, 30}
 
+# Веса ответов для вопросов с обратной логикой
+REVERSE_ANSWER_WEIGHTS = {
+    "Да": 0,
+    "Нет": 3,
+    "Иногда": 2,
+    "Затрудняюсь ответить": 1,
+    "Yes": 0,
+    "No": 3,
+    "Sometimes": 2,
+    "Difficult to answer": 1
+}
+
 # Интерпретация результатов
 RISK_INTERPRETATION = {
     "ru": {
@@ -186,6 +198,13 @@ def is_reverse_question(question_number: int) -> bool:
     return question_number in REVERSE_QUESTIONS
 
 
+def get_question_answer_weight(question_number: int, answer: str) -> int:
+    """Получение веса ответа с учетом обратных вопросов"""
+    if is_reverse_question(question_number):
+        return REVERSE_ANSWER_WEIGHTS.get(answer, 0)
+    return get_answer_weight(answer)
+
+
 def get_risk_interpretation(risk_level: str, language: str = "ru") -> Dict[str, Any]:
     """Получение интерпретации результата"""
     return RISK_INTERPRETATION[language][risk_level]
@@ -1,69 +1,137 @@
 """
 Database module for AsyaBot
 """
-from sqlalchemy import create_engine, text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from typing import AsyncGenerator, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from app.config import settings
 from app.logger import get_logger
+from app.metrics import metrics
 
 logger = get_logger("database")
 
-# Создание движка базы данных
-logger.info("Initializing database engine")
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=StaticPool,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+db_pool_size = metrics.gauge("db_pool_size", "Configured database pool size")
+db_pool_checked_out = metrics.gauge("db_pool_checked_out", "Database connections in use")
+db_pool_overflow = metrics.gauge("db_pool_overflow", "Database connections opened above pool size")
+
+
+def get_async_database_url(url: str) -> str:
+    """Приведение DATABASE_URL к асинхронному драйверу asyncpg"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Движок создается при первом обращении к базе, а не при импорте
+_engine: Optional[AsyncEngine] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Движок базы данных (создается при первом вызове)"""
+    global _engine
+    if _engine is None:
+        logger.info("Initializing database engine")
+        _engine = create_async_engine(
+            get_async_database_url(settings.DATABASE_URL),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            connect_args={
+                # Кэш подготовленных выражений (0 - для работы через pgbouncer)
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+            },
+            echo=settings.DEBUG
+        )
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+class LazySessionmaker(async_sessionmaker):
+    """Фабрика сессий, создающая движок при первой сессии"""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if _engine is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
 
 # Создание фабрики сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionmaker(expire_on_commit=False, autoflush=False)
 
 # Базовый класс для моделей
 Base = declarative_base()
 
 
-def get_db() -> Session:
+def collect_pool_metrics():
+    """Состояние пула соединений для /metrics"""
+    if _engine is None:
+        return
+    pool = _engine.pool
+    db_pool_size.set(pool.size())
+    db_pool_checked_out.set(pool.checkedout())
+    # overflow() отрицателен, пока пул не заполнен
+    db_pool_overflow.set(max(0, pool.overflow()))
+
+
+metrics.add_collector(collect_pool_metrics)
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Получение сессии базы данных"""
     logger.debug("Creating database session")
-    db = SessionLocal()
-    try:
-        yield db
-    except Exception as e:
-        logger.error(f"Database session error: {e}")
-        db.rollback()
-        raise
-    finally:
-        logger.debug("Closing database session")
-        db.close()
+    async with SessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error("Database session error: %s", e)
+            await db.rollback()
+            raise
+        finally:
+            logger.debug("Closing database session")
 
 
-def init_db():
+async def init_db():
     """Инициализация базы данных"""
     logger.info("Initializing database")
     try:
         # Импортируем модели для создания таблиц
-        from app.models import Questionnaire, QuestionnaireResponse
-        
+        from app.models import Questionnaire, QuestionnaireResponse, FSMRecord, OutboxMessage, RescoringCheckpoint
+
         # Создание всех таблиц
-        Base.metadata.create_all(bind=engine)
+        async with get_engine().begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            # create_all не добавляет колонки в существующие таблицы
+            await connection.execute(text("ALTER TABLE fsm_storage ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0"))
+            await connection.execute(text("ALTER TABLE questionnaires ADD COLUMN IF NOT EXISTS answer_bits BIGINT"))
+            await connection.execute(text("ALTER TABLE questionnaires ADD COLUMN IF NOT EXISTS answer_mask INTEGER"))
+            await connection.execute(text("ALTER TABLE questionnaires ALTER COLUMN responses DROP NOT NULL"))
         logger.info("Database initialized successfully - all tables created")
     except Exception as e:
-        logger.error(f"Database initialization error: {e}")
+        logger.error("Database initialization error: %s", e)
         raise
 
 
-def check_db_connection():
+async def check_db_connection() -> bool:
     """Проверка подключения к базе данных"""
     logger.debug("Checking database connection")
     try:
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
+        async with get_engine().connect() as connection:
+            await connection.execute(text("SELECT 1"))
         logger.info("Database connection successful")
         return True
     except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return False 
\ No newline at end of file
+        logger.error("Database connection failed: %s", e)
+        return False
+
+
+async def close_db():
+    """Закрытие пула соединений"""
+    if _engine is None:
+        return
+    await _engine.dispose()
+    logger.info("Database engine disposed")
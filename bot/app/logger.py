@@ -1,43 +1,113 @@
+import atexit
+import copy
+import json
 import logging
 import logging.handlers
-import os
-from datetime import datetime
+import queue
+import random
 from pathlib import Path
+from typing import Optional
 
+from app.config import settings
 
-def setup_logger(name: str = "asyabot", log_level: str = "INFO") -> logging.Logger:
+# Высокочастотные записи (каждый запрос, каждый ответ) помечаются extra=SAMPLED
+# и при LOG_SAMPLE_RATE < 1 сохраняются выборочно
+SAMPLED = {"sampled": True}
+
+LOG_FORMAT = '%(asctime)s | %(levelname)s | %(name)s:%(funcName)s:%(lineno)d | %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Фоновый поток, пишущий записи из очереди в файл и консоль
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна JSON строка"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage()
+        }
+        if getattr(record, "sampled", False):
+            entry["sample_rate"] = settings.LOG_SAMPLE_RATE
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Выборочное сохранение помеченных записей уровня INFO и ниже"""
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Постановка записи в очередь без форматирования и ввода-вывода.
+    
+    В вызывающем потоке только подставляются аргументы сообщения (объекты
+    могут измениться до записи); форматирование, трассировки исключений и
+    запись на диск выполняются в потоке QueueListener. При переполнении
+    очереди запись отбрасывается, а не блокирует event loop.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logger(name: str = "asyabot", log_level: Optional[str] = None) -> logging.Logger:
     """
-    Настройка логгера с ротацией файлов и форматированием
+    Настройка логирования через очередь: обработчики работают в отдельном потоке
     
     Args:
         name: Имя логгера
-        log_level: Уровень логирования (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_level: Уровень логирования (DEBUG, INFO, WARNING, ERROR, CRITICAL), по умолчанию LOG_LEVEL
     
     Returns:
         Настроенный логгер
     """
-    # Создаем директорию для логов если её нет
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
+    global _listener
     
-    # Создаем логгер
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, log_level.upper()))
-    
-    # Очищаем существующие обработчики
-    logger.handlers.clear()
+    # Создаем директорию для логов если её нет
+    log_file = Path(settings.LOG_FILE)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
     
     # Форматтер для логов
-    formatter = logging.Formatter(
-        '%(asctime)s | %(levelname)s | %(name)s:%(funcName)s:%(lineno)d | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if settings.LOG_JSON:
+        formatter = JsonFormatter(datefmt=DATE_FORMAT)
+    else:
+        formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
     
     # Обработчик для файла с ротацией
     file_handler = logging.handlers.RotatingFileHandler(
-        log_dir / "asyabot.log",
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
+        log_file,
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
         encoding='utf-8'
     )
     file_handler.setLevel(logging.DEBUG)
@@ -48,13 +118,38 @@ def setup_logger(name: str = "asyabot", log_level: str = "INFO") -> logging.Logg
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
     
-    # Добавляем обработчики к логгеру
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Перезапуск слушателя при повторной настройке
+    shutdown_logging()
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+    
+    # Корневой логгер получает и записи библиотек (aiogram, sqlalchemy, httpx) уровня WARNING и выше
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, NonBlockingQueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    
+    # Логгер приложения передает записи корневому
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, (log_level or settings.LOG_LEVEL).upper()))
+    logger.handlers.clear()
+    logger.propagate = True
     
     return logger
 
 
+def shutdown_logging():
+    """Запись оставшихся в очереди сообщений и остановка фонового потока"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def get_logger(name: str = None) -> logging.Logger:
     """
     Получить логгер по имени
@@ -70,5 +165,6 @@ def get_logger(name: str = None) -> logging.Logger:
     return logging.getLogger(f"asyabot.{name}")
 
 
-# Создаем основной логгер при импорте модуля
-main_logger = setup_logger("asyabot") 
\ No newline at end of file
+# Обработчики подключаются точкой входа (create_app, rescore.py) вызовом setup_logger(),
+# импорт модулей приложения не создает файлов и потоков
+atexit.register(shutdown_logging)
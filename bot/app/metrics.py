@@ -0,0 +1,223 @@
+"""
+In-process latency tracking and Prometheus metrics
+"""
+import inspect
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+from app.logger import get_logger
+
+logger = get_logger("metrics")
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей с перцентилями"""
+
+    def __init__(self, window: int = 1024):
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Перцентиль по окну последних измерений (q от 0 до 1)"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "max": self.max if self.count else None
+        }
+
+
+class LatencyRegistry:
+    """Набор именованных трекеров задержки"""
+
+    def __init__(self):
+        self.trackers: Dict[str, LatencyTracker] = {}
+
+    def get(self, name: str) -> LatencyTracker:
+        tracker = self.trackers.get(name)
+        if tracker is None:
+            tracker = self.trackers[name] = LatencyTracker()
+        return tracker
+
+    def observe(self, name: str, seconds: float):
+        self.get(name).observe(seconds)
+
+    def timer(self, name: str) -> "Timer":
+        return Timer(self.get(name))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: tracker.snapshot() for name, tracker in sorted(self.trackers.items())}
+
+
+class Timer:
+    """Контекстный менеджер для измерения длительности блока"""
+
+    def __init__(self, tracker: LatencyTracker):
+        self.tracker = tracker
+        self.started = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracker.observe(time.perf_counter() - self.started)
+
+
+# Общий реестр задержек процесса
+latency = LatencyRegistry()
+
+
+# Границы корзин гистограмм задержки (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Переменная окружения prometheus_client: каталог файлов метрик всех воркеров
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Ряды *_created не нужны, их сумма по воркерам не имеет смысла
+prometheus_client.disable_created_metrics()
+
+
+def is_multiprocess() -> bool:
+    """Метрики пишутся в общий каталог и собираются со всех воркеров"""
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+class Metric:
+    """
+    Метрика prometheus_client с метками в виде именованных аргументов:
+    counter.inc(language="ru") вместо counter.labels(language="ru").inc()
+    """
+
+    def __init__(self, metric, name: str, labelnames: Sequence[str]):
+        self.metric = metric
+        self.name = name
+        self.labelnames = tuple(labelnames)
+
+    def _child(self, labels: Dict[str, Any]):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return self.metric.labels(**labels) if self.labelnames else self.metric
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    def inc(self, amount: float = 1, **labels):
+        self._child(labels).inc(amount)
+
+
+class Gauge(Metric):
+    """Текущее значение; обычно выставляется сборщиком перед выдачей метрик"""
+
+    def set(self, value: float, **labels):
+        self._child(labels).set(value)
+
+
+class Histogram(Metric):
+    """Распределение значений по фиксированным корзинам"""
+
+    def observe(self, value: float, **labels):
+        self._child(labels).observe(value)
+
+    def time(self, **labels):
+        """Контекстный менеджер: длительность блока в гистограмму"""
+        return self._child(labels).time()
+
+
+Collector = Callable[[], Union[None, Awaitable[None]]]
+
+
+class MetricsRegistry:
+    """
+    Метрики в текстовом формате Prometheus (prometheus_client).
+
+    Счетчики и гистограммы обновляются в коде по месту события, датчики
+    состояния (пул БД, FSM) выставляют сборщики при каждом запросе /metrics.
+
+    При нескольких воркерах uvicorn main.py задает PROMETHEUS_MULTIPROC_DIR:
+    значения каждого процесса пишутся в файлы этого каталога, и /metrics
+    любого воркера отдает сумму по всем. Датчики складываются согласно
+    multiprocess_mode; датчики других воркеров, выставляемые сборщиками,
+    актуальны на момент последнего запроса /metrics к этим воркерам.
+    """
+
+    def __init__(self, namespace: str = "asyabot"):
+        self.namespace = namespace
+        self.registry = CollectorRegistry()
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Collector] = []
+
+    def _register(self, wrapper, metric_class, name: str, documentation: str, labelnames: Sequence[str], **options) -> Metric:
+        full_name = f"{self.namespace}_{name}"
+        existing = self.metrics.get(full_name)
+        if existing is not None:
+            if type(existing) is not wrapper or existing.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {full_name} is already registered with another type or labels")
+            return existing
+        metric = metric_class(full_name, documentation, labelnames, registry=self.registry, **options)
+        self.metrics[full_name] = wrapper(metric, full_name, labelnames)
+        return self.metrics[full_name]
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, prometheus_client.Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), multiprocess_mode: str = "livesum") -> Gauge:
+        """multiprocess_mode - свертка значений воркеров: livesum, livemax, livemin, all"""
+        return self._register(
+            Gauge, prometheus_client.Gauge, name, documentation, labelnames, multiprocess_mode=multiprocess_mode
+        )
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, prometheus_client.Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Collector):
+        """Функция (или корутина), обновляющая датчики перед выдачей"""
+        self.collectors.append(collector)
+
+    async def collect(self) -> str:
+        for collector in self.collectors:
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                # Ошибка одного сборщика не должна ломать выдачу остальных метрик
+                logger.warning("Metrics collector %s failed: %s", getattr(collector, "__name__", collector), e)
+
+        registry = self.registry
+        if is_multiprocess():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry).decode()
+
+    def close(self):
+        """Завершение процесса: его live-датчики больше не учитываются"""
+        if is_multiprocess():
+            multiprocess.mark_process_dead(os.getpid())
+
+
+# Общий реестр метрик процесса
+metrics = MetricsRegistry()
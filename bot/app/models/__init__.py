@@ -1,3 +1,6 @@
 from .questionnaire import Questionnaire, QuestionnaireResponse
+from .fsm import FSMRecord
+from .outbox import OutboxMessage
+from .rescoring import RescoringCheckpoint
 
-__all__ = ["Questionnaire", "QuestionnaireResponse"]
+__all__ = ["Questionnaire", "QuestionnaireResponse", "FSMRecord", "OutboxMessage", "RescoringCheckpoint"]
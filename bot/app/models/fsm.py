@@ -0,0 +1,17 @@
+"""
+Model for persistent FSM storage
+"""
+from sqlalchemy import Column, String, Integer, JSON, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class FSMRecord(Base):
+    """Состояние и данные FSM одного пользователя"""
+    __tablename__ = "fsm_storage"
+
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(JSON, nullable=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # для оптимистичной записи
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,28 @@
+"""
+Model for outbox of deliveries to NestJS backend
+"""
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+# Статусы сообщений
+OUTBOX_PENDING = "pending"
+OUTBOX_DELIVERED = "delivered"
+OUTBOX_FAILED = "failed"
+
+class OutboxMessage(Base):
+    """Сообщение для гарантированной доставки в NestJS бэкенд"""
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(64), nullable=False, unique=True)
+    # Сообщения одной группы доставляются строго по порядку
+    group_key = Column(String(64), nullable=False, index=True)
+    endpoint = Column(String(255), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default=OUTBOX_PENDING, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
@@ -16,7 +16,10 @@ class Questionnaire(Base):
     first_name = Column(String(255), nullable=True)
     last_name = Column(String(255), nullable=True)
     language = Column(String(10), default="ru")
-    responses = Column(JSON, nullable=False)
+    # Ответы: answer_bits/answer_mask (AnswerVector); responses - словарь у анкет, сохраненных до упаковки
+    responses = Column(JSON, nullable=True)
+    answer_bits = Column(BigInteger, nullable=True)
+    answer_mask = Column(Integer, nullable=True)
     risk_level = Column(String(50), nullable=True)
     risk_score = Column(Integer, nullable=True)
     recommendations = Column(JSON, nullable=True)
@@ -0,0 +1,20 @@
+"""
+Model for rescoring job checkpoints
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+class RescoringCheckpoint(Base):
+    """Прогресс пересчета риска: последний обработанный id и счетчики"""
+    __tablename__ = "rescoring_checkpoints"
+
+    job = Column(String(100), primary_key=True)
+    status = Column(String(20), nullable=False)
+    last_id = Column(BigInteger, nullable=False, default=0)
+    processed = Column(BigInteger, nullable=False, default=0)
+    updated = Column(BigInteger, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
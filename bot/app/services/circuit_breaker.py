@@ -0,0 +1,120 @@
+"""
+Circuit breaker for calls to external services
+"""
+import time
+from typing import Any, Dict, Optional
+
+from app.logger import get_logger
+
+logger = get_logger("circuit_breaker")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен: цепь разомкнута"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Автомат closed/open/half_open.
+
+    После failure_threshold ошибок подряд цепь размыкается на recovery_timeout
+    секунд, затем пропускает half_open_max_calls пробных вызовов: успех замыкает
+    цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_calls = 0
+        self.half_open_since = 0.0
+
+        # Статистика
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+
+    @property
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробного вызова"""
+        if self.state != STATE_OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        """Цепь разомкнута и время восстановления еще не прошло"""
+        return self.state == STATE_OPEN and self.retry_after > 0
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов (в half_open расходует пробный слот)"""
+        if self.state == STATE_OPEN:
+            if self.retry_after > 0:
+                self.total_rejected += 1
+                return False
+            self._transition(STATE_HALF_OPEN)
+
+        if self.state == STATE_HALF_OPEN:
+            # Пробный вызов мог быть отменен, не сообщив результат
+            if time.monotonic() - self.half_open_since > self.recovery_timeout:
+                self.half_open_calls = 0
+                self.half_open_since = time.monotonic()
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.total_rejected += 1
+                return False
+            self.half_open_calls += 1
+
+        return True
+
+    def check(self):
+        """Как allow(), но с исключением CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after or self.recovery_timeout)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != STATE_CLOSED:
+            self._transition(STATE_CLOSED)
+
+    def record_failure(self):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._transition(STATE_OPEN)
+
+    def _transition(self, state: str):
+        if state == self.state and state != STATE_OPEN:
+            return
+        logger.warning("Circuit '%s': %s -> %s", self.name, self.state, state)
+        self.state = state
+        self.half_open_calls = 0
+        if state == STATE_OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == STATE_HALF_OPEN:
+            self.half_open_since = time.monotonic()
+        elif state == STATE_CLOSED:
+            self.opened_at = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": round(self.retry_after, 3),
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "times_opened": self.times_opened
+        }
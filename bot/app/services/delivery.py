@@ -0,0 +1,47 @@
+"""
+Durable hand-off of completed questionnaires to NestJS backend
+"""
+import time
+from typing import Any, Dict, Optional
+
+from app.logger import get_logger
+from app.metrics import latency
+from app.services.nestjs_service import QUESTIONNAIRE_COMPLETE_ENDPOINT
+from app.services.outbox import OutboxDispatcher, get_outbox_dispatcher
+
+logger = get_logger("delivery")
+
+
+class CompletionDelivery:
+    """
+    Запись завершенных анкет в outbox
+
+    enqueue() вызывается до ответа пользователю и возвращается после фиксации
+    строки outbox: анкета, результат которой пользователь увидел, не теряется
+    при падении или перезапуске процесса. HTTP запрос к бэкенду выполняет
+    OutboxDispatcher в фоне.
+    """
+
+    def __init__(self, outbox: OutboxDispatcher):
+        self.outbox = outbox
+
+    async def enqueue(self, telegram_id: int, completion: Dict[str, Any]):
+        """Запись анкеты в outbox; исключение - анкета не записана"""
+        started = time.perf_counter()
+        try:
+            # Данные анкеты и результат уходят одним сообщением outbox
+            await self.outbox.enqueue(str(telegram_id), [(QUESTIONNAIRE_COMPLETE_ENDPOINT, completion)])
+        finally:
+            latency.observe("delivery.enqueue", time.perf_counter() - started)
+        logger.info("Questionnaire completion queued for NestJS backend for user %s", telegram_id)
+
+
+_completion_delivery: Optional[CompletionDelivery] = None
+
+
+def get_completion_delivery() -> CompletionDelivery:
+    """Запись анкет в outbox процесса (создается при первом вызове)"""
+    global _completion_delivery
+    if _completion_delivery is None:
+        _completion_delivery = CompletionDelivery(get_outbox_dispatcher())
+    return _completion_delivery
@@ -0,0 +1,185 @@
+"""
+Background dependency health monitor
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import get_engine
+from app.logger import get_logger
+from app.metrics import metrics
+
+logger = get_logger("health")
+
+STATUS_UP = "up"
+STATUS_DOWN = "down"
+
+HealthCheck = Callable[[], Awaitable[Any]]
+
+# Для нескольких воркеров: зависимость недоступна, если недоступна хоть одному
+dependency_up = metrics.gauge(
+    "dependency_up", "Last health check result per dependency (1 - up)", ["dependency"], multiprocess_mode="livemin"
+)
+dependency_latency = metrics.gauge(
+    "dependency_check_seconds", "Last health check duration per dependency", ["dependency"], multiprocess_mode="livemax"
+)
+event_loop_lag = metrics.gauge("event_loop_lag_seconds", "Recent maximum event loop scheduling lag", multiprocess_mode="livemax")
+
+
+async def check_database():
+    """Соединение из пула и SELECT 1"""
+    async with get_engine().connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+class HealthMonitor:
+    """
+    Проверки зависимостей в фоне с кэшированием результата.
+
+    Проверки выполняются параллельно раз в HEALTH_CHECK_INTERVAL, каждая
+    с таймаутом; пробы readiness/liveness только читают последний результат.
+    Отдельная задача измеряет задержку event loop: насколько позже
+    запланированного просыпается asyncio.sleep.
+    """
+
+    def __init__(self, interval: float, timeout: float, ttl: float, max_loop_lag: float, lag_interval: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_loop_lag = max_loop_lag
+        self.lag_interval = lag_interval
+
+        self.checks: Dict[str, HealthCheck] = {}
+        self.required: Dict[str, bool] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.checked_at: Optional[float] = None
+
+        self.loop_lag = 0.0
+        self.lag_samples: deque = deque(maxlen=max(1, int(10 / lag_interval)))
+        self.last_tick: Optional[float] = None
+
+        self._tasks = []
+
+    def add_check(self, name: str, check: HealthCheck, required: bool = True):
+        """
+        Регистрация проверки зависимости
+
+        Args:
+            name: Имя зависимости
+            check: Корутина, завершающаяся исключением при недоступности
+            required: Недоступность делает сервис неготовым (иначе - деградация)
+        """
+        self.checks[name] = check
+        self.required[name] = required
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._refresh_loop()), asyncio.create_task(self._lag_loop())]
+        logger.info("Health monitor started with checks: %s", ", ".join(self.checks))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        """Однократный параллельный прогон всех проверок"""
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(name) for name in names))
+        self.results = dict(zip(names, results))
+        self.checked_at = time.monotonic()
+
+    async def _run_check(self, name: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        error = None
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self.checks[name]()
+        except TimeoutError:
+            error = f"timeout after {self.timeout}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+
+        previous = self.results.get(name, {}).get("status")
+        status = STATUS_DOWN if error else STATUS_UP
+        if status != previous:
+            log = logger.warning if error else logger.info
+            log("Dependency %s is %s%s", name, status, f": {error}" if error else "")
+
+        dependency_up.set(0 if error else 1, dependency=name)
+        dependency_latency.set(elapsed, dependency=name)
+        return {
+            "status": status,
+            "required": self.required[name],
+            "latency_ms": round(elapsed * 1000, 2),
+            "error": error
+        }
+
+    async def _lag_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.last_tick = loop.time()
+            self.loop_lag = max(0.0, self.last_tick - started - self.lag_interval)
+            self.lag_samples.append(self.loop_lag)
+            event_loop_lag.set(max(self.lag_samples))
+
+    @property
+    def max_recent_lag(self) -> float:
+        return max(self.lag_samples) if self.lag_samples else 0.0
+
+    def readiness(self) -> Dict[str, Any]:
+        """Последний результат проверок без обращения к зависимостям"""
+        age = time.monotonic() - self.checked_at if self.checked_at is not None else None
+        reasons = []
+        if age is None:
+            reasons.append("checks have not completed yet")
+        elif age > self.ttl:
+            reasons.append(f"check results are stale ({age:.0f}s old)")
+        reasons.extend(f"{name} is down" for name, result in self.results.items() if result["required"] and result["status"] == STATUS_DOWN)
+        if self.max_recent_lag > self.max_loop_lag:
+            reasons.append(f"event loop lag {self.max_recent_lag * 1000:.0f}ms")
+
+        degraded = any(result["status"] == STATUS_DOWN for result in self.results.values())
+        return {
+            "status": "not_ready" if reasons else ("degraded" if degraded else "ready"),
+            "reasons": reasons,
+            "age": round(age, 3) if age is not None else None,
+            "checks": self.results,
+            "event_loop": self.loop_stats()
+        }
+
+    def liveness(self) -> Dict[str, Any]:
+        """Живость: задача измерения задержки event loop просыпается вовремя"""
+        now = asyncio.get_running_loop().time()
+        stalled = self.last_tick is not None and now - self.last_tick > self.lag_interval + settings.HEALTH_LIVENESS_MAX_STALL
+        return {"status": "stalled" if stalled else "alive", "event_loop": self.loop_stats()}
+
+    def loop_stats(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(self.loop_lag * 1000, 2),
+            "max_lag_ms": round(self.max_recent_lag * 1000, 2)
+        }
+
+
+# Общий экземпляр; проверки регистрируются при запуске приложения
+health_monitor = HealthMonitor(
+    interval=settings.HEALTH_CHECK_INTERVAL,
+    timeout=settings.HEALTH_CHECK_TIMEOUT,
+    ttl=settings.HEALTH_CACHE_TTL,
+    max_loop_lag=settings.HEALTH_MAX_LOOP_LAG,
+    lag_interval=settings.HEALTH_LOOP_LAG_INTERVAL
+)
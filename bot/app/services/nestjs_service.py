@@ -1,20 +1,214 @@
 """
 Service for communicating with NestJS backend
 """
+import asyncio
+import importlib.util
+import time
 import httpx
 from typing import Dict, Any, Optional
 from app.config import settings
+from app.data.answer_vector import AnswerVector
 from app.logger import get_logger
+from app.metrics import latency, metrics
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
 
 logger = get_logger("nestjs_service")
 
+nestjs_duration = metrics.histogram(
+    "nestjs_request_duration_seconds", "NestJS backend request time", ["endpoint"]
+)
+nestjs_requests = metrics.counter(
+    "nestjs_requests_total", "NestJS backend requests by status class, exception or circuit_open", ["endpoint", "status"]
+)
+
+# Эндпоинты NestJS бэкенда
+QUESTIONNAIRE_ENDPOINT = "/api/telegram/questionnaire"
+QUESTIONNAIRE_RESULT_ENDPOINT = "/api/telegram/questionnaire/result"
+QUESTIONNAIRE_COMPLETE_ENDPOINT = "/api/telegram/questionnaire/complete"
+
+
+def to_backend_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Тело запроса в формате бэкенда: упакованные ответы анкеты
+    (questionnaire.answer_vector и language) разворачиваются в словарь answers
+    """
+    questionnaire = payload.get("questionnaire")
+    if not isinstance(questionnaire, dict) or "answer_vector" not in questionnaire:
+        return payload
+    questionnaire = dict(questionnaire)
+    answers = AnswerVector.unpack(questionnaire.pop("answer_vector"))
+    questionnaire["answers"] = answers.to_dict(questionnaire.pop("language", "ru"))
+    return {**payload, "questionnaire": questionnaire}
+
+
+def is_successful_response(response: httpx.Response) -> bool:
+    """Данные сохранены: при ошибке сохранения бэкенд отвечает 4xx/5xx"""
+    return response.is_success
+
+
 class NestJSService:
     """Сервис для работы с NestJS бэкендом"""
     
     def __init__(self):
         self.base_url = settings.NESTJS_BACKEND_URL
-        self.client = httpx.AsyncClient(timeout=30.0)
-        logger.info(f"NestJS service initialized with base URL: {self.base_url}")
+        # Клиент создается в start() внутри работающего event loop
+        self.client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+        self.in_flight = 0
+        self.requests_total = 0
+        self.breaker = CircuitBreaker(
+            "nestjs",
+            failure_threshold=settings.NESTJS_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.NESTJS_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.NESTJS_BREAKER_HALF_OPEN_CALLS
+        )
+        self.endpoints = set()
+        logger.info("NestJS service initialized with base URL: %s", self.base_url)
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = settings.NESTJS_HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("NESTJS_HTTP2 requires the h2 package (pip install httpx[http2]), using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=settings.NESTJS_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.NESTJS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.NESTJS_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.NESTJS_KEEPALIVE_EXPIRY
+            ),
+            http2=http2,
+            headers={"Content-Type": "application/json"}
+        )
+    
+    async def start(self):
+        """Создание пула соединений и предварительный прогрев"""
+        if self.client is None:
+            self.client = self._create_client()
+            logger.info("NestJS HTTP client started (max_connections=%s, http2=%s)", settings.NESTJS_MAX_CONNECTIONS, self.http2)
+        await self.prewarm(settings.NESTJS_PREWARM_CONNECTIONS)
+    
+    async def prewarm(self, connections: int):
+        """Открытие соединений заранее, чтобы первый пользователь не ждал установки"""
+        if connections <= 0:
+            return
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.client.get(settings.NESTJS_HEALTH_PATH, timeout=settings.NESTJS_MIN_TIMEOUT * 5) for _ in range(connections)),
+            return_exceptions=True
+        )
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        if failed:
+            logger.warning("NestJS pool prewarm: %s/%s connections failed", failed, connections)
+        else:
+            logger.info("NestJS pool prewarmed with %s connections in %.3fs", connections, time.perf_counter() - started)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений"""
+        stats = {
+            "started": self.client is not None,
+            "http2": self.http2,
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "max_connections": settings.NESTJS_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.NESTJS_MAX_KEEPALIVE_CONNECTIONS
+        }
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = pool.connections
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for connection in connections if connection.is_idle())
+            stats["active_connections"] = stats["connections"] - stats["idle_connections"]
+        return stats
+    
+    def get_timeout(self, endpoint: str) -> float:
+        """
+        Адаптивный таймаут эндпоинта: p99 наблюдаемой задержки с запасом,
+        в пределах [NESTJS_MIN_TIMEOUT, NESTJS_TIMEOUT]
+        """
+        tracker = latency.get(f"nestjs{endpoint}")
+        if len(tracker.samples) < settings.NESTJS_TIMEOUT_MIN_SAMPLES:
+            return settings.NESTJS_TIMEOUT
+        adaptive = tracker.percentile(0.99) * settings.NESTJS_TIMEOUT_MULTIPLIER
+        return min(settings.NESTJS_TIMEOUT, max(settings.NESTJS_MIN_TIMEOUT, adaptive))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Состояние автомата и задержки по эндпоинтам"""
+        return {
+            "circuit_breaker": self.breaker.snapshot(),
+            "pool": self.pool_stats(),
+            "endpoints": {
+                endpoint: {
+                    "timeout": round(self.get_timeout(endpoint), 3),
+                    "latency": latency.get(f"nestjs{endpoint}").snapshot()
+                }
+                for endpoint in sorted(self.endpoints)
+            }
+        }
+    
+    async def deliver(self, endpoint: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> httpx.Response:
+        """
+        POST запрос в NestJS бэкенд без обработки ошибок
+        
+        Args:
+            endpoint: Путь эндпоинта
+            payload: Тело запроса
+            idempotency_key: Ключ идемпотентности для повторных доставок
+        
+        Returns:
+            httpx.Response: Ответ бэкенда
+        
+        Raises:
+            CircuitOpenError: Бэкенд недоступен, вызов отклонен без запроса
+        """
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            nestjs_requests.inc(endpoint=endpoint, status="circuit_open")
+            raise
+        self.endpoints.add(endpoint)
+        if self.client is None:
+            self.client = self._create_client()
+        
+        started = time.perf_counter()
+        self.in_flight += 1
+        self.requests_total += 1
+        try:
+            response = await self.client.post(
+                endpoint,
+                json=to_backend_payload(payload),
+                headers={"Idempotency-Key": idempotency_key} if idempotency_key else None,
+                timeout=self.get_timeout(endpoint)
+            )
+        except Exception as e:
+            self.breaker.record_failure()
+            nestjs_requests.inc(endpoint=endpoint, status=type(e).__name__)
+            raise
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            latency.observe(f"nestjs{endpoint}", elapsed)
+            nestjs_duration.observe(elapsed, endpoint=endpoint)
+        
+        nestjs_requests.inc(endpoint=endpoint, status=f"{response.status_code // 100}xx")
+        
+        # Автомат учитывает только сбои бэкенда, а не ошибки в данных запроса
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+    
+    async def check_health(self):
+        """Проверка доступности бэкенда для монитора зависимостей (исключение - недоступен)"""
+        if self.client is None:
+            self.client = self._create_client()
+        response = await self.client.get(settings.NESTJS_HEALTH_PATH, timeout=settings.HEALTH_CHECK_TIMEOUT)
+        if response.status_code >= 500:
+            raise RuntimeError(f"NestJS health returned {response.status_code}")
     
     async def send_questionnaire_data(self, questionnaire_data: Dict[str, Any]) -> bool:
         """
@@ -22,28 +216,24 @@ class NestJSService:
         
         Args:
             questionnaire_data: Данные анкеты
-            
+        
         Returns:
             bool: True если отправка успешна, False иначе
         """
         try:
-            logger.info(f"Sending questionnaire data to NestJS backend: {questionnaire_data.get('telegram_id')}")
+            logger.info("Sending questionnaire data to NestJS backend: %s", questionnaire_data.get('telegram_id'))
             
-            response = await self.client.post(
-                f"{self.base_url}/api/telegram/questionnaire",
-                json=questionnaire_data,
-                headers={"Content-Type": "application/json"}
-            )
+            response = await self.deliver(QUESTIONNAIRE_ENDPOINT, questionnaire_data)
             
-            if response.status_code == 200 or response.status_code == 201:
-                logger.info(f"Successfully sent questionnaire data to NestJS backend")
+            if is_successful_response(response):
+                logger.info("Successfully sent questionnaire data to NestJS backend")
                 return True
             else:
-                logger.error(f"Failed to send questionnaire data to NestJS backend. Status: {response.status_code}, Response: {response.text}")
+                logger.error("Failed to send questionnaire data to NestJS backend. Status: %s, Response: %s", response.status_code, response.text)
                 return False
-                
+        
         except Exception as e:
-            logger.error(f"Error sending questionnaire data to NestJS backend: {e}")
+            logger.error("Error sending questionnaire data to NestJS backend: %s", e)
             return False
     
     async def send_questionnaire_result(self, result_data: Dict[str, Any]) -> bool:
@@ -52,31 +242,41 @@ class NestJSService:
         
         Args:
             result_data: Результаты анкеты
-            
+        
         Returns:
             bool: True если отправка успешна, False иначе
         """
         try:
-            logger.info(f"Sending questionnaire result to NestJS backend: {result_data.get('telegram_id')}")
+            logger.info("Sending questionnaire result to NestJS backend: %s", result_data.get('telegram_id'))
             
-            response = await self.client.post(
-                f"{self.base_url}/api/telegram/questionnaire/result",
-                json=result_data,
-                headers={"Content-Type": "application/json"}
-            )
+            response = await self.deliver(QUESTIONNAIRE_RESULT_ENDPOINT, result_data)
             
-            if response.status_code == 200 or response.status_code == 201:
-                logger.info(f"Successfully sent questionnaire result to NestJS backend")
+            if is_successful_response(response):
+                logger.info("Successfully sent questionnaire result to NestJS backend")
                 return True
             else:
-                logger.error(f"Failed to send questionnaire result to NestJS backend. Status: {response.status_code}, Response: {response.text}")
+                logger.error("Failed to send questionnaire result to NestJS backend. Status: %s, Response: %s", response.status_code, response.text)
                 return False
-                
+        
         except Exception as e:
-            logger.error(f"Error sending questionnaire result to NestJS backend: {e}")
+            logger.error("Error sending questionnaire result to NestJS backend: %s", e)
             return False
     
     async def close(self):
         """Закрытие HTTP клиента"""
-        await self.client.aclose()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
         logger.info("NestJS service client closed")
+
+
+# Клиент создается при первом обращении, а не при импорте
+_nestjs_service: Optional[NestJSService] = None
+
+
+def get_nestjs_service() -> NestJSService:
+    """Общий клиент NestJS бэкенда процесса (создается при первом вызове)"""
+    global _nestjs_service
+    if _nestjs_service is None:
+        _nestjs_service = NestJSService()
+    return _nestjs_service
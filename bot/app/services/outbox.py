@@ -0,0 +1,315 @@
+"""
+Durable outbox for deliveries to NestJS backend
+"""
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.metrics import latency
+from app.models.outbox import OutboxMessage, OUTBOX_PENDING, OUTBOX_DELIVERED, OUTBOX_FAILED
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.nestjs_service import NestJSService, get_nestjs_service, is_successful_response
+
+logger = get_logger("outbox")
+
+# Как часто удалять доставленные сообщения (секунды)
+CLEANUP_INTERVAL = 600
+
+outbox_table = OutboxMessage.__table__
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """Ошибки клиента (кроме таймаута и лимита запросов) повторять бессмысленно"""
+    return status_code >= 500 or status_code in (408, 429)
+
+
+class OutboxDispatcher:
+    """Фоновая доставка сообщений outbox с повторами"""
+
+    def __init__(self, nestjs_service: NestJSService):
+        self.nestjs_service = nestjs_service
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_INTERVAL
+        self.base_delay = settings.OUTBOX_BASE_DELAY
+        self.max_delay = settings.OUTBOX_MAX_DELAY
+        self.max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+        self.lease = timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        self.retention = timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+
+        self._semaphore = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+
+        # Статистика процесса
+        self.in_flight = 0
+        self.delivered_total = 0
+        self.retried_total = 0
+        self.failed_total = 0
+        self.last_error: Optional[str] = None
+        self.last_delivery_latency: Optional[float] = None
+
+    async def enqueue(self, group_key: str, messages: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Запись сообщений в outbox одной транзакцией
+
+        Args:
+            group_key: Ключ группы, внутри которой сохраняется порядок доставки
+            messages: Пары (эндпоинт, тело запроса)
+
+        Returns:
+            List[str]: Ключи идемпотентности записанных сообщений
+        """
+        rows = [
+            {
+                "idempotency_key": uuid.uuid4().hex,
+                "group_key": group_key,
+                "endpoint": endpoint,
+                "payload": payload,
+                "status": OUTBOX_PENDING,
+                "attempts": 0
+            }
+            for endpoint, payload in messages
+        ]
+        async with SessionLocal() as db:
+            await db.execute(insert(outbox_table), rows)
+            await db.commit()
+
+        self._wakeup.set()
+        return [row["idempotency_key"] for row in rows]
+
+    def start(self):
+        """Запуск фонового диспетчера"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Outbox dispatcher started")
+
+    async def stop(self):
+        """Остановка диспетчера; недоставленные сообщения остаются в таблице"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Outbox dispatcher stopped")
+
+    async def _run(self):
+        while True:
+            # Бэкенд недоступен: не захватываем сообщения, пока цепь разомкнута
+            breaker = self.nestjs_service.breaker
+            if breaker.is_open:
+                await asyncio.sleep(breaker.retry_after)
+                continue
+
+            try:
+                batch = await self._claim_batch()
+                if batch:
+                    await asyncio.gather(*(self._deliver(message) for message in batch))
+                    continue
+                await self._cleanup()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Outbox dispatcher error: %s", e)
+
+            # Нечего доставлять: ждем новых сообщений или следующего опроса
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        """
+        Захват готовых к доставке сообщений.
+
+        Захват продлевает next_attempt_at на время аренды, поэтому несколько
+        процессов могут разбирать одну таблицу (FOR UPDATE SKIP LOCKED).
+        Сообщение не выдается, пока в его группе есть более ранние недоставленные.
+        """
+        now = datetime.now(timezone.utc)
+        earlier = aliased(outbox_table)
+        candidates = (
+            select(outbox_table.c.id)
+            .where(
+                outbox_table.c.status == OUTBOX_PENDING,
+                outbox_table.c.next_attempt_at <= now,
+                ~exists().where(
+                    earlier.c.group_key == outbox_table.c.group_key,
+                    earlier.c.id < outbox_table.c.id,
+                    earlier.c.status == OUTBOX_PENDING
+                )
+            )
+            .order_by(outbox_table.c.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(outbox_table)
+            .where(outbox_table.c.id.in_(candidates.scalar_subquery()))
+            .values(next_attempt_at=now + self.lease)
+            .returning(
+                outbox_table.c.id,
+                outbox_table.c.idempotency_key,
+                outbox_table.c.endpoint,
+                outbox_table.c.payload,
+                outbox_table.c.attempts,
+                outbox_table.c.created_at
+            )
+        )
+        async with SessionLocal() as db:
+            result = await db.execute(statement)
+            await db.commit()
+            return [dict(row._mapping) for row in result]
+
+    def _backoff(self, attempts: int) -> float:
+        """Экспоненциальная задержка с джиттером"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _deliver(self, message: Dict[str, Any]):
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            error = None
+            retryable = True
+            try:
+                response = await self.nestjs_service.deliver(
+                    message["endpoint"],
+                    message["payload"],
+                    idempotency_key=message["idempotency_key"]
+                )
+                if not is_successful_response(response):
+                    error = f"HTTP {response.status_code}: {response.text[:500]}"
+                    retryable = is_retryable_status(response.status_code)
+            except CircuitOpenError as e:
+                # Запрос не отправлялся - попытка не засчитывается
+                await self._postpone(message, e.retry_after)
+                return
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                self.in_flight -= 1
+                self.last_delivery_latency = time.perf_counter() - started
+                latency.observe("delivery.http", self.last_delivery_latency)
+
+        await self._record_attempt(message, error, retryable)
+
+    async def _postpone(self, message: Dict[str, Any], delay: float):
+        """Перенос сообщения без увеличения счетчика попыток"""
+        next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay + random.uniform(0, 1))
+        async with SessionLocal() as db:
+            await db.execute(
+                update(outbox_table)
+                .where(outbox_table.c.id == message["id"])
+                .values(next_attempt_at=next_attempt_at)
+            )
+            await db.commit()
+
+    async def _record_attempt(self, message: Dict[str, Any], error: Optional[str], retryable: bool):
+        now = datetime.now(timezone.utc)
+        attempts = message["attempts"] + 1
+
+        if error is None:
+            values = {"status": OUTBOX_DELIVERED, "attempts": attempts, "delivered_at": now, "last_error": None}
+            self.delivered_total += 1
+            latency.observe("delivery.end_to_end", (now - message["created_at"]).total_seconds())
+        elif not retryable or attempts >= self.max_attempts:
+            values = {"status": OUTBOX_FAILED, "attempts": attempts, "last_error": error}
+            self.failed_total += 1
+            self.last_error = error
+            logger.error("Outbox message %s failed permanently after %s attempts: %s", message['id'], attempts, error)
+        else:
+            delay = self._backoff(attempts)
+            values = {"attempts": attempts, "last_error": error, "next_attempt_at": now + timedelta(seconds=delay)}
+            self.retried_total += 1
+            self.last_error = error
+            logger.warning("Outbox message %s delivery failed, retry in %.1fs: %s", message['id'], delay, error)
+
+        async with SessionLocal() as db:
+            await db.execute(update(outbox_table).where(outbox_table.c.id == message["id"]).values(**values))
+            await db.commit()
+
+    async def _cleanup(self):
+        """Удаление доставленных сообщений старше срока хранения"""
+        if time.monotonic() - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = time.monotonic()
+        async with SessionLocal() as db:
+            result = await db.execute(
+                delete(outbox_table).where(
+                    outbox_table.c.status == OUTBOX_DELIVERED,
+                    outbox_table.c.delivered_at < datetime.now(timezone.utc) - self.retention
+                )
+            )
+            await db.commit()
+        logger.debug("Removed %s delivered outbox messages", result.rowcount)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Метрики outbox: счетчики процесса и состояние таблицы"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(outbox_table.c.status, func.count(), func.min(outbox_table.c.created_at))
+                .group_by(outbox_table.c.status)
+            )
+            rows = result.all()
+
+        by_status = {status: count for status, count, _ in rows}
+        oldest_pending = next((oldest for status, _, oldest in rows if status == OUTBOX_PENDING), None)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending": by_status.get(OUTBOX_PENDING, 0),
+            "delivered": by_status.get(OUTBOX_DELIVERED, 0),
+            "failed": by_status.get(OUTBOX_FAILED, 0),
+            "oldest_pending_age": (datetime.now(timezone.utc) - oldest_pending).total_seconds() if oldest_pending else None,
+            "in_flight": self.in_flight,
+            "delivered_total": self.delivered_total,
+            "retried_total": self.retried_total,
+            "failed_total": self.failed_total,
+            "last_error": self.last_error,
+            "last_delivery_latency": self.last_delivery_latency
+        }
+
+    async def list_messages(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Последние сообщения outbox для просмотра"""
+        query = select(outbox_table).order_by(outbox_table.c.id.desc()).limit(limit)
+        if status:
+            query = query.where(outbox_table.c.status == status)
+        async with SessionLocal() as db:
+            result = await db.execute(query)
+            return [dict(row._mapping) for row in result]
+
+    async def retry_message(self, message_id: int) -> bool:
+        """Повторная постановка в очередь сообщения с ошибкой"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(outbox_table)
+                .where(outbox_table.c.id == message_id, outbox_table.c.status == OUTBOX_FAILED)
+                .values(status=OUTBOX_PENDING, attempts=0, next_attempt_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+        if result.rowcount:
+            self._wakeup.set()
+        return bool(result.rowcount)
+
+
+_outbox_dispatcher: Optional[OutboxDispatcher] = None
+
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    """Диспетчер outbox процесса (создается при первом вызове)"""
+    global _outbox_dispatcher
+    if _outbox_dispatcher is None:
+        _outbox_dispatcher = OutboxDispatcher(get_nestjs_service())
+    return _outbox_dispatcher
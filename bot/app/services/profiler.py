@@ -0,0 +1,152 @@
+"""
+In-process sampling profiler
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger("profiler")
+
+# Кадр стека: (функция, файл, строка начала функции)
+Frame = Tuple[str, str, int]
+
+# Глубже стек обрезается со стороны корня
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """
+    Профилировщик по выборкам стека потока event loop.
+
+    Отдельный поток раз в interval читает текущий кадр целевого потока
+    (sys._current_frames) и считает одинаковые стеки. Код приложения не
+    инструментируется, поэтому накладные расходы ограничены обходом стека
+    при каждой выборке; ожидание в select() видно как простой event loop.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = settings.PROFILER_INTERVAL
+        self.duration = 0.0
+        self.target_thread: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, interval: Optional[float] = None, thread_id: Optional[int] = None) -> bool:
+        """
+        Запуск сбора выборок на duration секунд; False если уже выполняется
+
+        Args:
+            duration: Длительность профилирования (не больше PROFILER_MAX_DURATION)
+            interval: Период выборки в секундах
+            thread_id: Профилируемый поток, по умолчанию вызывающий (event loop)
+        """
+        if self.running:
+            return False
+        self.duration = min(duration, settings.PROFILER_MAX_DURATION)
+        self.interval = max(interval or settings.PROFILER_INTERVAL, 0.001)
+        self.target_thread = thread_id or threading.get_ident()
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="asyabot-profiler", daemon=True)
+        self._thread.start()
+        logger.info("Profiler started for %.1fs, interval %.3fs", self.duration, self.interval)
+        return True
+
+    def stop(self):
+        """Остановка сбора; накопленные выборки сохраняются"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        deadline = self.started_at + self.duration
+        try:
+            while not self._stop_event.wait(self.interval):
+                self._sample()
+                if time.monotonic() >= deadline:
+                    break
+        finally:
+            self.finished_at = time.monotonic()
+            logger.info("Profiler finished: %s samples", self.samples)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.target_thread)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            stack.append((f"{module}:{getattr(code, 'co_qualname', code.co_name)}", code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        with self._lock:
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def status(self) -> Dict[str, Any]:
+        end = self.finished_at or time.monotonic()
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval": self.interval,
+            "duration": self.duration,
+            "elapsed": round(end - self.started_at, 3) if self.started_at else None
+        }
+
+    def collapsed(self) -> str:
+        """Свернутые стеки (формат flamegraph.pl / speedscope): "a;b;c count" """
+        with self._lock:
+            stacks = list(self.stacks.items())
+        lines = [";".join(name for name, _, _ in stack) + f" {count}" for stack, count in stacks]
+        return "\n".join(sorted(lines)) + "\n" if lines else ""
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Профиль в формате speedscope (sampled, веса в секундах)"""
+        with self._lock:
+            stacks = list(self.stacks.items())
+        frames: Dict[Frame, int] = {}
+        samples = []
+        weights = []
+        for stack, count in stacks:
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {
+                "frames": [{"name": name, "file": file, "line": line} for name, file, line in frames]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": "asyabot event loop",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }],
+            "name": f"{settings.PROJECT_NAME} profile",
+            "exporter": "asyabot"
+        }
+
+
+# Общий экземпляр для служебного API
+profiler = SamplingProfiler()
@@ -0,0 +1,200 @@
+"""
+Write-behind persistence of completed questionnaires
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.data.answer_vector import AnswerVector
+from app.data.questionnaire_data import get_answers, get_question_answer_weight, is_reverse_question
+from app.logger import get_logger
+from app.models.questionnaire import Questionnaire, QuestionnaireResponse
+
+logger = get_logger("questionnaire_writer")
+
+# Повторные попытки записи пакета при ошибке БД
+FLUSH_RETRIES = 3
+FLUSH_RETRY_DELAY = 1.0
+
+
+class QuestionnaireWriter:
+    """Фоновая очередь, сохраняющая завершенные анкеты пакетами"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+        # Статистика
+        self.written_total = 0
+        self.dropped_total = 0
+        self.batches_total = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_duration: Optional[float] = None
+
+    def start(self):
+        """Запуск фоновой задачи записи"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Questionnaire writer started")
+
+    async def stop(self):
+        """Остановка с записью всех накопленных анкет"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while not self.queue.empty():
+            await self._flush(self._take_batch())
+        logger.info("Questionnaire writer stopped")
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Постановка завершенной анкеты в очередь записи
+
+        Args:
+            record: Данные анкеты (поля модели Questionnaire)
+
+        Returns:
+            bool: False если очередь переполнена
+        """
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped_total += 1
+            logger.error("Questionnaire queue is full, record for user %s dropped", record.get('telegram_id'))
+            return False
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние очереди для мониторинга"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self.queue_depth,
+            "written_total": self.written_total,
+            "dropped_total": self.dropped_total,
+            "batches_total": self.batches_total,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_duration": self.last_flush_duration
+        }
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                # Ждем первую запись, затем добираем пакет до размера или таймаута
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    # asyncio.timeout, а не wait_for: wait_for в 3.11 может поглотить отмену,
+                    # пришедшую одновременно с записью, и stop() зависнет
+                    try:
+                        async with asyncio.timeout(timeout):
+                            batch.append(await self.queue.get())
+                    except TimeoutError:
+                        break
+
+                await self._flush(batch)
+                batch = []
+        except asyncio.CancelledError:
+            if batch:
+                await self._flush(batch)
+            raise
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                started = time.perf_counter()
+                await self._write_batch(batch)
+                self.last_flush_duration = time.perf_counter() - started
+                self.last_flush_at = time.time()
+                self.written_total += len(batch)
+                self.batches_total += 1
+                logger.debug("Flushed %s questionnaires in %.3fs", len(batch), self.last_flush_duration)
+                return
+            except Exception as e:
+                logger.error("Questionnaire batch write failed (attempt %s/%s): %s", attempt, FLUSH_RETRIES, e)
+                if attempt < FLUSH_RETRIES:
+                    await asyncio.sleep(FLUSH_RETRY_DELAY * attempt)
+
+        self.dropped_total += len(batch)
+        logger.error("Dropped batch of %s questionnaires after %s attempts", len(batch), FLUSH_RETRIES)
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        """Запись пакета многострочными INSERT: заголовки анкет, затем ответы"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                insert(Questionnaire.__table__).returning(
+                    Questionnaire.__table__.c.id, sort_by_parameter_order=True
+                ),
+                batch
+            )
+            questionnaire_ids = result.scalars().all()
+
+            response_rows = []
+            for questionnaire_id, record in zip(questionnaire_ids, batch):
+                answers = get_answers(record["language"])
+                for number, code in AnswerVector(record["answer_bits"], record["answer_mask"]).items():
+                    response_rows.append({
+                        "questionnaire_id": questionnaire_id,
+                        "question_number": number,
+                        "answer": answers[code],
+                        "answer_weight": get_question_answer_weight(number, answers[code]),
+                        "is_reverse_question": is_reverse_question(number)
+                    })
+
+            if response_rows:
+                await db.execute(insert(QuestionnaireResponse.__table__), response_rows)
+            await db.commit()
+
+
+def build_questionnaire_record(user, language: str, answers: AnswerVector, risk_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Формирование записи анкеты для очереди (ответы - в answer_bits/answer_mask)"""
+    return {
+        "telegram_id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "language": language,
+        "answer_bits": answers.bits,
+        "answer_mask": answers.mask,
+        "risk_level": risk_result.get("risk_level"),
+        "risk_score": risk_result.get("score", risk_result.get("risk_score")),
+        "recommendations": risk_result.get("recommendations"),
+        "completed_at": datetime.now(timezone.utc)
+    }
+
+
+# Общий экземпляр очереди
+questionnaire_writer = QuestionnaireWriter(
+    batch_size=settings.QUESTIONNAIRE_BATCH_SIZE,
+    flush_interval=settings.QUESTIONNAIRE_FLUSH_INTERVAL,
+    max_queue_size=settings.QUESTIONNAIRE_QUEUE_SIZE
+)
@@ -0,0 +1,263 @@
+"""
+Streaming rescoring of stored questionnaires
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.data.answer_vector import AnswerVector
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.models.questionnaire import Questionnaire
+from app.models.rescoring import RescoringCheckpoint
+from app.services.scoring import ScoringEngine, scoring_engine
+
+logger = get_logger("rescoring")
+
+JOB_NAME = "questionnaires"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_INTERRUPTED = "interrupted"
+STATUS_FAILED = "failed"
+
+
+def stored_answers(row: Any) -> Any:
+    """Ответы строки анкеты: AnswerVector или словарь у анкет, сохраненных до упаковки"""
+    if row.answer_bits is not None:
+        return AnswerVector(row.answer_bits, row.answer_mask or 0)
+    return row.responses or {}
+
+
+class RescoringJob:
+    """
+    Пересчет risk_score/risk_level всех сохраненных анкет.
+
+    Строки читаются серверным курсором (yield_per) пачками по chunk_size,
+    каждая пачка оценивается векторно, изменившиеся строки обновляются одним
+    executemany. Контрольная точка (последний id) фиксируется в той же
+    транзакции, что и обновления, поэтому прерванный пересчет продолжается
+    с первой необработанной пачки.
+    """
+
+    def __init__(self, chunk_size: int, engine: ScoringEngine = scoring_engine, name: str = JOB_NAME):
+        self.chunk_size = chunk_size
+        self.engine = engine
+        self.name = name
+        self._task: Optional[asyncio.Task] = None
+        self._stop_requested = False
+
+        # Прогресс текущего запуска
+        self.status: Optional[str] = None
+        self.first_id = 0
+        self.last_id = 0
+        self.max_id = 0
+        self.processed = 0
+        self.updated = 0
+        self.skipped = 0
+        self.processed_in_run = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, restart: bool = False) -> bool:
+        """Запуск пересчета фоновой задачей; False если уже выполняется"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run(restart=restart))
+        return True
+
+    def request_stop(self):
+        """Остановка после фиксации текущей пачки"""
+        self._stop_requested = True
+
+    async def stop(self):
+        """Прерывание фонового пересчета; прогресс сохраняется в контрольной точке"""
+        if self.running:
+            # Не отменяем задачу посреди запроса к БД - ждем границы пачки
+            self.request_stop()
+            await asyncio.wait([self._task])
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """
+        Пересчет с последней контрольной точки
+
+        Args:
+            restart: Начать с первой анкеты, игнорируя контрольную точку
+
+        Returns:
+            Dict: Итоговый прогресс
+        """
+        checkpoint = await self._load_checkpoint()
+        resume = checkpoint is not None and checkpoint.status != STATUS_COMPLETED and not restart
+
+        self.last_id = checkpoint.last_id if resume else 0
+        self.processed = checkpoint.processed if resume else 0
+        self.updated = checkpoint.updated if resume else 0
+        self.skipped = 0
+        self.processed_in_run = 0
+        self.last_error = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.status = STATUS_RUNNING
+        self._stop_requested = False
+
+        async with SessionLocal() as db:
+            first_id, max_id = (await db.execute(
+                select(func.min(Questionnaire.id), func.max(Questionnaire.id)).where(Questionnaire.id > self.last_id)
+            )).one()
+        # Границы диапазона для оценки процента выполнения
+        self.first_id = (first_id or 1) - 1
+        self.max_id = max_id or self.last_id
+
+        await self._save_checkpoint(status=STATUS_RUNNING, started=not resume)
+        if resume:
+            logger.info("Rescoring resumed after id %s (%s rows already processed)", self.last_id, self.processed)
+        else:
+            logger.info("Rescoring started, max id %s", self.max_id)
+
+        try:
+            await self._stream()
+        except asyncio.CancelledError:
+            await asyncio.shield(self._finish(STATUS_INTERRUPTED))
+            raise
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.error("Rescoring failed after id %s: %s", self.last_id, self.last_error)
+            await self._finish(STATUS_FAILED)
+            raise
+
+        await self._finish(STATUS_INTERRUPTED if self._stop_requested else STATUS_COMPLETED)
+        return self.progress()
+
+    async def _stream(self):
+        query = (
+            select(
+                Questionnaire.id,
+                Questionnaire.responses,
+                Questionnaire.answer_bits,
+                Questionnaire.answer_mask,
+                Questionnaire.language,
+                Questionnaire.risk_score,
+                Questionnaire.risk_level,
+                Questionnaire.recommendations
+            )
+            .where(Questionnaire.id > self.last_id)
+            .order_by(Questionnaire.id)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        # Чтение и запись в разных сессиях: курсор держит свою транзакцию открытой
+        async with SessionLocal() as reader:
+            result = await reader.stream(query)
+            async for rows in result.partitions():
+                await self._process_chunk(rows)
+                if self._stop_requested:
+                    break
+
+    async def _process_chunk(self, rows: List[Any]):
+        # Оценка в потоке, чтобы не задерживать event loop бота
+        results = await asyncio.to_thread(
+            self.engine.score_batch, [(stored_answers(row), row.language or "ru") for row in rows]
+        )
+
+        changes = []
+        for row, result in zip(rows, results):
+            if "score" not in result:
+                # Ответы не удалось оценить - оставляем сохраненный результат
+                self.skipped += 1
+                continue
+            if (row.risk_score, row.risk_level, row.recommendations) != (result["score"], result["risk_level"], result["recommendations"]):
+                changes.append({
+                    "id": row.id,
+                    "risk_score": result["score"],
+                    "risk_level": result["risk_level"],
+                    "recommendations": result["recommendations"]
+                })
+
+        last_id = rows[-1].id
+        processed = self.processed + len(rows)
+        updated = self.updated + len(changes)
+
+        async with SessionLocal() as db:
+            if changes:
+                # Массовое обновление по первичному ключу (executemany)
+                await db.execute(update(Questionnaire), changes)
+            await db.execute(self._checkpoint_statement(STATUS_RUNNING, last_id=last_id, processed=processed, updated=updated))
+            await db.commit()
+
+        # Прогресс сдвигается только после фиксации пачки
+        self.last_id, self.processed, self.updated = last_id, processed, updated
+        self.processed_in_run += len(rows)
+
+        logger.info(
+            "Rescoring: %s rows, %s updated, %.0f rows/s, last id %s/%s",
+            self.processed, self.updated, self.rate, self.last_id, self.max_id
+        )
+
+    async def _finish(self, status: str):
+        self.status = status
+        self.finished_at = time.monotonic()
+        await self._save_checkpoint(status=status)
+        logger.info("Rescoring %s: %s rows, %s updated, %s skipped", status, self.processed, self.updated, self.skipped)
+
+    async def _load_checkpoint(self) -> Optional[RescoringCheckpoint]:
+        async with SessionLocal() as db:
+            return await db.get(RescoringCheckpoint, self.name)
+
+    def _checkpoint_statement(self, status: str, started: bool = False, **progress):
+        now = datetime.now(timezone.utc)
+        values = {
+            "status": status,
+            "last_id": progress.get("last_id", self.last_id),
+            "processed": progress.get("processed", self.processed),
+            "updated": progress.get("updated", self.updated),
+            "last_error": self.last_error,
+            "updated_at": now,
+            "finished_at": now if status != STATUS_RUNNING else None
+        }
+        on_conflict = dict(values, started_at=now) if started else values
+        statement = insert(RescoringCheckpoint).values(job=self.name, started_at=now, **values)
+        return statement.on_conflict_do_update(index_elements=[RescoringCheckpoint.job], set_=on_conflict)
+
+    async def _save_checkpoint(self, status: str, started: bool = False):
+        async with SessionLocal() as db:
+            await db.execute(self._checkpoint_statement(status, started))
+            await db.commit()
+
+    @property
+    def rate(self) -> float:
+        """Строк в секунду в текущем запуске"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.processed_in_run / elapsed if elapsed > 0 else 0.0
+
+    def progress(self) -> Dict[str, Any]:
+        """Прогресс и пропускная способность текущего (последнего) запуска"""
+        span = self.max_id - self.first_id
+        return {
+            "status": self.status,
+            "running": self.running,
+            "last_id": self.last_id,
+            "max_id": self.max_id,
+            "percent": round(min(100.0, max(0, self.last_id - self.first_id) / span * 100), 2) if span > 0 else 100.0,
+            "processed": self.processed,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "rows_per_second": round(self.rate, 1),
+            "elapsed": round((self.finished_at or time.monotonic()) - self.started_at, 3) if self.started_at else None,
+            "last_error": self.last_error
+        }
+
+
+# Общий экземпляр для запуска из служебного API
+rescoring_job = RescoringJob(settings.RESCORING_CHUNK_SIZE)
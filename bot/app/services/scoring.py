@@ -0,0 +1,236 @@
+"""
+Vectorized risk scoring engine
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.data.answer_vector import ANSWER_BITS, AnswerVector
+from app.data.questionnaire_data import (
+    ANSWERS, ANSWER_WEIGHTS, REVERSE_ANSWER_WEIGHTS, get_total_questions, is_reverse_question
+)
+
+# Максимальный вес ответа (для нормализации к 100 баллам)
+MAX_ANSWER_WEIGHT = 3
+
+# Пороги уровней риска (нормализованный балл включительно)
+LOW_RISK_THRESHOLD = 30
+MEDIUM_RISK_THRESHOLD = 60
+
+RISK_RECOMMENDATIONS = {
+    "ru": {
+        "low": [
+            "Продолжайте вести здоровый образ жизни",
+            "Регулярно проходите профилактические осмотры",
+            "Поддерживайте социальную активность"
+        ],
+        "medium": [
+            "Рекомендуется консультация специалиста",
+            "Увеличьте физическую активность",
+            "Тренируйте память и внимание"
+        ],
+        "high": [
+            "Обязательная консультация невролога",
+            "Прохождение когнитивных тестов",
+            "Медицинское обследование"
+        ]
+    },
+    "en": {
+        "low": [
+            "Continue to lead a healthy lifestyle",
+            "Regular preventive examinations",
+            "Maintain social activity"
+        ],
+        "medium": [
+            "Specialist consultation is recommended",
+            "Increase physical activity",
+            "Train memory and attention"
+        ],
+        "high": [
+            "Mandatory consultation with a neurologist",
+            "Cognitive testing",
+            "Medical examination"
+        ]
+    }
+}
+
+RISK_LEVELS = np.array(["low", "medium", "high"])
+
+
+def get_fallback_result(language: str) -> Dict[str, Any]:
+    """Безопасный результат по умолчанию, если ответы не удалось оценить"""
+    return {
+        "risk_score": 50,
+        "risk_level": "medium",
+        "recommendations": ["Рекомендуется консультация специалиста"] if language == "ru" else ["Specialist consultation is recommended"],
+        "should_consult": True
+    }
+
+
+class ScoringEngine:
+    """
+    Оценка анкет матрицей весов.
+
+    Ответы кодируются в матрицу (анкеты x вопросы) индексов словаря ответов,
+    балл считается одной выборкой из матрицы весов (вопрос x ответ) и суммой
+    по строкам. Вопросы вне 1..N оцениваются обычными весами отдельно.
+    AnswerVector раскладывается в ту же матрицу сдвигами, без разбора текста.
+    """
+
+    def __init__(self):
+        self.total_questions = get_total_questions()
+
+        # Словарь ответов: текст -> индекс столбца; последний столбец - неизвестный ответ
+        vocabulary = list(dict.fromkeys([*ANSWER_WEIGHTS, *REVERSE_ANSWER_WEIGHTS]))
+        self.answer_index = {answer: index for index, answer in enumerate(vocabulary)}
+        self.unknown_index = len(vocabulary)
+
+        # Матрица весов: строка 0 не используется, строки 1..N - вопросы
+        self.weights = np.zeros((self.total_questions + 1, len(vocabulary) + 1), dtype=np.int64)
+        for question_number in range(1, self.total_questions + 1):
+            table = REVERSE_ANSWER_WEIGHTS if is_reverse_question(question_number) else ANSWER_WEIGHTS
+            for answer, index in self.answer_index.items():
+                self.weights[question_number, index] = table.get(answer, 0)
+        self.question_columns = np.arange(self.total_questions + 1)
+
+        # Код AnswerVector -> столбец матрицы весов (веса вариантов одинаковы во всех языках)
+        self.code_columns = np.array([self.answer_index[answer] for answer in ANSWERS["ru"]], dtype=np.int8)
+        self.code_shifts = np.arange(self.total_questions, dtype=np.uint64) * np.uint64(ANSWER_BITS)
+        self.mask_shifts = np.arange(self.total_questions, dtype=np.uint64)
+
+    def encode(self, batch: Sequence[Dict[Any, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Кодирование ответов в матрицу индексов
+
+        Returns:
+            codes: (N, вопросы+1) индексы ответов
+            counts: число ответов в каждой анкете
+            extra: баллы вопросов вне диапазона 1..N
+            valid: False для анкет, которые нельзя оценить
+        """
+        size = len(batch)
+        width = self.total_questions + 1
+        codes = np.empty((size, width), dtype=np.int8)
+        counts = np.zeros(size, dtype=np.int64)
+        extra = np.zeros(size, dtype=np.int64)
+        valid = np.ones(size, dtype=bool)
+        answer_index = self.answer_index
+        unknown = self.unknown_index
+        weights = self.weights
+
+        for row, responses in enumerate(batch):
+            counts[row] = len(responses)
+            row_codes = [unknown] * width
+            row_extra = 0
+            try:
+                for question_number, answer in responses.items():
+                    if not isinstance(answer, str):
+                        continue
+                    number = int(question_number)
+                    if 1 <= number <= self.total_questions:
+                        code = answer_index.get(answer, unknown)
+                        if row_codes[number] == unknown:
+                            row_codes[number] = code
+                        else:
+                            # Один вопрос под ключами 5 и "5" учитывается дважды
+                            row_extra += int(weights[number, code])
+                    else:
+                        row_extra += ANSWER_WEIGHTS.get(answer, 0)
+            except (TypeError, ValueError):
+                valid[row] = False
+            codes[row] = row_codes
+            extra[row] = row_extra
+
+        valid &= counts > 0
+        return codes, counts, extra, valid
+
+    def encode_vectors(self, vectors: Sequence[AnswerVector]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Кодирование векторов ответов в матрицу индексов (см. encode)
+
+        Returns:
+            codes: (N, вопросы+1) индексы ответов
+            counts: число ответов в каждой анкете
+            valid: False для анкет без ответов
+        """
+        bits = np.fromiter((vector.bits for vector in vectors), dtype=np.uint64, count=len(vectors))
+        mask = np.fromiter((vector.mask for vector in vectors), dtype=np.uint64, count=len(vectors))
+        answered = (mask[:, None] >> self.mask_shifts) & np.uint64(1)
+        answer_codes = (bits[:, None] >> self.code_shifts) & np.uint64((1 << ANSWER_BITS) - 1)
+
+        codes = np.full((len(vectors), self.total_questions + 1), self.unknown_index, dtype=np.int8)
+        codes[:, 1:] = np.where(answered, self.code_columns[answer_codes.astype(np.intp)], self.unknown_index)
+        counts = answered.sum(axis=1).astype(np.int64)
+        return codes, counts, counts > 0
+
+    def encode_items(self, batch: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Кодирование анкет в виде словарей и AnswerVector вперемешку (см. encode)"""
+        vector_rows = [row for row, responses in enumerate(batch) if isinstance(responses, AnswerVector)]
+        if not vector_rows:
+            return self.encode(batch)
+        if len(vector_rows) == len(batch):
+            codes, counts, valid = self.encode_vectors(batch)
+            return codes, counts, np.zeros(len(batch), dtype=np.int64), valid
+
+        dict_rows = [row for row, responses in enumerate(batch) if not isinstance(responses, AnswerVector)]
+        codes = np.empty((len(batch), self.total_questions + 1), dtype=np.int8)
+        counts = np.zeros(len(batch), dtype=np.int64)
+        extra = np.zeros(len(batch), dtype=np.int64)
+        valid = np.zeros(len(batch), dtype=bool)
+        codes[vector_rows], counts[vector_rows], valid[vector_rows] = self.encode_vectors([batch[row] for row in vector_rows])
+        codes[dict_rows], counts[dict_rows], extra[dict_rows], valid[dict_rows] = self.encode([batch[row] for row in dict_rows])
+        return codes, counts, extra, valid
+
+    def score_codes(self, codes: np.ndarray, counts: np.ndarray, extra: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Векторный расчет по закодированным ответам
+
+        Returns:
+            normalized: нормализованные баллы 0..100
+            levels: индексы уровней риска (0 - low, 1 - medium, 2 - high)
+        """
+        raw = self.weights[self.question_columns, codes].sum(axis=1)
+        if extra is not None:
+            raw = raw + extra
+        max_possible = np.maximum(counts, 1) * MAX_ANSWER_WEIGHT
+        normalized = np.minimum(100, ((raw / max_possible) * 100).astype(np.int64))
+        levels = (normalized > LOW_RISK_THRESHOLD).astype(np.int8) + (normalized > MEDIUM_RISK_THRESHOLD)
+        return normalized, levels
+
+    def score_batch(self, items: Iterable[Tuple[Dict[Any, Any], str]]) -> List[Dict[str, Any]]:
+        """
+        Оценка набора анкет за один проход
+
+        Args:
+            items: Пары (ответы, язык); ответы - словарь или AnswerVector
+
+        Returns:
+            List[Dict]: Результаты в формате calculate_risk_locally
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        codes, counts, extra, valid = self.encode_items([responses for responses, _ in items])
+        normalized, levels = self.score_codes(codes, counts, extra)
+
+        results = []
+        for (_, language), is_valid, score, level in zip(items, valid.tolist(), normalized.tolist(), RISK_LEVELS[levels].tolist()):
+            if not is_valid:
+                results.append(get_fallback_result(language))
+                continue
+            results.append({
+                "score": score,
+                "risk_level": level,
+                "recommendations": list(RISK_RECOMMENDATIONS["ru" if language == "ru" else "en"][level]),
+                "should_consult": level != "low"
+            })
+        return results
+
+    def score(self, responses: Any, language: str) -> Dict[str, Any]:
+        """Оценка одной анкеты"""
+        return self.score_batch([(responses, language)])[0]
+
+
+# Общий экземпляр, собирается из questionnaire_data при импорте
+scoring_engine = ScoringEngine()
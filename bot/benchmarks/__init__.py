@@ -0,0 +1,3 @@
+"""
+AsyaBot benchmarks (run from the bot directory: python -m benchmarks.<name>)
+"""
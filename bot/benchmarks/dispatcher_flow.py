@@ -0,0 +1,329 @@
+"""
+In-process benchmark of the questionnaire flow through the real Dispatcher
+
+Usage:
+    python -m benchmarks.dispatcher_flow [--users N] [--nestjs-latency S] [--save-baseline]
+
+Диспетчер собирается через register_handlers(); запросы к Telegram
+принимает локальная сессия, NestJS заменен заглушкой на httpx.MockTransport,
+outbox и запись анкет работают без БД. Каждый пользователь проходит
+/start -> язык -> 31 ответ -> результаты -> подробный отчет/материалы и
+обратно; все пользователи выполняются одновременно.
+
+Результат сравнивается с benchmarks/baselines.json (ключ - сценарий);
+ухудшение больше --tolerance завершает запуск с кодом 1.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+BASELINES_FILE = Path(__file__).with_name("baselines.json")
+
+# Шаги сценария для разбивки задержки
+STEP_START = "start"
+STEP_LANGUAGE = "language"
+STEP_ANSWER = "answer"
+STEP_COMPLETE = "complete"
+STEP_NAVIGATION = "navigation"
+
+NAVIGATION = ["detailed_report", "back_to_results", "useful_materials", "back_to_results"]
+
+
+def configure_environment(args: argparse.Namespace):
+    """Настройки читаются при импорте app, поэтому окружение задается заранее"""
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
+    os.environ["FSM_STORAGE"] = args.fsm_storage
+    # Синтетические пользователи отвечают без пауз и упирались бы в лимит частоты
+    os.environ["THROTTLE_STORAGE"] = "off"
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    os.environ.setdefault("NESTJS_BACKEND_URL", "http://nestjs.benchmark")
+
+
+def build_updates(user_id: int, update_id: int, seed: int) -> List[Any]:
+    """Обновления одного пользователя с шагом сценария"""
+    from aiogram import types
+    from app.bot.keyboards import AnswerCallback
+    from app.data.questionnaire_data import get_answers, get_total_questions
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    user = types.User(id=user_id, is_bot=False, first_name="Bench", language_code="ru")
+    chat = types.Chat(id=user_id, type="private")
+    bot_message = types.Message(
+        message_id=1, date=now, chat=chat, text="-",
+        from_user=types.User(id=1, is_bot=True, first_name="AsyaBot")
+    )
+
+    def callback(data: str) -> types.Update:
+        nonlocal update_id
+        update_id += 1
+        return types.Update(update_id=update_id, callback_query=types.CallbackQuery(
+            id=str(update_id), from_user=user, chat_instance=str(user_id), message=bot_message, data=data
+        ))
+
+    update_id += 1
+    updates = [(STEP_START, types.Update(update_id=update_id, message=types.Message(
+        message_id=update_id, date=now, chat=chat, from_user=user, text="/start"
+    )))]
+    updates.append((STEP_LANGUAGE, callback("lang_ru")))
+
+    total = get_total_questions()
+    answers_count = len(get_answers("ru"))
+    for question in range(1, total + 1):
+        step = STEP_COMPLETE if question == total else STEP_ANSWER
+        updates.append((step, callback(AnswerCallback(q=question, a=rng.randrange(answers_count)).pack())))
+
+    updates.extend((STEP_NAVIGATION, callback(data)) for data in NAVIGATION)
+    return updates
+
+
+def create_bench_session():
+    """Сессия Bot без сети: ответы Telegram собираются локально"""
+    from aiogram import types
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import EditMessageText, SendMessage
+
+    class BenchSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.requests_total = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.requests_total += 1
+            if isinstance(method, (EditMessageText, SendMessage)):
+                return types.Message(
+                    message_id=getattr(method, "message_id", None) or 1,
+                    date=datetime.now(timezone.utc),
+                    chat=types.Chat(id=method.chat_id or 0, type="private"),
+                    text=method.text
+                )
+            return True
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return BenchSession()
+
+
+class NestJSStandIn:
+    """Заглушка NestJS: отвечает 200 после заданной задержки"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests_total = 0
+
+    async def handle(self, request):
+        import httpx
+
+        self.requests_total += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return httpx.Response(200, json={"status": "success"})
+
+
+class DirectOutbox:
+    """Outbox без БД: запись мгновенная, доставка через NestJSService в фоне"""
+
+    def __init__(self, nestjs_service):
+        self.nestjs_service = nestjs_service
+        self.tasks = set()
+
+    async def enqueue(self, group_key: str, messages) -> List[str]:
+        for endpoint, payload in messages:
+            task = asyncio.create_task(self.nestjs_service.deliver(endpoint, payload))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return []
+
+    async def drain(self):
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=60)
+
+
+async def run_users(dp, bot, users: List[List[Any]], latencies: Dict[str, List[float]]) -> float:
+    """Одновременный проход всех пользователей; обновления пользователя идут по порядку"""
+    async def run_user(updates):
+        for step, update in updates:
+            started = time.perf_counter()
+            await dp.feed_update(bot, update, wait_processed=True)
+            latencies[step].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(updates) for updates in users))
+    return time.perf_counter() - started
+
+
+async def drain(bot_module):
+    """Ожидание фоновой доставки и записи анкет"""
+    await bot_module.get_completion_delivery().outbox.drain()
+    await bot_module.questionnaire_writer.stop()
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    import numpy as np
+    from app.bot import bot as bot_module
+    from app.logger import setup_logger
+    from app.services.delivery import get_completion_delivery
+    from app.services.nestjs_service import get_nestjs_service
+
+    setup_logger("asyabot")
+
+    if bot_module.setup_bot() is None:
+        raise RuntimeError("Dispatcher is disabled: TELEGRAM_BOT_TOKEN is not configured")
+    bot_module.register_handlers()
+    dp, bot = bot_module.dp, bot_module.bot
+
+    # Без сети: сессия Telegram (без планировщика лимитов), заглушка NestJS, outbox и запись без БД
+    session = bot.session = create_bench_session()
+    nestjs = NestJSStandIn(args.nestjs_latency)
+    nestjs_service = get_nestjs_service()
+    nestjs_service.client = httpx.AsyncClient(base_url=nestjs_service.base_url, transport=httpx.MockTransport(nestjs.handle))
+    get_completion_delivery().outbox = DirectOutbox(nestjs_service)
+    writer = bot_module.questionnaire_writer
+
+    async def discard_batch(batch):
+        pass
+
+    writer._write_batch = discard_batch
+
+    updates_per_user = len(build_updates(0, 0, 0))
+
+    # Прогрев: первые вызовы строят кэши фильтров и импортируют модули
+    writer.start()
+    warmup = [build_updates(900_000_000 + index, index * 1000, index) for index in range(min(args.users, 50))]
+    await run_users(dp, bot, warmup, {step: [] for step in (STEP_START, STEP_LANGUAGE, STEP_ANSWER, STEP_COMPLETE, STEP_NAVIGATION)})
+    await drain(bot_module)
+
+    # Пропускная способность и задержки
+    writer.start()
+    users = [build_updates(100_000 + index, index * 1000, args.seed + index) for index in range(args.users)]
+    latencies = {step: [] for step in (STEP_START, STEP_LANGUAGE, STEP_ANSWER, STEP_COMPLETE, STEP_NAVIGATION)}
+    elapsed = await run_users(dp, bot, users, latencies)
+    await drain(bot_module)
+    del users
+
+    # Память на пользователя: прирост после прохождения сценария (состояние FSM, кэши)
+    memory_users = min(args.users, args.memory_users)
+    writer.start()
+    users = [build_updates(500_000 + index, index * 1000, args.seed + index) for index in range(memory_users)]
+    gc.collect()
+    tracemalloc.start()
+    await run_users(dp, bot, users, {step: [] for step in latencies})
+    await drain(bot_module)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await nestjs_service.client.aclose()
+
+    def summary(samples: List[float]) -> Dict[str, float]:
+        values = np.array(samples) * 1000
+        return {
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3)
+        }
+
+    all_latencies = [value for samples in latencies.values() for value in samples]
+    total_updates = args.users * updates_per_user
+    return {
+        "users": args.users,
+        "updates": total_updates,
+        "elapsed": round(elapsed, 3),
+        "updates_per_second": round(total_updates / elapsed, 1),
+        "latency": {"all": summary(all_latencies), **{step: summary(samples) for step, samples in latencies.items()}},
+        "memory_per_user_kb": round(retained / memory_users / 1024, 2),
+        "telegram_requests": session.requests_total,
+        "nestjs_requests": nestjs.requests_total,
+        "questionnaires_written": writer.written_total
+    }
+
+
+def scenario_key(args: argparse.Namespace) -> str:
+    return f"users={args.users},nestjs_latency={args.nestjs_latency},fsm={args.fsm_storage}"
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Ухудшения относительно базовой линии больше tolerance"""
+    checks = [
+        ("updates/s", result["updates_per_second"], baseline["updates_per_second"], False),
+        ("p50 ms", result["latency"]["all"]["p50_ms"], baseline["p50_ms"], True),
+        ("p99 ms", result["latency"]["all"]["p99_ms"], baseline["p99_ms"], True),
+        ("memory/user KB", result["memory_per_user_kb"], baseline["memory_per_user_kb"], True)
+    ]
+    regressions = []
+    for name, current, base, higher_is_worse in checks:
+        change = (current - base) / base if base else 0.0
+        print(f"  {name:<16} {current:>12} baseline {base:>12} ({change:+.1%})")
+        if (change > tolerance) if higher_is_worse else (change < -tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк сценария анкеты через Dispatcher")
+    parser.add_argument("--users", type=int, default=2000, help="одновременных пользователей")
+    parser.add_argument("--memory-users", type=int, default=1000, help="пользователей для замера памяти")
+    parser.add_argument("--nestjs-latency", type=float, default=0.02, help="задержка заглушки NestJS (секунды)")
+    parser.add_argument("--fsm-storage", default="memory", choices=["memory", "redis", "postgres"], help="хранилище FSM")
+    parser.add_argument("--log-level", default="WARNING", help="уровень логирования, если LOG_LEVEL не задан")
+    parser.add_argument("--seed", type=int, default=1, help="зерно выбора ответов")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение относительно базовой линии")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результат как базовую линию сценария")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    result = asyncio.run(benchmark(args))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['users']} users, {result['updates']} updates in {result['elapsed']}s: {result['updates_per_second']} updates/s")
+        for step, summary in result["latency"].items():
+            print(f"  {step:<12} p50 {summary['p50_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms")
+        print(f"  memory per user: {result['memory_per_user_kb']} KB")
+
+    baselines = json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+    key = scenario_key(args)
+
+    if args.save_baseline:
+        baselines[key] = {
+            "updates_per_second": result["updates_per_second"],
+            "p50_ms": result["latency"]["all"]["p50_ms"],
+            "p99_ms": result["latency"]["all"]["p99_ms"],
+            "memory_per_user_kb": result["memory_per_user_kb"],
+            "python": platform.python_version(),
+            "recorded_at": datetime.now(timezone.utc).date().isoformat()
+        }
+        BASELINES_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline saved for {key}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key} (run with --save-baseline)")
+        return 0
+
+    print(f"Compared with baseline {key}:")
+    regressions = compare(result, baselines[key], args.tolerance)
+    if regressions:
+        print(f"Regression over {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+"""
+End-to-end load harness: the application under uvicorn against fake Telegram and NestJS servers
+"""
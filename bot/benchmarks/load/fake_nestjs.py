@@ -0,0 +1,53 @@
+"""
+Fake NestJS backend for load testing
+"""
+import asyncio
+import random
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+
+class FakeNestJSServer:
+    """
+    Заглушка NestJS: любой POST отвечает {"status": "success"} после задержки.
+
+    error_rate - доля ответов 503 (сбой бэкенда, учитывается автоматом и
+    повторяется outbox); GET используется для прогрева пула соединений.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.errors = 0
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{path:.*}", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.method != "POST":
+            return web.json_response({"status": "ok"})
+
+        self.requests[request.path] += 1
+        await request.read()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"status": "error", "message": "Injected failure"}, status=503)
+        return web.json_response({"status": "success"})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": dict(self.requests), "errors": self.errors}
@@ -0,0 +1,226 @@
+"""
+Fake Telegram Bot API server for load testing
+"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "AsyaBot", "username": "asya_load_bot"}
+
+# Методы, результат которых - ответ пользователю
+REPLY_METHODS = {"sendMessage", "editMessageText"}
+
+
+class FakeTelegramServer:
+    """
+    Bot API на aiohttp: getUpdates (long polling), доставка в webhook,
+    sendMessage/editMessageText/answerCallbackQuery.
+
+    Задержка отвечает на каждый вызов метода. 429 возвращается случайно
+    (error_rate) и при превышении chat_limit сообщений в секунду в одном чате,
+    как у настоящего Telegram. Драйвер ждет ответ бота в чате через expect().
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, chat_limit: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.update_id = 0
+        self.message_id = 0
+        self.webhook: Optional[Dict[str, Any]] = None
+        self.webhook_ready = asyncio.Event()
+        self.polling_ready = asyncio.Event()
+        self._webhook_session: Optional[aiohttp.ClientSession] = None
+        self._webhook_semaphore: Optional[asyncio.Semaphore] = None
+        self._webhook_tasks = set()
+
+        # chat_id -> ожидающий ответа драйвер
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._callback_chats: Dict[str, int] = {}
+        self._chat_sends: Dict[int, Deque[float]] = defaultdict(deque)
+
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.webhook_errors = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self.app.router.add_get("/bot{token}/{method}", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        for task in list(self._webhook_tasks):
+            task.cancel()
+        if self._webhook_session is not None:
+            await self._webhook_session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # --- Сторона драйвера ---
+
+    def expect(self, chat_id: int) -> asyncio.Future:
+        """Future, завершаемый следующим ответом бота в чате ("reply" или "throttled")"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = future
+        return future
+
+    def inject(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправка обновления боту: в очередь getUpdates или в webhook"""
+        self.update_id += 1
+        update = dict(update, update_id=self.update_id)
+        callback = update.get("callback_query")
+        if callback is not None:
+            callback["id"] = str(self.update_id)
+            self._callback_chats[callback["id"]] = callback["from"]["id"]
+
+        if self.webhook is not None:
+            task = asyncio.create_task(self._push_webhook(update))
+            self._webhook_tasks.add(task)
+            task.add_done_callback(self._webhook_tasks.discard)
+        else:
+            self.updates.put_nowait(update)
+        return update
+
+    async def _push_webhook(self, update: Dict[str, Any]):
+        async with self._webhook_semaphore:
+            try:
+                async with self._webhook_session.post(
+                    self.webhook["url"],
+                    json=update,
+                    headers={"X-Telegram-Bot-Api-Secret-Token": self.webhook["secret_token"]}
+                ) as response:
+                    if response.status != 200:
+                        self.webhook_errors += 1
+            except aiohttp.ClientError:
+                self.webhook_errors += 1
+
+    def _notify(self, chat_id: int, outcome: str):
+        future = self._waiters.pop(chat_id, None)
+        if future is not None and not future.done():
+            future.set_result(outcome)
+
+    # --- Bot API ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.method == "POST" else dict(request.query)
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            return ok(await self._get_updates(params))
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in REPLY_METHODS:
+            chat_id = int(params.get("chat_id", 0))
+            retry_after = self._check_rate_limit(chat_id)
+            if retry_after:
+                self.rate_limited += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after}
+                })
+            self._notify(chat_id, "reply")
+            return ok(self._message(chat_id, params))
+
+        if method == "answerCallbackQuery":
+            # Ответ с текстом - только у отклоненных ограничением частоты обновлений
+            if params.get("text"):
+                chat_id = self._callback_chats.get(params.get("callback_query_id"))
+                if chat_id is not None:
+                    self._notify(chat_id, "throttled")
+            self._callback_chats.pop(params.get("callback_query_id"), None)
+            return ok(True)
+
+        if method == "getMe":
+            return ok(BOT_USER)
+        if method == "setWebhook":
+            await self._set_webhook(params)
+            return ok(True)
+        if method == "deleteWebhook":
+            self.webhook = None
+            return ok(True)
+        if method == "getWebhookInfo":
+            return ok({
+                "url": self.webhook["url"] if self.webhook else "",
+                "has_custom_certificate": False,
+                "pending_update_count": self.updates.qsize()
+            })
+        return ok(True)
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.polling_ready.set()
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout) if timeout else self.updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        while len(updates) < limit and not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    async def _set_webhook(self, params: Dict[str, Any]):
+        self.webhook = {
+            "url": params["url"],
+            "secret_token": params.get("secret_token", ""),
+            "max_connections": int(params.get("max_connections") or 40)
+        }
+        if self._webhook_session is None:
+            self._webhook_session = aiohttp.ClientSession()
+        # Как и Telegram, держим не больше max_connections одновременных доставок
+        self._webhook_semaphore = asyncio.Semaphore(self.webhook["max_connections"])
+        self.webhook_ready.set()
+
+    def _check_rate_limit(self, chat_id: int) -> int:
+        """retry_after, если запрос нужно отклонить с 429"""
+        if self.error_rate and random.random() < self.error_rate:
+            return self.retry_after
+        if self.chat_limit:
+            now = time.monotonic()
+            sends = self._chat_sends[chat_id]
+            while sends and now - sends[0] > 1.0:
+                sends.popleft()
+            if len(sends) >= self.chat_limit:
+                return self.retry_after
+            sends.append(now)
+        return 0
+
+    def _message(self, chat_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.message_id += 1
+        return {
+            "message_id": int(params.get("message_id") or self.message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", "")
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "rate_limited": self.rate_limited,
+            "webhook_errors": self.webhook_errors
+        }
+
+
+def ok(result: Any) -> web.Response:
+    return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
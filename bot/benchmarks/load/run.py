@@ -0,0 +1,323 @@
+"""
+End-to-end load test of the application under uvicorn
+
+Usage:
+    python -m benchmarks.load.run [--users N] [--modes polling,webhook] [--workers 1,2,4]
+
+Для каждого сценария (режим получения обновлений x число воркеров)
+запускаются поддельные Telegram Bot API и NestJS, приложение стартует
+отдельным процессом uvicorn с TELEGRAM_API_URL/NESTJS_BACKEND_URL на них,
+и N пользователей проходят анкету. Задержка шага - от отправки обновления
+до ответа бота (sendMessage/editMessageText) на стороне Telegram.
+
+Несколько воркеров требуют общего хранилища FSM (--fsm-storage redis или
+postgres); polling запускается только с одним воркером.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from benchmarks.load.fake_nestjs import FakeNestJSServer
+from benchmarks.load.fake_telegram import BOT_USER, FakeTelegramServer
+
+BOT_DIR = Path(__file__).resolve().parents[2]
+HOST = "127.0.0.1"
+BOT_TOKEN = "123456:LOADTEST"
+WEBHOOK_SECRET = "load-test-secret"
+
+# Число вопросов и вариантов ответа (app не импортируется: приложение работает в другом процессе)
+TOTAL_QUESTIONS = 31
+ANSWERS_COUNT = 4
+NAVIGATION = ["detailed_report", "back_to_results", "useful_materials", "back_to_results"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def user_payload(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": "Load", "language_code": "ru"}
+
+
+def message_update(user_id: int, text: str) -> Dict[str, Any]:
+    return {"message": {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user_payload(user_id),
+        "text": text
+    }}
+
+
+def callback_update(user_id: int, data: str) -> Dict[str, Any]:
+    return {"callback_query": {
+        "from": user_payload(user_id),
+        "chat_instance": str(user_id),
+        "data": data,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "-"
+        }
+    }}
+
+
+def user_steps(user_id: int, rng: random.Random) -> List[Any]:
+    """Сценарий пользователя: (шаг, обновление)"""
+    steps = [("start", message_update(user_id, "/start")), ("language", callback_update(user_id, "lang_ru"))]
+    for question in range(1, TOTAL_QUESTIONS + 1):
+        step = "complete" if question == TOTAL_QUESTIONS else "answer"
+        steps.append((step, callback_update(user_id, f"a:{question}:{rng.randrange(ANSWERS_COUNT)}")))
+    steps.extend(("navigation", callback_update(user_id, data)) for data in NAVIGATION)
+    return steps
+
+
+class Driver:
+    """Пользователи, проходящие анкету с паузами между шагами"""
+
+    def __init__(self, telegram: FakeTelegramServer, users: int, think_time: float, ramp_up: float, step_timeout: float, seed: int):
+        self.telegram = telegram
+        self.users = users
+        self.think_time = think_time
+        self.ramp_up = ramp_up
+        self.step_timeout = step_timeout
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {}
+        self.outcomes = Counter()
+        self.timeouts_by_step = Counter()
+
+    async def run_user(self, user_id: int, delay: float):
+        await asyncio.sleep(delay)
+        steps = user_steps(user_id, random.Random(self.rng.random()))
+        index = 0
+        while index < len(steps):
+            step, update = steps[index]
+            reply = self.telegram.expect(user_id)
+            started = time.monotonic()
+            self.telegram.inject(update)
+            try:
+                outcome = await asyncio.wait_for(reply, self.step_timeout)
+            except asyncio.TimeoutError:
+                self.outcomes["timeout"] += 1
+                self.timeouts_by_step[step] += 1
+                return
+            if outcome == "throttled":
+                # Повтор того же шага, как сделал бы пользователь
+                self.outcomes["throttled"] += 1
+                await asyncio.sleep(1.0)
+                continue
+
+            self.latencies.setdefault(step, []).append(time.monotonic() - started)
+            self.outcomes["steps"] += 1
+            index += 1
+            if self.think_time:
+                await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+        self.outcomes["completed_users"] += 1
+
+    async def run(self, first_user_id: int) -> float:
+        started = time.monotonic()
+        await asyncio.gather(*(
+            self.run_user(first_user_id + index, self.ramp_up * index / max(1, self.users))
+            for index in range(self.users)
+        ))
+        return time.monotonic() - started
+
+
+class AppProcess:
+    """Приложение под uvicorn в отдельном процессе"""
+
+    def __init__(self, port: int, workers: int, env: Dict[str, str], log_file: Path):
+        self.port = port
+        self.workers = workers
+        self.env = env
+        self.log_file = log_file
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        self._log = open(self.log_file, "ab")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.application:create_app", "--factory", "--host", HOST, "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=BOT_DIR, env=self.env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    async def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        url = f"http://{HOST}:{self.port}/api/v1/health/"
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"Application exited with code {self.process.returncode}, see {self.log_file}")
+                try:
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"Application did not become ready in {timeout}s, see {self.log_file}")
+
+    def stop(self, timeout: float = 30.0):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+
+
+def app_environment(args: argparse.Namespace, mode: str, workers: int, telegram_port: int, nestjs_port: int, app_port: int, log_dir: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "TELEGRAM_API_URL": f"http://{HOST}:{telegram_port}",
+        "NESTJS_BACKEND_URL": f"http://{HOST}:{nestjs_port}",
+        "BOT_MODE": mode,
+        "WEBHOOK_BASE_URL": f"http://{HOST}:{app_port}",
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "WORKERS": str(workers),
+        "FSM_STORAGE": args.fsm_storage,
+        "LOG_FILE": str(log_dir / f"app-{mode}-{workers}.log")
+    })
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def summarize(latencies: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    def summary(samples: List[float]) -> Dict[str, float]:
+        values = np.array(samples) * 1000
+        return {
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "p99_ms": round(float(np.percentile(values, 99)), 1)
+        }
+
+    all_samples = [value for samples in latencies.values() for value in samples]
+    if not all_samples:
+        return {}
+    return {"all": summary(all_samples), **{step: summary(samples) for step, samples in latencies.items()}}
+
+
+async def run_scenario(args: argparse.Namespace, mode: str, workers: int, index: int, log_dir: Path) -> Dict[str, Any]:
+    telegram = FakeTelegramServer(args.tg_latency, args.tg_429_rate, args.tg_chat_limit, args.tg_retry_after)
+    nestjs = FakeNestJSServer(args.nestjs_latency, args.nestjs_error_rate)
+    telegram_port, nestjs_port, app_port = free_port(), free_port(), free_port()
+    await telegram.start(HOST, telegram_port)
+    await nestjs.start(HOST, nestjs_port)
+
+    env = app_environment(args, mode, workers, telegram_port, nestjs_port, app_port, log_dir)
+    app = AppProcess(app_port, workers, env, log_dir / f"uvicorn-{mode}-{workers}.log")
+    app.start()
+    try:
+        await app.wait_ready()
+        # Бот готов принимать обновления после первого getUpdates или регистрации webhook
+        ready = telegram.polling_ready if mode == "polling" else telegram.webhook_ready
+        await asyncio.wait_for(ready.wait(), 30)
+
+        driver = Driver(telegram, args.users, args.think_time, args.ramp_up, args.step_timeout, args.seed)
+        # Свой диапазон пользователей на сценарий: общее хранилище FSM не пересекается
+        elapsed = await driver.run(first_user_id=(index + 1) * 10_000_000)
+    finally:
+        app.stop()
+        await telegram.close()
+        await nestjs.close()
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "users": args.users,
+        "elapsed": round(elapsed, 2),
+        "steps_per_second": round(driver.outcomes["steps"] / elapsed, 1) if elapsed else 0.0,
+        "outcomes": dict(driver.outcomes),
+        "timeouts_by_step": dict(driver.timeouts_by_step),
+        "latency": summarize(driver.latencies),
+        "telegram": telegram.stats(),
+        "nestjs": nestjs.stats()
+    }
+
+
+def scenarios(args: argparse.Namespace) -> List[Any]:
+    result = []
+    for mode in args.modes:
+        for workers in args.workers:
+            if mode == "polling" and workers > 1:
+                print(f"skip polling x{workers}: polling runs one poller per worker and duplicates updates")
+                continue
+            if workers > 1 and args.fsm_storage == "memory":
+                print(f"skip {mode} x{workers}: FSM_STORAGE=memory is not shared between workers")
+                continue
+            result.append((mode, workers))
+    return result
+
+
+async def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    log_dir = Path(args.log_dir or tempfile.mkdtemp(prefix="asyabot-load-"))
+    log_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Application logs: {log_dir}")
+
+    results = []
+    for index, (mode, workers) in enumerate(scenarios(args)):
+        print(f"Running {mode} x{workers} with {args.users} users...")
+        result = await run_scenario(args, mode, workers, index, log_dir)
+        results.append(result)
+        latency = result["latency"].get("all", {})
+        print(
+            f"  {result['steps_per_second']} steps/s, p50 {latency.get('p50_ms')} ms, "
+            f"p99 {latency.get('p99_ms')} ms, outcomes {result['outcomes']}, "
+            f"telegram 429 {result['telegram']['rate_limited']}, nestjs errors {result['nestjs']['errors']}"
+        )
+    return results
+
+
+def parse_list(value: str, cast=str) -> List[Any]:
+    return [cast(item) for item in value.split(",") if item]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест приложения с поддельными Telegram и NestJS")
+    parser.add_argument("--users", type=int, default=100, help="число пользователей")
+    parser.add_argument("--modes", type=lambda value: parse_list(value), default=["polling", "webhook"], help="polling,webhook")
+    parser.add_argument("--workers", type=lambda value: parse_list(value, int), default=[1], help="числа воркеров uvicorn, например 1,2,4")
+    parser.add_argument("--fsm-storage", default="memory", choices=["memory", "redis", "postgres"], help="хранилище FSM приложения")
+    parser.add_argument("--think-time", type=float, default=1.0, help="средняя пауза пользователя между шагами (секунды)")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="время подключения всех пользователей (секунды)")
+    parser.add_argument("--step-timeout", type=float, default=30.0, help="ожидание ответа бота на шаг (секунды)")
+    parser.add_argument("--tg-latency", type=float, default=0.03, help="задержка Bot API (секунды)")
+    parser.add_argument("--tg-429-rate", type=float, default=0.0, help="доля случайных ответов 429")
+    parser.add_argument("--tg-chat-limit", type=float, default=0.0, help="сообщений в секунду в чате до 429 (0 - без лимита)")
+    parser.add_argument("--tg-retry-after", type=int, default=1, help="retry_after в ответах 429")
+    parser.add_argument("--nestjs-latency", type=float, default=0.05, help="задержка NestJS (секунды)")
+    parser.add_argument("--nestjs-error-rate", type=float, default=0.0, help="доля ответов 503 от NestJS")
+    parser.add_argument("--seed", type=int, default=1, help="зерно выбора ответов и пауз")
+    parser.add_argument("--log-dir", help="каталог логов приложения (по умолчанию временный)")
+    parser.add_argument("--json", help="файл для результатов в JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    results = asyncio.run(main(args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
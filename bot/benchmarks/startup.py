@@ -0,0 +1,200 @@
+"""
+Cold start benchmark: import time and time to the first handled update
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--app-env production] [--importtime 15]
+
+Время импорта измеряется в отдельных интерпретаторах без кэша модулей:
+запускающий модуль main, сборка приложения app.application и вызов
+create_app(). Затем `python main.py` запускается против поддельных
+Telegram Bot API и NestJS (benchmarks.load) и измеряется время от запуска
+процесса до ответа HTTP, первого getUpdates и ответа бота на /start,
+отправленный до старта. БД не обязательна: без нее приложение стартует
+с ошибкой init_db в логе.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.load.fake_nestjs import FakeNestJSServer
+from benchmarks.load.fake_telegram import FakeTelegramServer
+from benchmarks.load.run import BOT_DIR, BOT_TOKEN, HOST, free_port, message_update
+
+CHAT_ID = 1000
+
+# Замер в чистом интерпретаторе: (подготовка, измеряемый код)
+IMPORT_PROBES = {
+    "import main": ("", "import main"),
+    "import app.application": ("", "import app.application"),
+    "create_app()": ("import app.application", "app.application.create_app()")
+}
+
+
+def base_environment(args: argparse.Namespace, log_file: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "APP_ENV": args.app_env,
+        "BOT_MODE": "polling",
+        "WORKERS": "1",
+        "FSM_STORAGE": "memory",
+        "LOG_FILE": str(log_file)
+    })
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_import(probe: str, env: Dict[str, str]) -> float:
+    """Длительность импорта (или create_app) в новом процессе, секунды"""
+    setup, measured = IMPORT_PROBES[probe]
+    code = f"import time\n{setup}\nstarted = time.perf_counter()\n{measured}\nprint(time.perf_counter() - started)\n"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BOT_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, env: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+    """Модули с наибольшим собственным временем импорта по -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BOT_DIR, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: row["self_ms"], reverse=True)[:limit]
+
+
+async def wait_http(port: int, process: subprocess.Popen, timeout: float):
+    url = f"http://{HOST}:{port}/api/v1/health/"
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Application exited with code {process.returncode}")
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.01)
+    raise RuntimeError(f"Application did not answer HTTP in {timeout}s")
+
+
+async def measure_first_update(args: argparse.Namespace, log_file: Path) -> Dict[str, float]:
+    """Запуск `python main.py`: время до HTTP, первого getUpdates и ответа на /start"""
+    telegram = FakeTelegramServer()
+    nestjs = FakeNestJSServer()
+    telegram_port, nestjs_port, app_port = free_port(), free_port(), free_port()
+    await telegram.start(HOST, telegram_port)
+    await nestjs.start(HOST, nestjs_port)
+
+    env = base_environment(args, log_file)
+    env.update({
+        "TELEGRAM_API_URL": f"http://{HOST}:{telegram_port}",
+        "NESTJS_BACKEND_URL": f"http://{HOST}:{nestjs_port}",
+        "SERVER_HOST": HOST,
+        "SERVER_PORT": str(app_port)
+    })
+
+    # Обновление ждет в очереди getUpdates с момента запуска процесса
+    reply = telegram.expect(CHAT_ID)
+    telegram.inject(message_update(CHAT_ID, "/start"))
+
+    started = time.monotonic()
+    log = open(log_file, "ab")
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=BOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    http_ready = asyncio.create_task(wait_http(app_port, process, args.timeout))
+    timings = {}
+    try:
+        async with asyncio.timeout(args.timeout):
+            await telegram.polling_ready.wait()
+            timings["first_get_updates"] = time.monotonic() - started
+            await reply
+            timings["first_reply"] = time.monotonic() - started
+            await http_ready
+            timings["http_ready"] = time.monotonic() - started
+    finally:
+        http_ready.cancel()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
+        await telegram.close()
+        await nestjs.close()
+    return timings
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = [sample * 1000 for sample in samples]
+    return {"median_ms": round(statistics.median(values), 1), "min_ms": round(min(values), 1), "max_ms": round(max(values), 1)}
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    log_file = Path(args.log_file or tempfile.mkstemp(prefix="asyabot-startup-", suffix=".log")[1])
+    env = base_environment(args, log_file)
+
+    imports = {probe: summarize([measure_import(probe, env) for _ in range(args.runs)]) for probe in IMPORT_PROBES}
+
+    startup: Dict[str, List[float]] = {}
+    for _ in range(args.runs):
+        for name, value in (await measure_first_update(args, log_file)).items():
+            startup.setdefault(name, []).append(value)
+
+    result = {
+        "app_env": args.app_env,
+        "runs": args.runs,
+        "imports": imports,
+        "startup": {name: summarize(values) for name, values in startup.items()},
+        "log_file": str(log_file)
+    }
+    if args.importtime:
+        result["slowest_imports"] = slowest_imports("app.application", env, args.importtime)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Время холодного старта приложения")
+    parser.add_argument("--runs", type=int, default=3, help="повторов каждого замера")
+    parser.add_argument("--app-env", default="production", choices=["production", "development"], help="профиль запуска main.py")
+    parser.add_argument("--timeout", type=float, default=60.0, help="ожидание первого ответа бота (секунды)")
+    parser.add_argument("--importtime", type=int, default=0, help="показать N модулей с наибольшим временем импорта")
+    parser.add_argument("--log-file", help="файл логов приложения (по умолчанию временный)")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(benchmark(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"APP_ENV={result['app_env']}, {result['runs']} runs (median / min / max):")
+    for section in ("imports", "startup"):
+        for name, summary in result[section].items():
+            print(f"  {name:<24} {summary['median_ms']:>9} ms {summary['min_ms']:>9} {summary['max_ms']:>9}")
+    for row in result.get("slowest_imports", []):
+        print(f"  {row['module']:<48} self {row['self_ms']:>8.1f} ms  cumulative {row['cumulative_ms']:>8.1f} ms")
+    print(f"Application log: {result['log_file']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Rescoring of stored questionnaires after weight or threshold changes
+
+Usage:
+    python rescore.py [--restart] [--chunk-size N]
+"""
+import argparse
+import asyncio
+import signal
+
+from app.config import settings
+from app.database import close_db, init_db
+from app.logger import get_logger, setup_logger
+from app.services.rescoring import RescoringJob
+
+logger = get_logger("rescore")
+
+
+async def main(restart: bool, chunk_size: int):
+    await init_db()
+    job = RescoringJob(chunk_size)
+
+    # Ctrl+C останавливает пересчет на границе пачки; повторный запуск продолжит с нее
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, job.request_stop)
+
+    try:
+        progress = await job.run(restart=restart)
+        logger.info("Rescoring finished: %s", progress)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчет риска сохраненных анкет")
+    parser.add_argument("--restart", action="store_true", help="начать с начала, игнорируя контрольную точку")
+    parser.add_argument("--chunk-size", type=int, default=settings.RESCORING_CHUNK_SIZE, help="строк в пачке")
+    args = parser.parse_args()
+    setup_logger("asyabot")
+    asyncio.run(main(args.restart, args.chunk_size))
@@ -0,0 +1,127 @@
+"""
+Вспомогательные функции тестов
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from aiogram import types
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import EditMessageText, GetMe, GetUpdates, SendMessage, TelegramMethod
+
+
+@asynccontextmanager
+async def open_database():
+    """База данных с таблицами приложения (без TEST_DATABASE_URL тест пропускается)"""
+    if not os.environ.get("TEST_DATABASE_URL"):
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.database import close_db, init_db
+
+    await init_db()
+    try:
+        yield
+    finally:
+        await close_db()
+
+
+class RecordingSession(BaseSession):
+    """Сессия Bot без сети: запросы к Telegram записываются, ответы собираются локально"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests: List[TelegramMethod] = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests.append(method)
+        if isinstance(method, (EditMessageText, SendMessage)):
+            return types.Message(
+                message_id=getattr(method, "message_id", None) or 1,
+                date=datetime.now(timezone.utc),
+                chat=types.Chat(id=method.chat_id or 0, type="private"),
+                text=method.text
+            )
+        if isinstance(method, GetMe):
+            return types.User(id=1, is_bot=True, first_name="AsyaBot")
+        if isinstance(method, GetUpdates):
+            # Long polling без обновлений
+            await asyncio.sleep(0.01)
+            return []
+        return True
+
+    def sent(self, method_type) -> List[TelegramMethod]:
+        return [method for method in self.requests if isinstance(method, method_type)]
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class RecordingOutbox:
+    """Outbox без БД: записанные сообщения остаются в списке"""
+
+    def __init__(self):
+        self.messages: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    async def enqueue(self, group_key: str, messages) -> List[str]:
+        self.messages.extend((group_key, endpoint, payload) for endpoint, payload in messages)
+        return []
+
+
+class UpdateFactory:
+    """Обновления Telegram от одного пользователя в личном чате"""
+
+    def __init__(self, user_id: int, language_code: str = "ru"):
+        self.user = types.User(id=user_id, is_bot=False, first_name="Test", language_code=language_code)
+        self.chat = types.Chat(id=user_id, type="private")
+        self.update_id = user_id * 1000
+
+    def key(self, bot) -> StorageKey:
+        """Ключ FSM пользователя"""
+        return StorageKey(bot_id=bot.id, chat_id=self.chat.id, user_id=self.user.id)
+
+    def _next_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    def message(self, text: str) -> types.Update:
+        update_id = self._next_id()
+        return types.Update(update_id=update_id, message=types.Message(
+            message_id=update_id, date=datetime.now(timezone.utc), chat=self.chat, from_user=self.user, text=text
+        ))
+
+    def callback(self, data: str) -> types.Update:
+        update_id = self._next_id()
+        bot_message = types.Message(
+            message_id=1, date=datetime.now(timezone.utc), chat=self.chat, text="-",
+            from_user=types.User(id=1, is_bot=True, first_name="AsyaBot")
+        )
+        return types.Update(update_id=update_id, callback_query=types.CallbackQuery(
+            id=str(update_id), from_user=self.user, chat_instance=str(self.user.id), message=bot_message, data=data
+        ))
+
+
+class BotRuntime:
+    """Собранный бот для тестов (см. фикстуру bot_runtime)"""
+
+    def __init__(self, module, session: RecordingSession, outbox: RecordingOutbox):
+        self.module = module
+        self.session = session
+        self.outbox = outbox
+
+    @property
+    def bot(self):
+        return self.module.bot
+
+    @property
+    def dp(self):
+        return self.module.dp
+
+    async def feed(self, update: types.Update):
+        """Обработка обновления с ожиданием результата"""
+        return await self.dp.feed_update(self.bot, update, wait_processed=True)
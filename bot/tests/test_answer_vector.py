@@ -0,0 +1,92 @@
+"""
+Упакованные ответы анкеты: без потерь в словарь {номер: текст} и обратно
+"""
+import json
+import random
+
+import pytest
+
+from app.bot.bot import get_answer_vector
+from app.data.answer_vector import ANSWER_OPTIONS, TOTAL_QUESTIONS, AnswerVector
+from app.data.questionnaire_data import ANSWERS
+from app.services.nestjs_service import to_backend_payload
+
+
+def random_vector(rng: random.Random) -> AnswerVector:
+    vector = AnswerVector()
+    for question in rng.sample(range(1, TOTAL_QUESTIONS + 1), rng.randint(0, TOTAL_QUESTIONS)):
+        vector.set(question, rng.randrange(ANSWER_OPTIONS))
+    return vector
+
+
+def test_pack_roundtrip():
+    rng = random.Random(25)
+    for _ in range(1000):
+        vector = random_vector(rng)
+        packed = vector.pack()
+        assert AnswerVector.unpack(json.loads(json.dumps(packed))) == vector
+
+
+@pytest.mark.parametrize("language", ["ru", "en"])
+def test_dict_roundtrip(language):
+    rng = random.Random(language)
+    for _ in range(200):
+        vector = random_vector(rng)
+        responses = vector.to_dict(language)
+        assert set(responses.values()) <= set(ANSWERS[language])
+        assert AnswerVector.from_dict(responses) == vector
+        assert AnswerVector.from_dict(responses).to_dict(language) == responses
+
+
+def test_set_replaces_previous_answer():
+    vector = AnswerVector()
+    vector.set(5, 1)
+    vector.set(5, 3)
+    assert vector.get(5) == 3
+    assert vector.get(6) is None
+    assert len(vector) == 1
+    assert vector.counts() == [0, 0, 0, 1]
+
+
+def test_completeness_follows_mask():
+    vector = AnswerVector()
+    for question in range(1, TOTAL_QUESTIONS):
+        vector.set(question, 0)
+    assert not vector.is_complete()
+    vector.set(TOTAL_QUESTIONS, 0)
+    assert vector.is_complete() and len(vector) == TOTAL_QUESTIONS
+
+
+@pytest.mark.parametrize("question, code", [(0, 0), (TOTAL_QUESTIONS + 1, 0), (1, -1), (1, ANSWER_OPTIONS)])
+def test_out_of_range_is_rejected(question, code):
+    with pytest.raises(ValueError):
+        AnswerVector().set(question, code)
+
+
+def test_unknown_answers_in_strict_and_lenient_mode():
+    responses = {"1": ANSWERS["ru"][0], "2": "Может быть", "99": ANSWERS["en"][1]}
+    with pytest.raises(ValueError):
+        AnswerVector.from_dict(responses)
+    vector = AnswerVector.from_dict(responses, strict=False)
+    assert list(vector.items()) == [(1, 0)]
+
+
+def test_fsm_sessions_in_old_format_are_converted():
+    responses = {"1": ANSWERS["ru"][2], "3": ANSWERS["ru"][1]}
+    assert get_answer_vector({"responses": responses}) == AnswerVector.from_dict(responses)
+    packed = AnswerVector.from_dict(responses).pack()
+    assert get_answer_vector({"answers": packed}).to_dict("ru") == responses
+
+
+def test_backend_payload_gets_answer_dict():
+    vector = AnswerVector.from_dict({"1": ANSWERS["en"][0], "2": ANSWERS["en"][3]})
+    payload = {
+        "questionnaire": {"id": "q-1", "telegram_id": 5, "language": "en", "answer_vector": vector.pack()},
+        "result": {"telegram_id": 5, "score": 10}
+    }
+
+    body = to_backend_payload(payload)
+
+    assert body["questionnaire"] == {"id": "q-1", "telegram_id": 5, "answers": vector.to_dict("en")}
+    assert body["result"] == payload["result"]
+    assert "answer_vector" in payload["questionnaire"]
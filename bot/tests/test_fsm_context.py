@@ -0,0 +1,136 @@
+"""
+Буферизованный FSM: одно чтение и одна запись за обновление, конфликт версий
+и исключение обработчика не записывают изменения
+"""
+import pytest
+from aiogram import Bot
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+from aiogram.methods import AnswerCallbackQuery
+
+from app.bot.bot import ERROR_TEXT
+from app.bot.fsm_context import BufferedFSMContextMiddleware, FSMConflictError
+from app.bot.keyboards import AnswerCallback
+from app.bot.storage import VersionedMemoryStorage
+from app.config import settings
+from tests.support import RecordingSession, UpdateFactory
+
+
+class CountingStorage(VersionedMemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+        self.saves = 0
+
+    async def load(self, key):
+        self.loads += 1
+        return await super().load(key)
+
+    async def save(self, key, state, data, version):
+        self.saves += 1
+        return await super().save(key, state, data, version)
+
+
+@pytest.fixture
+def storage():
+    return CountingStorage()
+
+
+@pytest.fixture
+def middleware(storage):
+    return BufferedFSMContextMiddleware(storage=storage, events_isolation=DisabledEventIsolation())
+
+
+@pytest.fixture
+def updates():
+    return UpdateFactory(401)
+
+
+@pytest.fixture
+def bot():
+    return Bot("123456:TEST", session=RecordingSession())
+
+
+def event_data(bot, updates):
+    return {"bot": bot, "event_from_user": updates.user, "event_chat": updates.chat}
+
+
+async def test_one_load_and_one_save_per_update(storage, middleware, bot, updates):
+    async def handler(event, data):
+        state = data["state"]
+        await state.get_state()
+        await state.update_data(a=1)
+        await state.get_data()
+        await state.update_data(b=2)
+        await state.set_state("form:question")
+
+    await middleware(handler, None, event_data(bot, updates))
+
+    assert (storage.loads, storage.saves) == (1, 1)
+    assert await storage.get_state(updates.key(bot)) == "form:question"
+    assert await storage.get_data(updates.key(bot)) == {"a": 1, "b": 2}
+
+
+async def test_read_only_update_does_not_write(storage, middleware, bot, updates):
+    async def handler(event, data):
+        return await data["state"].get_data()
+
+    assert await middleware(handler, None, event_data(bot, updates)) == {}
+    assert storage.saves == 0
+
+
+async def test_failed_handler_changes_are_discarded(storage, middleware, bot, updates):
+    await storage.set_data(updates.key(bot), {"current_question": 3})
+
+    async def handler(event, data):
+        await data["state"].update_data(current_question=4)
+        raise RuntimeError("edit failed")
+
+    with pytest.raises(RuntimeError):
+        await middleware(handler, None, event_data(bot, updates))
+
+    assert storage.saves == 0
+    assert await storage.get_data(updates.key(bot)) == {"current_question": 3}
+
+
+async def test_version_conflict_keeps_the_concurrent_write(storage, middleware, bot, updates):
+    key = updates.key(bot)
+    await storage.set_data(key, {"answers": 1, "current_question": 2})
+
+    async def handler(event, data):
+        state = data["state"]
+        await state.update_data(answers=3, current_question=3)
+        # Другой процесс записал свое изменение после нашего чтения
+        await storage.set_data(key, {"answers": 5, "current_question": 3})
+
+    with pytest.raises(FSMConflictError):
+        await middleware(handler, None, event_data(bot, updates))
+
+    assert storage.saves == 1
+    assert await storage.get_data(key) == {"answers": 5, "current_question": 3}
+
+
+@pytest.fixture
+def no_throttling(monkeypatch):
+    monkeypatch.setattr(settings, "THROTTLE_STORAGE", "off")
+
+
+async def test_conflict_reaches_the_user_as_an_error_reply(no_throttling, bot_runtime):
+    updates = UpdateFactory(402)
+    await bot_runtime.feed(updates.message("/start"))
+    await bot_runtime.feed(updates.callback("lang_ru"))
+
+    storage = bot_runtime.dp.storage
+    key = updates.key(bot_runtime.bot)
+    concurrent = {**await storage.get_data(key), "current_question": 9}
+    original_save = storage.save
+
+    async def save_after_concurrent_write(*args):
+        await storage.set_data(key, concurrent)
+        return await original_save(*args)
+
+    storage.save = save_after_concurrent_write
+    bot_runtime.session.requests.clear()
+    await bot_runtime.feed(updates.callback(AnswerCallback(q=1, a=0).pack()))
+
+    assert ERROR_TEXT in [method.text for method in bot_runtime.session.sent(AnswerCallbackQuery)]
+    assert await storage.get_data(key) == concurrent
@@ -0,0 +1,166 @@
+"""
+Выбор лидера для polling: опрашивает только держатель блокировки,
+потерявший блокировку процесс останавливает getUpdates
+"""
+import asyncio
+from functools import partial
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+from fakeredis.aioredis import FakeRedis
+
+from app.bot.leader import LeaderElection, RedisLeaderLock
+from tests.support import RecordingSession
+
+CHECK_INTERVAL = 0.05
+
+
+class SharedLock:
+    """Блокировка в памяти, общая для нескольких LeaderElection"""
+
+    def __init__(self):
+        self.owner = None
+
+
+class SharedLockHandle:
+    backend = "memory"
+
+    def __init__(self, lock: SharedLock):
+        self.lock = lock
+
+    async def acquire(self) -> bool:
+        if self.lock.owner is None:
+            self.lock.owner = self
+        return self.lock.owner is self
+
+    async def renew(self) -> bool:
+        return self.lock.owner is self
+
+    async def release(self):
+        if self.lock.owner is self:
+            self.lock.owner = None
+
+    async def close(self):
+        await self.release()
+
+
+class Replica:
+    """Процесс бота: свой Bot, Dispatcher и кандидат в лидеры"""
+
+    def __init__(self, lock: SharedLock):
+        self.session = RecordingSession()
+        self.bot = Bot("123456:TEST", session=self.session)
+        self.dp = Dispatcher()
+        self.election = LeaderElection(SharedLockHandle(lock), CHECK_INTERVAL, stop_timeout=1)
+        self.task = None
+
+    def start(self):
+        job = partial(self.dp.start_polling, self.bot, handle_signals=False, close_bot_session=False)
+        self.task = asyncio.create_task(self.election.run(job, stop=self.dp.stop_polling))
+
+    def polls(self) -> int:
+        return len(self.session.sent(GetUpdates))
+
+    async def stop(self):
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+async def wait_for(condition, timeout: float = 2):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def test_only_the_leader_polls():
+    lock = SharedLock()
+    first, second = Replica(lock), Replica(lock)
+    first.start()
+    await wait_for(lambda: first.polls() > 0)
+    second.start()
+    await asyncio.sleep(CHECK_INTERVAL * 4)
+
+    assert first.election.is_leader and not second.election.is_leader
+    assert second.polls() == 0
+    await first.stop()
+    await second.stop()
+
+
+async def test_lost_lock_stops_polling_and_hands_over():
+    lock = SharedLock()
+    first, second = Replica(lock), Replica(lock)
+    first.start()
+    await wait_for(lambda: first.polls() > 0)
+    second.start()
+
+    # Блокировка истекла и досталась другому процессу
+    lock.owner = None
+    await wait_for(lambda: second.election.is_leader and second.polls() > 0)
+    await wait_for(lambda: first.election.leadership_lost == 1)
+
+    polls_after_loss = first.polls()
+    await asyncio.sleep(0.3)
+    assert first.polls() == polls_after_loss
+    assert not first.election.is_leader
+
+    # Потерявший лидерство процесс снова кандидат и запускает один цикл polling
+    await second.stop()
+    await wait_for(lambda: first.election.is_leader)
+    await wait_for(lambda: first.polls() > polls_after_loss)
+    await asyncio.sleep(0.2)
+    assert first.election.elections_won == 2
+    await first.stop()
+
+
+async def test_job_ignoring_stop_is_cancelled_after_timeout():
+    lock = SharedLock()
+    election = LeaderElection(SharedLockHandle(lock), CHECK_INTERVAL, stop_timeout=0.1)
+    job_cancelled = asyncio.Event()
+
+    async def stubborn_job():
+        try:
+            await asyncio.sleep(60)
+        finally:
+            job_cancelled.set()
+
+    async def stop():
+        pass
+
+    task = asyncio.create_task(election.run(stubborn_job, stop=stop))
+    await wait_for(lambda: election.is_leader)
+    lock.owner = None
+    await asyncio.wait_for(job_cancelled.wait(), 1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_job_result_is_returned_and_lock_released():
+    lock = SharedLock()
+    election = LeaderElection(SharedLockHandle(lock), CHECK_INTERVAL)
+
+    async def job():
+        return "done"
+
+    assert await election.run(job) == "done"
+    assert lock.owner is None and not election.is_leader
+
+
+async def test_redis_lock_is_exclusive_and_owned():
+    redis = FakeRedis()
+    first = RedisLeaderLock(redis, "test:leader", ttl=0.2)
+    second = RedisLeaderLock(redis, "test:leader", ttl=0.2)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    assert not await second.renew()
+    await second.release()
+    assert await first.renew()
+
+    # Без продления блокировка истекает и достается другому
+    await asyncio.sleep(0.3)
+    assert await second.acquire()
+    assert not await first.renew()
+    await second.release()
+    assert await first.acquire()
+    await redis.aclose()
@@ -0,0 +1,121 @@
+"""
+Векторная оценка риска совпадает с прежним расчетом calculate_risk_locally
+"""
+import random
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.scoring import router
+from app.data.answer_vector import AnswerVector
+from app.data.questionnaire_data import ANSWERS, get_answer_weight, get_total_questions, is_reverse_question
+from app.services.scoring import scoring_engine
+
+REVERSE_WEIGHTS = {"Да": 0, "Yes": 0, "Нет": 3, "No": 3, "Иногда": 2, "Sometimes": 2, "Затрудняюсь ответить": 1, "Difficult to answer": 1}
+
+
+RECOMMENDATIONS = {
+    "ru": {
+        "low": ["Продолжайте вести здоровый образ жизни", "Регулярно проходите профилактические осмотры", "Поддерживайте социальную активность"],
+        "medium": ["Рекомендуется консультация специалиста", "Увеличьте физическую активность", "Тренируйте память и внимание"],
+        "high": ["Обязательная консультация невролога", "Прохождение когнитивных тестов", "Медицинское обследование"]
+    },
+    "en": {
+        "low": ["Continue to lead a healthy lifestyle", "Regular preventive examinations", "Maintain social activity"],
+        "medium": ["Specialist consultation is recommended", "Increase physical activity", "Train memory and attention"],
+        "high": ["Mandatory consultation with a neurologist", "Cognitive testing", "Medical examination"]
+    }
+}
+
+
+def reference_score(responses: dict, language: str) -> dict:
+    """Прежняя реализация calculate_risk_locally (без логирования)"""
+    texts = RECOMMENDATIONS["ru" if language == "ru" else "en"]
+    try:
+        score = 0
+        for question_num, answer in responses.items():
+            if isinstance(answer, str):
+                if is_reverse_question(int(question_num)):
+                    score += REVERSE_WEIGHTS.get(answer, 0)
+                else:
+                    score += get_answer_weight(answer)
+        normalized_score = min(100, int((score / (len(responses) * 3)) * 100))
+        if normalized_score <= 30:
+            risk_level = "low"
+        elif normalized_score <= 60:
+            risk_level = "medium"
+        else:
+            risk_level = "high"
+        return {
+            "score": normalized_score,
+            "risk_level": risk_level,
+            "recommendations": texts[risk_level],
+            "should_consult": risk_level != "low"
+        }
+    except Exception:
+        return {"risk_score": 50, "risk_level": "medium", "recommendations": texts["medium"][:1], "should_consult": True}
+
+
+def random_responses(rng: random.Random) -> dict:
+    """Полные, неполные и испорченные анкеты на обоих языках, в том числе смешанные"""
+    total = get_total_questions()
+    questions = rng.sample(range(1, total + 1), rng.randint(0, total))
+    responses = {}
+    for question in questions:
+        roll = rng.random()
+        if roll < 0.9:
+            answer = rng.choice(ANSWERS[rng.choice(["ru", "en"])])
+        elif roll < 0.95:
+            answer = "Может быть"
+        else:
+            answer = rng.choice([None, 2, ["Да"]])
+        responses[str(question) if rng.random() < 0.8 else question] = answer
+    if rng.random() < 0.02:
+        responses["x"] = "Да"
+    return responses
+
+
+def test_batch_matches_reference_on_random_questionnaires():
+    rng = random.Random(20250807)
+    items = [(random_responses(rng), rng.choice(["ru", "en"])) for _ in range(5000)]
+
+    results = scoring_engine.score_batch(items)
+
+    mismatches = [
+        (responses, language, result)
+        for (responses, language), result in zip(items, results)
+        if result != reference_score(responses, language)
+    ]
+    assert mismatches == []
+
+
+def test_answer_vector_scores_like_dict():
+    rng = random.Random(7)
+    for _ in range(500):
+        language = rng.choice(["ru", "en"])
+        vector = AnswerVector()
+        for question in rng.sample(range(1, get_total_questions() + 1), rng.randint(1, get_total_questions())):
+            vector.set(question, rng.randrange(len(ANSWERS[language])))
+        assert scoring_engine.score(vector, language) == scoring_engine.score(vector.to_dict(language), language)
+
+
+def test_empty_questionnaire_gets_fallback_result():
+    for language in ("ru", "en"):
+        assert scoring_engine.score({}, language) == reference_score({}, language)
+
+
+def test_batch_endpoint_keeps_request_order():
+    app = FastAPI()
+    app.include_router(router, prefix="/score")
+    rng = random.Random(3)
+    items = [{"responses": random_responses(rng), "language": "ru"} for _ in range(50)]
+    items = [item for item in items if all(isinstance(key, str) for key in item["responses"])]
+
+    response = TestClient(app).post("/score/batch", json={"items": items})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == len(items)
+    assert body["results"] == [
+        reference_score(item["responses"], item["language"]) for item in items
+    ]
@@ -0,0 +1,131 @@
+"""
+Контракт load()/save() хранилищ FSM: запись только при совпадении версии, TTL
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import DefaultKeyBuilder
+from fakeredis.aioredis import FakeRedis
+
+from app.bot.redis_storage import VersionedRedisStorage
+from app.bot.storage import FSMSnapshot, PostgresStorage, VersionedMemoryStorage
+from tests.support import open_database
+
+TTL = 1
+
+
+def make_key() -> StorageKey:
+    chat_id = uuid.uuid4().int % 10**9
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+
+@asynccontextmanager
+async def open_storage(backend: str):
+    if backend == "memory":
+        yield VersionedMemoryStorage()
+    elif backend == "redis":
+        storage = VersionedRedisStorage(
+            FakeRedis(),
+            key_builder=DefaultKeyBuilder(prefix="test", with_bot_id=True, with_destiny=True),
+            state_ttl=TTL,
+            data_ttl=TTL
+        )
+        yield storage
+        await storage.close()
+    else:
+        async with open_database():
+            yield PostgresStorage(prefix=f"test-{uuid.uuid4().hex}", ttl=TTL)
+
+
+@pytest.fixture(params=["memory", "redis", "postgres"])
+async def storage(request):
+    async with open_storage(request.param) as storage:
+        yield storage
+
+
+@pytest.fixture(params=["redis", "postgres"])
+async def expiring_storage(request):
+    async with open_storage(request.param) as storage:
+        yield storage
+
+
+@pytest.fixture
+async def redis_storage():
+    async with open_storage("redis") as storage:
+        yield storage
+
+
+async def test_load_missing_record(storage):
+    assert await storage.load(make_key()) == FSMSnapshot(None, {}, 0)
+
+
+async def test_save_with_current_version(storage):
+    key = make_key()
+    assert await storage.save(key, "form:question", {"answers": 5}, 0)
+
+    state, data, version = await storage.load(key)
+    assert (state, data) == ("form:question", {"answers": 5})
+    assert await storage.save(key, "form:done", {"answers": 7}, version)
+    assert (await storage.load(key))[:2] == ("form:done", {"answers": 7})
+
+
+async def test_save_with_stale_version_is_rejected(storage):
+    key = make_key()
+    await storage.save(key, "form:question", {"answers": 1}, 0)
+    _, _, version = await storage.load(key)
+    assert await storage.save(key, "form:question", {"answers": 2}, version)
+
+    # Второй писатель прочитал ту же версию
+    assert not await storage.save(key, "form:question", {"answers": 3}, version)
+    assert (await storage.load(key))[:2] == ("form:question", {"answers": 2})
+
+
+async def test_set_data_invalidates_loaded_version(storage):
+    key = make_key()
+    await storage.save(key, "form:question", {"answers": 1}, 0)
+    _, _, version = await storage.load(key)
+
+    await storage.set_data(key, {"answers": 9})
+    assert not await storage.save(key, "form:question", {"answers": 2}, version)
+    assert await storage.get_data(key) == {"answers": 9}
+
+
+async def test_record_expires(expiring_storage):
+    key = make_key()
+    await expiring_storage.save(key, "form:question", {"answers": 1}, 0)
+    await asyncio.sleep(TTL + 0.5)
+
+    assert await expiring_storage.load(key) == FSMSnapshot(None, {}, 0)
+    # Истекшая запись перезаписывается как новая
+    assert await expiring_storage.save(key, "form:language", {}, 0)
+    assert (await expiring_storage.load(key))[:2] == ("form:language", {})
+
+
+async def test_set_state_does_not_revive_expired_data(expiring_storage):
+    key = make_key()
+    await expiring_storage.save(key, "form:question", {"answers": 1}, 0)
+    await asyncio.sleep(TTL + 0.5)
+
+    await expiring_storage.set_state(key, "form:language")
+    assert await expiring_storage.get_data(key) == {}
+
+
+async def test_set_data_does_not_revive_expired_state(expiring_storage):
+    key = make_key()
+    await expiring_storage.save(key, "form:question", {"answers": 1}, 0)
+    await asyncio.sleep(TTL + 0.5)
+
+    await expiring_storage.set_data(key, {"language": "ru"})
+    assert await expiring_storage.get_state(key) is None
+
+
+async def test_redis_version_key_expires(redis_storage):
+    key = make_key()
+    await redis_storage.set_state(key, "form:language")
+    await redis_storage.set_data(key, {"language": "ru"})
+
+    ttl = await redis_storage.redis.pttl(redis_storage.key_builder.build(key, "version"))
+    assert 0 < ttl <= TTL * 1000
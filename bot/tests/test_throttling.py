@@ -0,0 +1,105 @@
+"""
+Ограничение частоты на уровне обновлений: отклоненное обновление не доходит
+до очереди чата, FSM и обработчиков
+"""
+import asyncio
+
+import pytest
+from aiogram.methods import AnswerCallbackQuery
+from fakeredis.aioredis import FakeRedis
+
+from app.bot.keyboards import AnswerCallback
+from app.bot.throttling import (
+    GROUP_ANSWER, GROUP_CALLBACK, GROUP_MESSAGE, THROTTLED_TEXT, MemoryRateLimiter, RedisRateLimiter,
+    get_throttle_group
+)
+from app.config import settings
+from tests.support import UpdateFactory
+
+BURST = 6
+
+
+@pytest.fixture
+def throttled(monkeypatch):
+    monkeypatch.setattr(settings, "THROTTLE_STORAGE", "memory")
+    monkeypatch.setattr(settings, "THROTTLE_ANSWER_RATE", 0.01)
+    monkeypatch.setattr(settings, "THROTTLE_ANSWER_BURST", BURST)
+
+
+async def start_questionnaire(runtime, updates: UpdateFactory):
+    await runtime.feed(updates.message("/start"))
+    await runtime.feed(updates.callback("lang_ru"))
+
+
+async def answer(runtime, updates: UpdateFactory, question: int):
+    await runtime.feed(updates.callback(AnswerCallback(q=question, a=0).pack()))
+
+
+async def test_rejected_taps_skip_queue_fsm_and_handlers(throttled, bot_runtime):
+    updates = UpdateFactory(101)
+    await start_questionnaire(bot_runtime, updates)
+
+    storage = bot_runtime.dp.storage
+    scheduler = bot_runtime.module.update_scheduler
+    loads = 0
+    original_load = storage.load
+
+    async def counting_load(key):
+        nonlocal loads
+        loads += 1
+        return await original_load(key)
+
+    storage.load = counting_load
+    processed_before = scheduler.processed_total
+    bot_runtime.session.requests.clear()
+
+    taps = 20
+    for question in range(1, taps + 1):
+        await answer(bot_runtime, updates, question)
+
+    answered = bot_runtime.session.sent(AnswerCallbackQuery)
+    throttled_replies = [method for method in answered if method.text == THROTTLED_TEXT["ru"]]
+    assert len(throttled_replies) == taps - BURST
+    assert scheduler.processed_total - processed_before == BURST
+    assert loads == BURST
+    assert bot_runtime.module.throttling.throttled_total[GROUP_ANSWER] == taps - BURST
+
+    data = await storage.get_data(updates.key(bot_runtime.bot))
+    assert data["current_question"] == BURST + 1
+
+
+async def test_users_have_separate_buckets(throttled, bot_runtime):
+    first, second = UpdateFactory(201), UpdateFactory(202)
+    for updates in (first, second):
+        await start_questionnaire(bot_runtime, updates)
+    for question in range(1, BURST + 1):
+        await answer(bot_runtime, first, question)
+
+    bot_runtime.session.requests.clear()
+    await answer(bot_runtime, second, 1)
+
+    assert [method.text for method in bot_runtime.session.sent(AnswerCallbackQuery)] == [None]
+
+
+def test_throttle_groups():
+    updates = UpdateFactory(1)
+    assert get_throttle_group(updates.callback(AnswerCallback(q=1, a=0).pack()).callback_query) == GROUP_ANSWER
+    assert get_throttle_group(updates.callback("answer_1_Да").callback_query) == GROUP_ANSWER
+    assert get_throttle_group(updates.callback("main_menu").callback_query) == GROUP_CALLBACK
+    assert get_throttle_group(updates.message("/start").message) == GROUP_MESSAGE
+
+
+async def test_memory_bucket_refills():
+    limiter = MemoryRateLimiter()
+    assert [await limiter.allow("user", rate=20, burst=2) for _ in range(3)] == [True, True, False]
+    await asyncio.sleep(0.06)
+    assert await limiter.allow("user", rate=20, burst=2)
+
+
+async def test_redis_bucket_is_shared_between_limiters():
+    redis = FakeRedis()
+    first, second = RedisRateLimiter(redis, "test"), RedisRateLimiter(redis, "test")
+    assert await first.allow("user", rate=0.01, burst=2)
+    assert await second.allow("user", rate=0.01, burst=2)
+    assert not await first.allow("user", rate=0.01, burst=2)
+    await redis.aclose()
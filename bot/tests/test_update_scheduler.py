@@ -0,0 +1,138 @@
+"""
+Очередь обновлений: параллельно между чатами, по порядку внутри чата,
+ограниченный прием и ошибки обработчиков через dp.errors()
+"""
+import asyncio
+import random
+
+import pytest
+from aiogram import Bot, Dispatcher, types
+
+from app.bot.update_scheduler import UpdateScheduler, UpdateSchedulerMiddleware
+from app.config import settings
+from tests.support import RecordingSession, UpdateFactory
+
+
+async def test_updates_of_one_chat_run_in_order():
+    scheduler = UpdateScheduler(max_concurrency=10, max_queued=100)
+    rng = random.Random(1)
+    done = {chat: [] for chat in range(5)}
+
+    def job(chat: int, index: int, delay: float):
+        async def run():
+            await asyncio.sleep(delay)
+            done[chat].append(index)
+        return run
+
+    for index in range(20):
+        for chat in done:
+            await scheduler.submit(chat, job(chat, index, rng.uniform(0, 0.005)))
+    await scheduler.drain(timeout=5)
+
+    assert all(order == list(range(20)) for order in done.values())
+    assert scheduler.processed_total == 100 and scheduler.queued == 0
+
+
+async def test_chats_run_in_parallel_up_to_the_limit():
+    scheduler = UpdateScheduler(max_concurrency=3, max_queued=100)
+    running = peak = 0
+
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    started = asyncio.get_running_loop().time()
+    for chat in range(6):
+        await scheduler.submit(chat, job)
+    await scheduler.drain(timeout=5)
+
+    assert peak == 3
+    assert asyncio.get_running_loop().time() - started < 0.2
+
+
+async def test_full_queue_holds_admission():
+    scheduler = UpdateScheduler(max_concurrency=1, max_queued=2)
+    release = asyncio.Event()
+
+    async def blocked():
+        await release.wait()
+
+    await scheduler.submit(1, blocked)
+    await scheduler.submit(2, blocked)
+    admission = asyncio.create_task(scheduler.submit(3, blocked))
+    await asyncio.sleep(0.05)
+    assert not admission.done()
+    assert scheduler.admission_waits == 1
+
+    release.set()
+    await asyncio.wait_for(admission, 1)
+    await scheduler.drain(timeout=1)
+
+
+async def test_wait_returns_result_and_raises():
+    scheduler = UpdateScheduler(max_concurrency=2, max_queued=10)
+
+    async def ok():
+        return 42
+
+    async def fail():
+        raise ValueError("boom")
+
+    assert await scheduler.submit(1, ok, wait=True) == 42
+    with pytest.raises(ValueError):
+        await scheduler.submit(1, fail, wait=True)
+    assert scheduler.failed_total == 1
+
+
+@pytest.mark.parametrize("wait_processed", [False, True])
+async def test_handler_errors_reach_dispatcher_error_handlers(wait_processed):
+    scheduler = UpdateScheduler(max_concurrency=2, max_queued=10)
+    dp = Dispatcher()
+    dp.update.outer_middleware(UpdateSchedulerMiddleware(scheduler, dp))
+    errors = []
+
+    @dp.message()
+    async def failing_handler(message: types.Message):
+        raise RuntimeError("handler failed")
+
+    @dp.errors()
+    async def error_handler(event: types.ErrorEvent):
+        errors.append((event.update.update_id, str(event.exception)))
+
+    bot = Bot("123456:TEST", session=RecordingSession())
+    update = UpdateFactory(7).message("hello")
+    await dp.feed_update(bot, update, wait_processed=wait_processed)
+    await scheduler.drain(timeout=1)
+
+    assert errors == [(update.update_id, "handler failed")]
+    assert scheduler.failed_total == 0
+
+
+@pytest.fixture
+def no_throttling(monkeypatch):
+    monkeypatch.setattr(settings, "THROTTLE_STORAGE", "off")
+
+
+async def test_rapid_answers_of_one_user_are_all_recorded(no_throttling, bot_runtime):
+    from app.bot.keyboards import AnswerCallback
+    from app.data.answer_vector import AnswerVector
+    from app.data.questionnaire_data import get_total_questions
+
+    updates = UpdateFactory(301)
+    await bot_runtime.feed(updates.message("/start"))
+    await bot_runtime.feed(updates.callback("lang_ru"))
+
+    # Как при polling: обновления принимаются без ожидания обработки
+    total = get_total_questions()
+    for question in range(1, total + 1):
+        await bot_runtime.dp.feed_update(bot_runtime.bot, updates.callback(AnswerCallback(q=question, a=question % 4).pack()))
+    await bot_runtime.module.update_scheduler.drain(timeout=5)
+
+    data = await bot_runtime.dp.storage.get_data(updates.key(bot_runtime.bot))
+    answers = AnswerVector.unpack(data["answers"])
+    assert answers.is_complete()
+    assert [code for _, code in answers.items()] == [question % 4 for question in range(1, total + 1)]
+    assert len(bot_runtime.outbox.messages) == 1